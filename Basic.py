@@ -1,5 +1,8 @@
 import streamlit as st
 import pandas as pd
+from fileformats import CSV_UPLOAD_TYPES
+from ingest import read_csv
+from dedup import THRESHOLD, cluster_summary, drop_duplicates
 
 
 st.set_page_config(page_title="Data Cleaning App", layout="wide")
@@ -8,11 +11,11 @@ st.set_page_config(page_title="Data Cleaning App", layout="wide")
 st.title(" Data Cleaning and Exploration App")
 
 
-uploaded_file = st.file_uploader("upload your csv file",type=["csv"])
+uploaded_file = st.file_uploader("upload your csv file",type=CSV_UPLOAD_TYPES)
 
 
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    df = read_csv(uploaded_file)
     st.subheader(" Raw data")
     st.write(df.head())
     
@@ -53,9 +56,17 @@ if uploaded_file:
         
         
         
+    st.subheader("Duplicate finder")
+    dup_cols = st.multiselect("Compare on columns (empty = all)", list(df.columns))
+    near = st.checkbox("Also match near duplicates (case, accents, typos)")
+    threshold = st.slider("Similarity", 0.5, 1.0, THRESHOLD, 0.05) if near else THRESHOLD
     if st.button("Drop duplicates"):
-        df.drop_duplicates(inplace=True)
-        st.success("Duplicates removed.")
+        deduped, clusters = drop_duplicates(df, dup_cols or None, near, threshold)
+        st.success(f"{len(df) - len(deduped)} duplicates removed from {clusters['cluster'].nunique()} clusters.")
+        if not clusters.empty:
+            st.write("Largest clusters")
+            st.dataframe(cluster_summary(df, clusters))
+        df = deduped
         
         
            
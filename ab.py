@@ -1,28 +1,30 @@
 import streamlit as st
-import pandas as pd
-from AutoClean import AutoClean
-import sweetviz
+from fileformats import CSV_UPLOAD_TYPES
+from ingest import read_csv
+from preview import show_preview
+from runtime import load
+from profiling import request_report, show_report
 import os
 
 st.set_page_config(page_title="Smart Data Cleaner", layout="wide")
 st.title("Automatic Data Cleaner")
 
-uploaded_file = st.file_uploader("📤 Upload your CSV file", type=["csv"])
+uploaded_file = st.file_uploader("📤 Upload your CSV file", type=CSV_UPLOAD_TYPES)
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+    df = read_csv(uploaded_file)
     st.subheader("🔍 Original Data")
-    st.dataframe(df)
+    show_preview(df, "original")
     
    ## Add options selected by user and button for action
 
     st.subheader("🧼 Cleaning Data with AutoClean...")
-    pipeline = AutoClean(df, mode='auto', verbose=True)
+    pipeline = load('AutoClean').AutoClean(df, mode='auto', verbose=True)
 
     cleaned_df = pipeline.output[df.columns]
     st.success("✅ AutoClean completed!")
     st.subheader("🧽 Cleaned Data")
-    st.dataframe(cleaned_df)
+    show_preview(cleaned_df, "cleaned")
 
     ##error handling optimise 
     # Show uncleaned info
@@ -37,13 +39,7 @@ if uploaded_file is not None:
     ## 2 reports
     # Sweetviz profiling
     st.subheader("📊 Sweetviz Report")
-    report = sweetviz.analyze([df, "Original Data"])
-    report_path = "sweetviz_report.html"
-    report.show_html(report_path)
-
-    with open(report_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-        st.components.v1.html(html_content, height=800, scrolling=True)
+    show_report(request_report([(df, "Original Data")]))
 
 else:
     st.info(" Please upload a CSV file to begin.")
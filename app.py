@@ -1,8 +1,28 @@
 import streamlit as st
 import pandas as pd
-import sqlalchemy
-from AutoClean import AutoClean
+from batchupload import clean_uploads, combine_parquet, new_batch_dir, remove_old_batches, save_uploads, zip_outputs
+from bulkwriter import DEFAULT_BATCH_ROWS, bulk_write, split_table_name
+from cleancache import cache_key, result_cache
+from cleaning import run_autoclean
+from connections import get_engine, pool_status
+from dedup import THRESHOLD as DUP_THRESHOLD, cluster_summary, find_duplicates, find_duplicates_in_chunks, keep_first
+from dtypeplanner import optimize_dtypes, round_numbers
+from exporter import exports
+from jobs import CANCELLED, DONE, runner
+from fileformats import COMPRESSION_OPTIONS, FORMAT_LABELS, UPLOAD_TYPES, columns_of, file_name, mime_type, read_table
+from instrumentation import stage
+import hashlib
 import os
+import uuid
+from contextlib import nullcontext
+from outofcore import DATA_DIR, DEFAULT_CHUNK_ROWS as OOC_CHUNK_ROWS, clean_csv_out_of_core, data_path
+from preview import show_preview
+from recipe import RECIPE_EXTENSION, CleaningRecipe, RecipeUnsupported
+from pushdown import pushdown_clean
+from runtime import import_report, warm_up
+from sessionstore import QuotaExceeded, frames
+from schemabrowser import build_select, list_columns, list_tables
+from sqlloader import DEFAULT_CHUNK_ROWS, new_store_path, stream_sql_to_parquet
 
 # Streamlit page config
 st.set_page_config(page_title="SQL Auto Data Cleaner", layout="wide")
@@ -13,16 +33,309 @@ if os.path.exists("style.css"):
     with open("style.css") as f:
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
+# Stage timings of this session, shown in the Performance panel (also logged server-wide)
+MAX_PERF_RECORDS = 100
+SCHEMA_TTL = 300   # seconds the table and column lists are cached
+session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex[:8])
+perf = st.session_state.setdefault('perf', [])
+
+# The session's frames live in the session store, which spills them to disk while the
+# session is idle and enforces the memory quotas; st.session_state only keeps small state.
+session_data = frames.session(session_id)
+
+
+def keep_frame(name, df):
+    # False (with a message to the user) when the frame does not fit the memory quota
+    try:
+        session_data[name] = df
+        return True
+    except QuotaExceeded as e:
+        st.error(f"🚫 {e}")
+        return False
+
+
+# Background jobs: load, clean and push run on the shared job runner. The job id is kept
+# in the URL as well, so a page that reconnects finds its job again.
+# Cancellation is cooperative, a step already running (such as an AutoClean pass) is not interrupted.
+CANCEL_NOTES = {
+    'clean': "🛑 Cancel requested: a cleaning pass that already started cannot be interrupted. It finishes "
+             "in the background and its result is discarded.",
+}
+
+def start_job(kind, fn, *args, description=""):
+    job = runner.submit(kind, fn, *args, description=description)
+    st.session_state[f"{kind}_job"] = job.id
+    st.query_params[f"{kind}_job"] = job.id
+    return job
+
+
+@st.fragment(run_every=1)
+def job_status(job):
+    if job.done:
+        st.rerun()  # full rerun hands the result to the page
+    st.progress(job.progress, text=f"⏳ {job.description}: {job.message or job.status} ({job.seconds}s)")
+    if st.button("✖️ Cancel", key=f"cancel_{job.id}", disabled=job.cancel_requested,
+                 help="Jobs stop at their next progress step, not in the middle of one."):
+        job.cancel()
+    if job.cancel_requested:
+        st.caption(CANCEL_NOTES.get(job.kind, "🛑 Cancel requested: the job stops at its next progress step."))
+
+
+def track_job(kind, on_done):
+    # progress while the job runs; the finished job is handed to on_done once
+    job_id = st.session_state.get(f"{kind}_job") or st.query_params.get(f"{kind}_job")
+    job = runner.get(job_id) if job_id else None
+    if job is None:
+        return
+    if not job.done:
+        job_status(job)
+        return
+    st.session_state.pop(f"{kind}_job", None)
+    st.query_params.pop(f"{kind}_job", None)
+    runner.forget(job.id)
+    if job.status == DONE:
+        perf.extend(job.result.get('metrics', []))
+        on_done(job.result)
+    elif job.status == CANCELLED:
+        st.warning(f"⚠️ {job.description} was cancelled.")
+    else:
+        st.error(f"❌ {job.description} failed: {job.error}")
+
+
+def load_job(job, engine, query, stream_load, chunk_rows, max_rows, max_mb, session, source):
+    metrics = []
+    if not stream_load:
+        job.report(0.1, "running query")
+        with stage('load', session=session, source=source, records=metrics) as rec:
+            df = pd.read_sql(query, engine)
+            rec['rows_in'] = rec['rows_out'] = len(df)
+        job.report(0.9, "choosing compact dtypes")
+        with stage('coerce', len(df), session=session, source=source, records=metrics):
+            df, report = optimize_dtypes(df)
+        return {'df': df, 'dtype_report': report, 'metrics': metrics}
+
+    def report_progress(rows):
+        job.report(min(rows / max_rows, 1.0) if max_rows else None, f"{rows:,} rows loaded")
+
+    with stage('load', session=session, source=source, records=metrics) as rec:
+        store = stream_sql_to_parquet(engine, query, new_store_path(), chunk_rows,
+                                      max_rows or None, max_mb or None, report_progress)
+        rec['rows_in'] = rec['rows_out'] = store.num_rows
+    return {'store': store, 'metrics': metrics}
+
+
+def clean_job(job, source, clean_params, workers, use_fast_engine, use_disk_cache, decimals, session, source_name):
+    # source is the session frame or a ParquetStore; the cleaning engines never modify their input
+    metrics = []
+    job.report(0.05, "preparing data")
+    if isinstance(source, pd.DataFrame):
+        df_cleaning = source
+    else:
+        with stage('coerce', source.num_rows, session=session, source=source_name, records=metrics):
+            df_cleaning = optimize_dtypes(source.to_pandas())[0]
+    if decimals is not None:
+        df_cleaning = round_numbers(df_cleaning, decimals)
+
+    with stage('autoclean', len(df_cleaning), session=session, source=source_name, records=metrics) as rec:
+        # Identical data + settings were cleaned before: reuse that result
+        job.report(0.2, "checking result cache")
+        key = cache_key(df_cleaning, clean_params)
+        cached = result_cache.get(key, use_disk=use_disk_cache)
+        if cached is not None:
+            cleaned_df, clean_log = cached
+            engine_used = 'cache'
+        else:
+            job.report(0.3, "cleaning")
+            cleaned_df, clean_log, engine_used = run_autoclean(df_cleaning, clean_params, workers,
+                                                               fast=use_fast_engine)
+            job.report(0.95, "saving to result cache")
+            result_cache.put(key, cleaned_df, clean_log, use_disk=use_disk_cache)
+        rec.update(rows_out=len(cleaned_df), engine=engine_used)
+    return {'cleaned_df': cleaned_df, 'clean_log': clean_log, 'engine': engine_used, 'workers': workers,
+            'key': key, 'metrics': metrics}
+
+
+def push_job(job, df, engine, target_table, chunk_rows, atomic, session):
+    def report_push(rows, total):
+        job.report(rows / max(total, 1), f"{rows:,} / {total:,} rows written")
+
+    metrics = []
+    schema, name = split_table_name(target_table)
+    with stage('push', len(df), session=session, source=target_table, records=metrics):
+        stats = bulk_write(df, engine, name, schema=schema, chunksize=chunk_rows, atomic=atomic,
+                           on_progress=report_push)
+    return dict(stats, table=target_table, metrics=metrics)
+
+
+@st.cache_data(ttl=SCHEMA_TTL, show_spinner="🔍 Reading schema...")
+def browse_tables(server, database):
+    return list_tables(get_engine(server, database))
+
+
+@st.cache_data(ttl=SCHEMA_TTL, show_spinner=False)
+def browse_columns(server, database, table):
+    schema, name = split_table_name(table)
+    return list_columns(get_engine(server, database), name, schema)
+
+
+def pushdown_job(job, engine, table, target_table, clean_params, session):
+    metrics = []
+    job.report(0.1, "running cleaning statement")
+    schema, name = split_table_name(table)
+    target_schema, target_name = split_table_name(target_table, schema)
+    with stage('pushdown', session=session, source=table, records=metrics) as rec:
+        summary = pushdown_clean(engine, name, target_name, clean_params, schema=schema, target_schema=target_schema)
+        rec.update(rows_in=summary['rows_in'], rows_out=summary['rows_out'])
+    return dict(summary, table=target_table, metrics=metrics)
+
+
+def batch_job(job, sources, batch_dir, clean_params, workers, session):
+    metrics, finished = [], []
+
+    def report_file(result):
+        finished.append(result)
+        job.report(len(finished) / len(sources),
+                   f"{len(finished)}/{len(sources)} files, {result['name']}: {result['status']}")
+
+    job.report(0.0, f"0/{len(sources)} files")
+    with stage('batch', session=session, source=f"{len(sources)} files", records=metrics) as rec:
+        summary = clean_uploads(sources, batch_dir, clean_params, workers, on_result=report_file)
+        rec.update(rows_in=sum(r.get('rows_in', 0) for r in summary['jobs']),
+                   rows_out=sum(r.get('rows_out', 0) for r in summary['jobs']))
+    return dict(summary, batch_dir=batch_dir, metrics=metrics)
+
+
+def out_of_core_job(job, src_path, dest_path, clean_params, chunk_rows, session):
+    metrics, total_rows = [], {}
+
+    def report_passes(pass_no, rows):
+        if pass_no == 1:
+            total_rows['n'] = rows
+            job.report(0.0, f"pass 1: {rows:,} rows scanned")
+        else:
+            job.report(rows / max(total_rows.get('n', rows), 1), f"pass 2: {rows:,} rows cleaned")
+
+    with stage('outofcore', session=session, source=src_path, records=metrics) as rec:
+        summary = clean_csv_out_of_core(src_path, dest_path, clean_params, chunksize=chunk_rows,
+                                        on_progress=report_passes)
+        rec.update(rows_in=summary['rows_in'], rows_out=summary['rows_out'])
+    return dict(summary, metrics=metrics)
+
+
+def recipe_job(job, recipe_bytes, source, session, source_name):
+    # source is the session frame or a ParquetStore
+    metrics = []
+    recipe = CleaningRecipe.from_bytes(recipe_bytes)
+    job.report(0.1, "applying recipe")
+    rows = len(source) if isinstance(source, pd.DataFrame) else source.num_rows
+    with stage('recipe_apply', rows, session=session, source=source_name, records=metrics) as rec:
+        if isinstance(source, pd.DataFrame):
+            cleaned_df, counts = recipe.transform(source)
+        else:
+            # the loaded copy is read chunk by chunk, never as a whole
+            cleaned_df, counts = recipe.transform_chunks(source.iter_chunks())
+        rec['rows_out'] = len(cleaned_df)
+    job.report(0.9, "fingerprinting result")
+    key = cache_key(cleaned_df, {'recipe': hashlib.blake2b(recipe_bytes).hexdigest()})
+    return {'cleaned_df': cleaned_df, 'counts': counts, 'key': key, 'fitted_rows': recipe.fitted_rows,
+            'created': recipe.created, 'metrics': metrics}
+
+
+def loaded(result):
+    st.session_state.pop('upload_id', None)
+    st.session_state.pop('dup_clusters', None)
+    if 'store' in result:
+        store = result['store']
+        st.session_state.store = store
+        session_data.pop('df', None)
+        st.success(f"✅ Streamed {store.num_rows:,} rows to disk ({store.size_mb:.1f} MB)")
+        if store.truncated:
+            st.warning("⚠️ Row/memory limit reached, remaining rows were not loaded.")
+    elif keep_frame('df', result['df']):
+        st.session_state.dtype_report = result['dtype_report']
+        st.session_state.pop('store', None)
+        st.success("✅ Data loaded successfully!")
+
+
+def cleaned(result):
+    if not keep_frame('cleaned_df', result['cleaned_df']):
+        return
+    st.session_state.cleaned_key = result['key']
+    st.session_state.time_display = True
+    st.session_state.clean_log = result['clean_log']
+    if result['engine'] == 'cache':
+        st.info("⚡ Loaded cleaned result from cache")
+    elif result['engine'] == 'fast':
+        st.info("⚡ Cleaned with the vectorized engine")
+    elif result['workers'] > 1 and result['engine'] == 'serial':
+        st.info("ℹ️ These settings need the serial AutoClean pipeline, worker processes were not used.")
+    st.success("✅ Cleaning complete!")
+
+
+def batch_cleaned(summary):
+    st.session_state.batch_result = summary
+    if summary['failed']:
+        st.warning(f"⚠️ {summary['succeeded']} files cleaned, {summary['failed']} failed")
+    else:
+        st.success(f"✅ Cleaned {summary['succeeded']} files in {summary['seconds']}s")
+
+
+def cleaned_out_of_core(summary):
+    st.success(f"✅ Cleaned {summary['rows_in']:,} rows into {summary['rows_out']:,} rows "
+               f"({summary['output_mb']} MB) in {summary['seconds']}s")
+    st.json({k: v for k, v in summary.items() if k != 'metrics'})
+
+
+def recipe_applied(result):
+    if not keep_frame('cleaned_df', result['cleaned_df']):
+        return
+    st.session_state.cleaned_key = result['key']
+    st.session_state.clean_log = {k: v for k, v in result['counts'].items() if v}
+    st.session_state.time_display = True
+    st.success(f"✅ Cleaned with a recipe fitted on {result['fitted_rows']:,} rows ({result['created']})")
+
+
+def pushed_down(summary):
+    st.success(f"✅ Cleaned {summary['rows_in']:,} rows into {summary['rows_out']:,} rows in {summary['table']} "
+               f"inside the database in {summary['seconds']}s")
+    with st.expander("Generated SQL"):
+        st.code(summary['sql'], language="sql")
+
+
+def pushed(stats):
+    st.success(f"✅ Saved {stats['rows']:,} rows to SQL Server as: {stats['table']} "
+               f"in {stats['seconds']}s ({stats['rows_per_sec']:,.0f} rows/sec)")
+
 # Step 1: Data Source Selection
-data_source = st.radio("📥 Select Data Source", ["Upload CSV", "Connect to SQL Server"])
+data_source = st.radio("📥 Select Data Source", ["Upload File", "Connect to SQL Server", "Large CSV on Server",
+                                                "Batch of Files"])
 
-# CSV Upload Option
-if data_source == "Upload CSV":
-    uploaded_file = st.file_uploader("📁 Upload CSV File", type=["csv"])
+# File Upload Option (CSV, Parquet or Feather; columnar files keep their dtypes)
+if data_source == "Upload File":
+    uploaded_file = st.file_uploader("📁 Upload CSV, Parquet or Feather File (CSV may be gzip, zstd, bz2 or zip "
+                                     "compressed)", type=UPLOAD_TYPES)
+    upload_columns = None
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
-        st.session_state.df = df
-        st.success("✅ CSV file loaded successfully!")
+        # only the header is read here; unselected columns are skipped by the parser
+        if st.session_state.get('upload_header', (None,))[0] != uploaded_file.file_id:
+            st.session_state.upload_header = (uploaded_file.file_id, columns_of(uploaded_file))
+        header = st.session_state.upload_header[1]
+        upload_columns = st.multiselect("🧩 Columns to load", header, default=header, key="upload_columns")
+    # read once per uploaded file and column choice, not on every rerun
+    if uploaded_file is not None and upload_columns and \
+            st.session_state.get('upload_id') != (uploaded_file.file_id, tuple(upload_columns)):
+        st.session_state.upload_id = (uploaded_file.file_id, tuple(upload_columns))
+        with stage('load', session=session_id, source=uploaded_file.name, records=perf) as rec:
+            df = read_table(uploaded_file, columns=None if upload_columns == header else upload_columns)
+            rec['rows_in'] = rec['rows_out'] = len(df)
+        with stage('coerce', len(df), session=session_id, source=uploaded_file.name, records=perf):
+            df, dtype_report = optimize_dtypes(df)
+        if keep_frame('df', df):
+            st.session_state.dtype_report = dtype_report
+            st.session_state.source_name = uploaded_file.name
+            st.session_state.pop('dup_clusters', None)
+            st.session_state.pop('store', None)
+            st.success("✅ File loaded successfully!")
 
 # SQL Server Option
 if data_source == "Connect to SQL Server":
@@ -34,35 +347,244 @@ if data_source == "Connect to SQL Server":
         query_mode = st.radio("📄 Choose how to load data:", ["Use Table Name", "Write SQL Query"])
 
         if query_mode == "Use Table Name":
-            table = st.text_input("📋 Enter Table Name", value="dbo.TestCustomers")
+            # Browsing the schema lets the load skip unneeded (wide, binary) columns
+            if st.button("🔍 Browse tables"):
+                st.session_state.browse = (server, database)
+            tables, columns = None, None
+            if st.session_state.get('browse') == (server, database):
+                try:
+                    tables = browse_tables(server, database)
+                except Exception as e:
+                    st.error(f"❌ Could not read the schema: {e}")
+            if tables:
+                row_counts = {f"{t['schema']}.{t['table']}": t['rows'] for t in tables}
+                table = st.selectbox("📋 Table", list(row_counts),
+                                     format_func=lambda n: n if row_counts[n] is None else f"{n} (~{row_counts[n]:,} rows)")
+                columns = browse_columns(server, database, table)
+            else:
+                table = st.text_input("📋 Enter Table Name", value="dbo.TestCustomers")
+            selected_columns = None
+            if columns:
+                column_types = {c['name']: c for c in columns}
+                selected_columns = st.multiselect(
+                    "🧩 Columns to load", list(column_types),
+                    default=[c['name'] for c in columns if not c['binary']],
+                    format_func=lambda n: f"{n} ({column_types[n]['type']}{', wide' if column_types[n]['wide'] else ''})")
+            load_limit = st.number_input("Load at most N rows (0 = all)", min_value=0, value=0, step=10_000)
+            sample_percent = st.slider("🎲 Sample % of the table", 1, 100, 100,
+                                       help="Random sample for fast exploratory cleaning (TABLESAMPLE on SQL Server)")
         else:
             custom_query = st.text_area("🧠 Write your SQL Query",
                                         placeholder="SELECT Name, Age FROM dbo.Customers WHERE Age > 25",
                                         height=150)
 
+        # Large tables are streamed in chunks into a parquet file instead of one in-memory frame
+        stream_load = st.checkbox("🌊 Stream large result to disk", value=False)
+        if stream_load:
+            chunk_rows = st.number_input("Rows per chunk", min_value=1_000, max_value=1_000_000,
+                                         value=DEFAULT_CHUNK_ROWS, step=10_000)
+            max_rows = st.number_input("Row limit (0 = no limit)", min_value=0, value=0, step=100_000)
+            max_mb = st.number_input("Memory limit in MB (0 = no limit)", min_value=0, value=0, step=256)
+
         if st.button("🔄 Connect and Load Data"):
             try:
-                conn_str = f"mssql+pyodbc://@{server}/{database}?trusted_connection=yes&driver=ODBC+Driver+17+for+SQL+Server"
-                engine = sqlalchemy.create_engine(conn_str)
+                engine = get_engine(server, database)
                 st.session_state.engine = engine
 
                 if query_mode == "Use Table Name":
-                    df = pd.read_sql(f"SELECT * FROM {table}", engine)
+                    schema, name = split_table_name(table)
+                    query = build_select(engine, name, schema, selected_columns or None, load_limit or None,
+                                         sample_percent)
+                    st.session_state.source_name = f"{database}.{table}"
                 else:
-                    df = pd.read_sql(custom_query, engine)
+                    query = custom_query
+                    st.session_state.source_name = f"{database} query"
 
-                st.session_state.df = df
-                st.success("✅ Data loaded successfully!")
+                if stream_load:
+                    start_job('load', load_job, engine, query, True, chunk_rows, max_rows, max_mb,
+                              session_id, st.session_state.source_name,
+                              description="Streaming query result to disk")
+                else:
+                    start_job('load', load_job, engine, query, False, None, None, None,
+                              session_id, st.session_state.source_name, description="Loading data")
 
             except Exception as e:
                 st.error(f"❌ Failed to load data: {e}")
 
+        # Push-down: the table is cleaned by SQL Server itself, no rows are loaded into the app
+        if query_mode == "Use Table Name" and st.checkbox("🏭 Clean inside SQL Server instead (push-down)"):
+            st.caption("Supports manual settings with mean/median/most_frequent/delete for missing values, "
+                       "winz/delete for outliers and duplicates.")
+            pushdown_params = {
+                'mode': 'manual',
+                'duplicates': st.selectbox("Handle Duplicates", ['auto', False], key="pushdown_duplicates"),
+                'missing_num': st.selectbox("Missing Numerical", ['median', 'mean', 'most_frequent', 'delete', False],
+                                            key="pushdown_missing_num"),
+                'missing_categ': st.selectbox("Missing Categorical", ['most_frequent', 'delete', False],
+                                              key="pushdown_missing_categ"),
+                'extract_datetime': False,
+                'outliers': st.selectbox("Handle Outliers", ['winz', 'delete', False], key="pushdown_outliers"),
+                'outlier_param': st.slider("Outlier Param (IQR Mult)", 0.5, 5.0, 1.5, 0.1, key="pushdown_outlier_param"),
+            }
+            pushdown_target = st.text_input("📌 Target Table Name", value=f"{table}_clean", key="pushdown_target")
+            if st.button("🏭 Clean in Database"):
+                try:
+                    start_job('pushdown', pushdown_job, get_engine(server, database), table, pushdown_target,
+                              pushdown_params, session_id, description=f"Cleaning {table} in the database")
+                except Exception as e:
+                    st.error(f"❌ Push-down cleaning failed: {e}")
 
+track_job('pushdown', pushed_down)
+
+# Large CSV Option: cleaned in two streaming passes, never loaded whole into memory.
+# Only files below the configured data directory can be read or written.
+if data_source == "Large CSV on Server" and not DATA_DIR:
+    st.info("ℹ️ Cleaning server files is disabled. Set DATATHERAPIST_DATA_DIR to the directory holding them.")
+elif data_source == "Large CSV on Server":
+    src_path = st.text_input(f"📄 CSV file in {DATA_DIR}", placeholder="big_export.csv")
+    dest_path = st.text_input(f"💾 Output file in {DATA_DIR} (.csv, .csv.gz or .parquet)",
+                              placeholder="big_export_clean.parquet")
+    st.caption("Supports manual settings with mean/median/most_frequent/delete for missing values, "
+               "winz/delete for outliers, duplicates and datetime conversion.")
+    ooc_params = {
+        'mode': 'manual',
+        'duplicates': st.selectbox("Handle Duplicates ", ['auto', False]),
+        'missing_num': st.selectbox("Missing Numerical ", ['median', 'mean', 'most_frequent', 'delete', False]),
+        'missing_categ': st.selectbox("Missing Categorical ", ['most_frequent', 'delete', False]),
+        'extract_datetime': st.selectbox("Extract DateTime ", ['s', 'D', 'M', 'Y', 'h', 'm', False]),
+        'outliers': st.selectbox("Handle Outliers ", ['winz', 'delete', False]),
+        'outlier_param': st.slider("Outlier Param (IQR Mult) ", 0.5, 5.0, 1.5, 0.1),
+    }
+    ooc_chunk_rows = st.number_input("Rows per chunk ", min_value=1_000, max_value=1_000_000,
+                                     value=OOC_CHUNK_ROWS, step=10_000)
+
+    if st.button("🧼 Clean Large CSV") and src_path and dest_path:
+        try:
+            src_file, dest_file = data_path(src_path), data_path(dest_path)
+            start_job('outofcore', out_of_core_job, src_file, dest_file, ooc_params, ooc_chunk_rows, session_id,
+                      description=f"Cleaning {os.path.basename(src_file)}")
+        except ValueError as e:
+            st.error(f"❌ {e}")
+
+    track_job('outofcore', cleaned_out_of_core)
+
+# Batch Option: many files cleaned with the same settings in worker processes
+if data_source == "Batch of Files":
+    batch_files = st.file_uploader("📚 Upload files or zip archives", type=UPLOAD_TYPES, accept_multiple_files=True)
+    st.caption("Each file is cleaned on its own; zip archives holding several files are unpacked.")
+    batch_params = {'mode': st.selectbox("Cleaning Mode", ['auto', 'manual'], key="batch_mode")}
+    if batch_params['mode'] == 'manual':
+        batch_params.update({
+            # only values AutoClean 1.1.3 accepts; a rejected one would fail every file
+            'duplicates': st.selectbox("Handle Duplicates", ['auto', False], key="batch_duplicates"),
+            'missing_num': st.selectbox("Missing Numerical", ['auto', 'knn', 'mean', 'median', 'most_frequent',
+                                                              'delete', False], key="batch_missing_num"),
+            'missing_categ': st.selectbox("Missing Categorical", ['auto', 'knn', 'most_frequent', 'delete', False],
+                                          key="batch_missing_categ"),
+            'extract_datetime': st.selectbox("Extract DateTime", ['auto', 'D', 'M', 'Y', 'h', 'm', 's', False],
+                                             key="batch_extract_datetime"),
+            'outliers': st.selectbox("Handle Outliers", ['auto', 'winz', 'delete', False], key="batch_outliers"),
+            'outlier_param': st.slider("Outlier Param (IQR Mult)", 0.5, 5.0, 1.5, 0.1, key="batch_outlier_param"),
+        })
+    cpus = os.cpu_count() or 1
+    batch_workers = st.slider("🧵 Files cleaned at the same time", 1, max(cpus, 2), min(2, cpus))
+    if st.button("🧺 Clean all files", disabled=not batch_files):
+        remove_old_batches()
+        batch_dir = new_batch_dir()
+        sources, skipped = save_uploads(batch_files, batch_dir)
+        if skipped:
+            st.warning(f"⚠️ Skipped unsupported files: {', '.join(skipped)}")
+        if sources:
+            st.session_state.pop('batch_result', None)
+            start_job('batch', batch_job, sources, batch_dir, batch_params, batch_workers, session_id,
+                      description=f"Cleaning {len(sources)} files")
+
+    track_job('batch', batch_cleaned)
+
+    batch = st.session_state.get('batch_result')
+    if batch:
+        files_df = pd.DataFrame([{'file': r['name'], 'status': r['status'], 'rows_in': r.get('rows_in'),
+                                  'rows_out': r.get('rows_out'), 'engine': r.get('engine'),
+                                  'seconds': r['timings'].get('total'), 'error': r.get('error')}
+                                 for r in batch['jobs']])
+        st.dataframe(files_df, use_container_width=True, hide_index=True)
+        outputs = {r['name']: r['output'] for r in batch['jobs'] if r['status'] == 'ok'}
+        if outputs:
+            combined = st.selectbox("📦 Combined download", ['zip_parquet', 'zip_csv', 'parquet'],
+                                    format_func={'zip_parquet': "Zip of Parquet files", 'zip_csv': "Zip of CSV files",
+                                                 'parquet': "One Parquet file with all rows"}.get)
+            combined_path = os.path.join(batch['batch_dir'],
+                                         "cleaned_files.parquet" if combined == 'parquet' else f"{combined}.zip")
+            # built on request, once per batch and choice; the button is only rendered in the
+            # run after the click, so idle reruns never read the file
+            if st.button("📦 Prepare combined download"):
+                if not os.path.exists(combined_path):
+                    with stage('download', sum(r.get('rows_out', 0) for r in batch['jobs']), session=session_id,
+                               source=f"{len(outputs)} files", records=perf):
+                        if combined == 'parquet':
+                            combine_parquet(outputs, combined_path + ".partial")
+                        else:
+                            zip_outputs(outputs, combined_path + ".partial",
+                                        'csv' if combined == 'zip_csv' else 'parquet')
+                        os.replace(combined_path + ".partial", combined_path)
+                with open(combined_path, 'rb') as combined_file:
+                    st.download_button("⬇️ Download cleaned files", combined_file, os.path.basename(combined_path),
+                                       mime_type('parquet') if combined == 'parquet' else 'application/zip',
+                                       on_click='ignore')
+
+# Finished loads are picked up here, also by a page that reconnected meanwhile
+track_job('load', loaded)
 
 # Show original data
-if 'df' in st.session_state:
+if 'df' in session_data or 'store' in st.session_state:
+    # cleaning is likely next: import AutoClean in the background while the user configures it
+    warm_up(('AutoClean',))
     st.subheader("📊 Original Data")
-    st.dataframe(st.session_state.df)
+    if 'df' in session_data:
+        show_preview(session_data['df'], "original", version=session_data.generation('df'))
+        report = st.session_state.get('dtype_report')
+        if report:
+            st.caption(f"🪶 Compact dtypes: {report['memory_mb_before']} MB -> {report['memory_mb_after']} MB "
+                       f"({report['saved_pct']}% saved)")
+            if report['columns']:
+                with st.expander("Column dtype changes"):
+                    st.json(report['columns'])
+    else:
+        store = st.session_state.store
+        st.caption(f"{store.num_rows:,} rows stored on disk, pages are read from the file")
+        show_preview(store, "original")
+
+    # Exact or near-duplicate clusters on chosen key columns, before any cleaning
+    with st.expander("🔁 Duplicate finder"):
+        all_columns = list(session_data['df'].columns) if 'df' in session_data else st.session_state.store.columns
+        dup_columns = st.multiselect("Key columns (empty = whole row)", all_columns, key="dup_columns")
+        dup_near = st.checkbox("Include near duplicates (case, accents, punctuation, typos)", key="dup_near")
+        dup_threshold = st.slider("Similarity threshold", 0.5, 1.0, DUP_THRESHOLD, 0.05, key="dup_threshold",
+                                  disabled=not dup_near)
+        if st.button("🔎 Find duplicates"):
+            source = session_data['df'] if 'df' in session_data else st.session_state.store
+            with stage('dedup', source.num_rows if 'store' in st.session_state else len(source), session=session_id,
+                       source=st.session_state.get('source_name'), records=perf) as rec:
+                if 'df' in session_data:
+                    clusters = find_duplicates(source, dup_columns or None, dup_near, dup_threshold)
+                else:
+                    # streamed from the Parquet file, one chunk at a time
+                    clusters = find_duplicates_in_chunks(source.iter_chunks(columns=dup_columns or None),
+                                                         None, dup_near, dup_threshold)
+                rec['rows_out'] = rec['rows_in'] - (len(clusters) - clusters['cluster'].nunique())
+            st.session_state.dup_clusters = clusters
+        clusters = st.session_state.get('dup_clusters')
+        if clusters is not None:
+            repeats = len(clusters) - clusters['cluster'].nunique()
+            st.write(f"{clusters['cluster'].nunique():,} clusters, {repeats:,} rows beyond the first of each")
+            if 'df' in session_data and len(clusters):
+                st.dataframe(cluster_summary(session_data['df'], clusters), use_container_width=True, hide_index=True)
+                if st.button("🗑️ Keep only the first row of each cluster"):
+                    if keep_frame('df', keep_first(session_data['df'], clusters)):
+                        st.session_state.pop('dup_clusters')
+                        st.rerun()
+            elif len(clusters):
+                st.dataframe(clusters.head(1000), use_container_width=True, hide_index=True)
 
     # Step 3: Mode selection
     st.subheader("⚙️ Cleaning Configuration")
@@ -91,46 +613,125 @@ if 'df' in st.session_state:
         clean_params['logfile'] = st.checkbox("Create Log File", True)
         clean_params['verbose'] = st.checkbox("Verbose Output", False)
 
+    # Per-column stages can be spread over several processes; 1 keeps the plain AutoClean run
+    workers = st.slider("🧵 Worker processes", 1, max(os.cpu_count() or 1, 2), 1)
+    use_fast_engine = st.checkbox("⚡ Use vectorized engine for simple strategies", value=True)
+    use_disk_cache = st.checkbox("💾 Reuse cleaned results across sessions (disk cache)", value=True)
+    round_input = st.checkbox("🔢 Round numbers to 2 decimals before cleaning", value=True)
+
     # Step 4: Run cleaning
+    if 'df' not in session_data:
+        store = st.session_state.store
+        st.info(f"ℹ️ AutoClean needs the whole table in memory: cleaning loads all {store.num_rows:,} rows "
+                f"of the on-disk copy ({store.size_mb:.0f} MB compressed). A cleaning recipe below works "
+                f"chunk by chunk instead.")
     if st.button("🧼 Run AutoClean"):
-        try:
-            df_cleaning = st.session_state.df.copy()
-            for col in df_cleaning.select_dtypes(include=['number']).columns:
-                df_cleaning[col] = pd.to_numeric(df_cleaning[col], errors='coerce').astype('float64').round(2)
+        source = session_data['df'] if 'df' in session_data else st.session_state.store
+        start_job('clean', clean_job, source, clean_params, workers, use_fast_engine, use_disk_cache,
+                  2 if round_input else None, session_id, st.session_state.get('source_name'),
+                  description="Cleaning")
+
+    # Recipes: learn fill values, bounds, encoders and datetime formats once, apply them to later data
+    with st.expander("🧾 Cleaning recipe (fit once, apply to new data)"):
+        source = session_data['df'] if 'df' in session_data else st.session_state.store
+        rows = len(source) if 'df' in session_data else source.num_rows
+        if st.button("📐 Fit recipe on this data with the settings above"):
+            try:
+                with stage('recipe_fit', rows, session=session_id, source=st.session_state.get('source_name'),
+                           records=perf):
+                    recipe = CleaningRecipe.fit(source, clean_params) if 'df' in session_data \
+                        else CleaningRecipe.fit_chunks(source.iter_chunks(), clean_params)
+                st.session_state.recipe = recipe.to_bytes()
+            except RecipeUnsupported as e:
+                st.error(f"❌ {e}")
+        if 'recipe' in st.session_state:
+            recipe = CleaningRecipe.from_bytes(st.session_state.recipe)
+            # fill values mix numbers and text
+            st.dataframe(pd.DataFrame(recipe.summary()).astype({'fill': 'string'}), use_container_width=True,
+                         hide_index=True)
+            st.download_button("⬇️ Download recipe", st.session_state.recipe, "cleaning" + RECIPE_EXTENSION,
+                               "application/gzip")
+        recipe_file = st.file_uploader("📥 Apply a saved recipe to this data", type=["gz"], key="recipe_file")
+        if recipe_file is not None and st.button("🧾 Clean with recipe"):
+            start_job('recipe', recipe_job, recipe_file.getvalue(), source, session_id,
+                      st.session_state.get('source_name'), description="Cleaning with recipe")
 
-            pipeline = AutoClean(df_cleaning, **clean_params)
-            cleaned_df = pipeline.output[df_cleaning.columns]
-            st.session_state.cleaned_df = cleaned_df
-            st.success("✅ Cleaning complete!")
+    cache_stats = result_cache.summary()
+    st.caption(f"🗃️ Result cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits "
+               f"({cache_stats['disk_hits']} from disk), {cache_stats['misses']} misses, "
+               f"{cache_stats['entries']} in memory ({cache_stats['memory_mb']} MB), "
+               f"{cache_stats['disk_mb']} MB on disk")
 
-            st.subheader("🧽 Cleaned Data")
-            st.dataframe(cleaned_df)
+track_job('clean', cleaned)
+track_job('recipe', recipe_applied)
 
-            if hasattr(pipeline, 'log'):
-                st.subheader("⚠️ AutoClean Log")
-                for k, v in pipeline.log.items():
-                    st.write(f"🔸 {k}: {v}")
+# Step 5: Cleaned result, shown outside the button so paging survives reruns
+if 'cleaned_df' in session_data:
+    st.subheader("🧽 Cleaned Data")
+    # timed once per cleaning run, not on every rerun
+    timed = st.session_state.pop('time_display', False)
+    with (stage('display', len(session_data['cleaned_df']), session=session_id,
+                source=st.session_state.get('source_name'), records=perf) if timed else nullcontext()):
+        show_preview(session_data['cleaned_df'], "cleaned", version=session_data.generation('cleaned_df'))
 
-        except Exception as e:
-            st.error(f"❌ Cleaning failed: {e}")
+    clean_log = st.session_state.get('clean_log')
+    if clean_log:
+        st.subheader("⚠️ AutoClean Log")
+        for k, v in clean_log.items():
+            st.write(f"🔸 {k}: {v}")
 
 # Step 6: Save & Download cleaned data
-if 'cleaned_df' in st.session_state:
-    st.download_button("⬇️ Download Cleaned CSV",
-                       st.session_state.cleaned_df.to_csv(index=False),
-                       "cleaned_data.csv",
-                       "text/csv")
+if 'cleaned_df' in session_data:
+    out_format = st.selectbox("📦 Download format", list(COMPRESSION_OPTIONS),
+                              format_func=FORMAT_LABELS.get)
+    out_compression = st.selectbox("🗜️ Compression", COMPRESSION_OPTIONS[out_format],
+                                   format_func=lambda c: c or 'none')
+    # the file is written once per result and format when asked for; the download button
+    # (which reads the whole file) is only rendered in the run after the click, so idle
+    # reruns never touch the file
+    if st.button("📦 Prepare download"):
+        export_key = st.session_state.cleaned_key
+        timed = not exports.ready(export_key, out_format, out_compression)
+        with (stage('download', len(session_data['cleaned_df']), session=session_id,
+                    source=st.session_state.get('source_name'), records=perf) if timed else nullcontext()):
+            export_path = exports.get(export_key, session_data['cleaned_df'], out_format, out_compression)
+        with open(export_path, 'rb') as export_file:
+            st.download_button(f"⬇️ Download Cleaned {FORMAT_LABELS[out_format]}", export_file,
+                               file_name("cleaned_data", out_format, out_compression),
+                               mime_type(out_format, out_compression), on_click='ignore')
 
     if data_source == "Connect to SQL Server":
         st.subheader("🛠️ Save Cleaned Data to SQL Server")
         target_table = st.text_input("📌 Target Table Name", value="dbo.cleaned_data")
+        push_chunk_rows = st.number_input("Rows per insert batch", min_value=500, max_value=500_000,
+                                          value=DEFAULT_BATCH_ROWS, step=5_000)
+        atomic_swap = st.checkbox("🔒 Load into staging table, then swap", value=True)
         if st.button("🚀 Push to SQL Server"):
-            try:
-                st.session_state.cleaned_df.to_sql(name=target_table.split('.')[-1],
-                                                   con=st.session_state.engine,
-                                                   schema=target_table.split('.')[0],
-                                                   if_exists='replace',
-                                                   index=False)
-                st.success(f"✅ Saved to SQL Server as: {target_table}")
-            except Exception as e:
-                st.error(f"❌ Failed to save: {e}")
+            if 'engine' not in st.session_state:
+                st.error("❌ No SQL Server connection in this session. Connect and load data first.")
+            else:
+                start_job('push', push_job, session_data['cleaned_df'], st.session_state.engine, target_table,
+                          push_chunk_rows, atomic_swap, session_id, description=f"Writing {target_table}")
+
+track_job('push', pushed)
+
+# Performance panel: where the time and memory of this session went
+del perf[:-MAX_PERF_RECORDS]
+with st.expander("⏱️ Performance"):
+    if perf:
+        perf_df = pd.DataFrame(perf)
+        columns = ['started', 'stage', 'source', 'seconds', 'cpu_seconds', 'peak_rss_delta_mb',
+                   'rows_in', 'rows_out', 'rows_per_sec', 'status']
+        st.dataframe(perf_df[[c for c in columns if c in perf_df]], use_container_width=True, hide_index=True)
+        st.caption(f"Session {session_id}: {perf_df['seconds'].sum():.2f}s in {len(perf_df)} stages; "
+                   f"logged to the server's metrics directory")
+    usage, server = session_data.usage(), frames.summary()
+    st.caption(f"🧠 Session memory: {usage['memory_mb']} MB of {usage['quota_mb']} MB, {usage['spilled_mb']} MB "
+               f"spilled to disk while idle; server: {server['memory_mb']} MB of {server['quota_mb']} MB "
+               f"in {server['sessions']} sessions, {server['spilled_mb']} MB spilled")
+    st.caption("🚀 Heavy library imports in this server process")
+    st.dataframe(pd.DataFrame(import_report()), use_container_width=True, hide_index=True)
+    pools = pool_status()
+    if pools:
+        st.caption("🔌 SQL Server connection pools shared by all sessions")
+        st.dataframe(pd.DataFrame(pools), use_container_width=True, hide_index=True)
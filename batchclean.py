@@ -0,0 +1,213 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Headless batch cleaning. A manifest (JSON or YAML) lists the jobs:
+#
+#   defaults:                      # merged into every job
+#     clean_params: {mode: auto}
+#   jobs:
+#     - name: customers
+#       source: {path: data/customers.csv}
+#       output: {path: out/customers.parquet}
+#     - name: orders
+#       source: {server: SQL01, database: Sales, table: dbo.Orders}   # or query: SELECT ...
+#       clean_params: {mode: manual, missing_num: median, outliers: winz}
+#       output: {server: SQL01, database: Sales, table: dbo.orders_clean}
+#     - name: events
+#       source: {path: data/events.csv, out_of_core: true}            # two-pass, for huge CSVs
+#       output: {path: out/events.parquet}
+#     - name: payments                                               # only rows past the watermark
+#       source: {server: SQL01, database: Sales, table: dbo.Payments, watermark: PaymentId}
+#       clean_params: {mode: manual, missing_num: median, outliers: winz}
+#       output: {server: SQL01, database: Sales, table: dbo.payments_clean, mode: merge, keys: [PaymentId]}
+#
+# Jobs run in separate processes, at most --workers at a time, and the summary lists
+# per-job status, row counts and timings.
+
+DEFAULT_CLEAN_PARAMS = {
+    'mode': 'auto',
+    'duplicates': 'auto',
+    'missing_num': 'auto',
+    'missing_categ': 'auto',
+    'encode_categ': 'auto',
+    'extract_datetime': 'auto',
+    'outliers': 'auto',
+    'outlier_param': 1.5,
+    'logfile': False,
+    'verbose': False
+}
+
+
+def load_manifest(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    defaults = manifest.get('defaults', {})
+    jobs, names = [], set()
+    for i, job in enumerate(manifest.get('jobs', [])):
+        if 'source' not in job or 'output' not in job:
+            raise ValueError(f"Job {i} needs a source and an output")
+        name = job.get('name', f"job{i}")
+        if name in names:
+            raise ValueError(f"Job {i}: the name '{name}' is used by an earlier job; job names must be unique")
+        names.add(name)
+        jobs.append({
+            'name': name,
+            'source': {**defaults.get('source', {}), **job['source']},
+            'output': {**defaults.get('output', {}), **job['output']},
+            'clean_params': {**DEFAULT_CLEAN_PARAMS, **defaults.get('clean_params', {}),
+                             **job.get('clean_params', {})},
+            'workers': job.get('workers', defaults.get('workers', 1)),   # processes inside one clean
+        })
+    return jobs
+
+
+def _sql_engine(spec):
+    from connections import DEFAULT_DRIVER, get_engine
+    return get_engine(spec['server'], spec['database'], spec.get('driver', DEFAULT_DRIVER))
+
+
+def _load(source):
+    import pandas as pd
+    from dtypeplanner import optimize_dtypes
+    from fileformats import read_table
+    if 'path' in source:
+        df = read_table(source['path'])
+    else:
+        query = source.get('query') or f"SELECT * FROM {source['table']}"
+        df = pd.read_sql(query, _sql_engine(source))
+    return optimize_dtypes(df)[0]
+
+
+def _write(df, output):
+    from bulkwriter import DEFAULT_BATCH_ROWS, bulk_write, split_table_name
+    from fileformats import save_table
+    if 'path' in output:
+        os.makedirs(os.path.dirname(os.path.abspath(output['path'])), exist_ok=True)
+        return {'output_mb': round(save_table(df, output['path'], output.get('compression')) / 1024 ** 2, 2)}
+    schema, name = split_table_name(output['table'], output.get('schema'))
+    stats = bulk_write(df, _sql_engine(output), name, schema=schema,
+                       if_exists=output.get('if_exists', 'replace'),
+                       chunksize=output.get('chunksize', DEFAULT_BATCH_ROWS),
+                       atomic=output.get('atomic', True))
+    return {'rows_per_sec': stats['rows_per_sec']}
+
+
+def run_job(job):
+    # runs in a worker process; never raises, failures end up in the summary
+    from loguru import logger
+    logger.remove()
+    summary = {'name': job['name'], 'status': 'ok', 'timings': {}}
+    start = time.perf_counter()
+    # AutoClean prints its progress; stdout is shared with the parent, which prints the JSON summary there
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            source, output = job['source'], job['output']
+            if source.get('watermark'):
+                from bulkwriter import split_table_name
+                from incremental import run_incremental
+                schema, table = split_table_name(source['table'])
+                target_schema, target_table = split_table_name(output['table'], output.get('schema'))
+                result = run_incremental(job['name'], _sql_engine(source), table, source['watermark'],
+                                         _sql_engine(output), target_table, job['clean_params'], schema=schema,
+                                         target_schema=target_schema, mode=output.get('mode', 'append'),
+                                         keys=output.get('keys'))
+                summary.update(rows_in=result['rows_in'], rows_out=result['rows_out'], engine='incremental',
+                               watermark=result['watermark_to'])
+                summary['timings']['clean'] = result['seconds']
+            elif source.get('out_of_core'):
+                from outofcore import clean_csv_out_of_core
+                if 'path' not in output:
+                    raise ValueError("out_of_core jobs write to a file output")
+                os.makedirs(os.path.dirname(os.path.abspath(output['path'])), exist_ok=True)
+                result = clean_csv_out_of_core(source['path'], output['path'], job['clean_params'],
+                                               chunksize=source.get('chunksize', 100_000))
+                summary.update(rows_in=result['rows_in'], rows_out=result['rows_out'], engine='out_of_core',
+                               output_mb=result['output_mb'])
+                summary['timings']['clean'] = result['seconds']
+            else:
+                from cleaning import run_autoclean
+                t = time.perf_counter()
+                df = _load(source)
+                summary['timings']['load'] = round(time.perf_counter() - t, 3)
+
+                t = time.perf_counter()
+                cleaned_df, _, engine_used = run_autoclean(df, job['clean_params'], job['workers'])
+                summary['timings']['clean'] = round(time.perf_counter() - t, 3)
+                summary.update(rows_in=len(df), rows_out=len(cleaned_df), engine=engine_used)
+                del df
+
+                t = time.perf_counter()
+                summary.update(_write(cleaned_df, output))
+                summary['timings']['write'] = round(time.perf_counter() - t, 3)
+        except Exception as e:
+            summary.update(status='failed', error=f"{type(e).__name__}: {e}")
+    summary['timings']['total'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def run_batch(jobs, workers=2, on_result=None):
+    start = time.perf_counter()
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # the worker process died (killed for memory, BrokenProcessPool); the other jobs go on
+                    result = {'name': jobs[futures[future]]['name'], 'status': 'failed',
+                              'error': f"{type(e).__name__}: {e}", 'timings': {'total': None}}
+                results.append((futures[future], result))
+                if on_result is not None:
+                    on_result(result)
+        except BaseException:
+            # e.g. a cancelled UI job: jobs not started yet are dropped, running ones finish
+            for future in futures:
+                future.cancel()
+            raise
+    results = [result for _, result in sorted(results, key=lambda r: r[0])]   # manifest order
+    return {'jobs': results,
+            'succeeded': sum(r['status'] == 'ok' for r in results),
+            'failed': sum(r['status'] != 'ok' for r in results),
+            'workers': workers,
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean many CSV files or SQL tables without the UI.")
+    parser.add_argument("manifest", help="JSON or YAML manifest with the jobs")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 2) // 2, 1),
+                        help="jobs running at the same time")
+    parser.add_argument("--summary", help="write the JSON summary to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+
+    def log(result):
+        status = result['status'] if result['status'] == 'ok' else f"failed ({result['error']})"
+        print(f"[{result['name']}] {status} in {result['timings']['total']}s", file=sys.stderr)
+
+    summary = run_batch(jobs, args.workers, on_result=log)
+    text = json.dumps(summary, indent=2, default=str)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
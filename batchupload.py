@@ -0,0 +1,209 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from batchclean import DEFAULT_CLEAN_PARAMS, run_batch
+from fileformats import format_of
+
+# Many uploaded files cleaned with the same settings. Uploads are spooled to a batch
+# directory (zip archives holding several files are unpacked, a zip with a single CSV
+# is read as a compressed CSV), every file becomes a batchclean job, and the jobs run
+# in batchclean's bounded process pool. Each cleaned file is kept as Parquet, from
+# which the combined downloads are built: a zip of the files (Parquet or CSV) or one
+# Parquet file with all rows and a source_file column. Files unpacked from a zip keep
+# their folder in the name (a/data.csv becomes a__data.csv), so every output can be
+# traced back to its source. Unpacking stops at MAX_UNPACKED_MB per batch, counted on
+# the bytes actually written rather than the sizes the archive declares.
+
+BATCH_DIR = os.environ.get("DATATHERAPIST_BATCH_DIR",
+                           os.path.join(tempfile.gettempdir(), "datatherapist_batches"))
+SOURCE_COLUMN = 'source_file'
+COPY_BUFFER_BYTES = 1024 ** 2
+MAX_UNPACKED_MB = int(os.environ.get("DATATHERAPIST_MAX_UNPACKED_MB", 4096))
+PATH_SEPARATOR = '__'
+
+
+def new_batch_dir(directory=None):
+    directory = directory or BATCH_DIR
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.mkdtemp(prefix="batch_", dir=directory)
+
+
+def _supported(name):
+    try:
+        format_of(name)
+        return True
+    except ValueError:
+        return False
+
+
+def _flat_name(path):
+    # relative path as one file name; drive letters, '..' and odd characters are dropped
+    parts = [re.sub(r'[^\w.\- ]', '_', p) for p in re.split(r'[\\/]', path)
+             if p not in ('', '.', '..') and not re.fullmatch(r'[A-Za-z]:', p)]
+    parts = [p for p in parts if p.strip('_')] or ['file']
+    return PATH_SEPARATOR.join(parts)
+
+
+def _unique_name(name, taken):
+    stem, ext = os.path.splitext(_flat_name(name))
+    candidate, i = stem + ext, 1
+    while candidate in taken:
+        i += 1
+        candidate = f"{stem}_{i}{ext}"
+    taken.add(candidate)
+    return candidate
+
+
+def _spool(file, path):
+    file.seek(0)
+    with open(path, 'wb') as out:
+        shutil.copyfileobj(file, out, COPY_BUFFER_BYTES)
+    file.seek(0)
+
+
+def _unpack(src, path, budget):
+    # copies an archive member to path; returns the bytes written, or None (and no file)
+    # when the member would take the batch past its budget
+    written = 0
+    with open(path, 'wb') as out:
+        while True:
+            block = src.read(COPY_BUFFER_BYTES)
+            if not block:
+                return written
+            written += len(block)
+            if written > budget:
+                break
+            out.write(block)
+    os.remove(path)
+    return None
+
+
+def save_uploads(files, batch_dir, max_unpacked_mb=MAX_UNPACKED_MB):
+    # writes uploads (file-like objects with a name) into batch_dir/input;
+    # returns [{'name', 'path'}] and the names that were skipped
+    input_dir = os.path.join(batch_dir, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    sources, skipped, taken = [], [], set()
+    budget = max_unpacked_mb * 1024 ** 2
+    for file in files:
+        if file.name.lower().endswith('.zip') and zipfile.is_zipfile(file):
+            archive = zipfile.ZipFile(file)
+            members = [m for m in archive.infolist() if not m.is_dir() and not m.filename.startswith('__MACOSX')]
+            if len(members) > 1:
+                for member in members:
+                    if not _supported(member.filename) or member.filename.lower().endswith('.zip'):
+                        skipped.append(f"{file.name}/{member.filename}")
+                        continue
+                    name = _unique_name(member.filename, taken)
+                    written = None
+                    if member.file_size <= budget:
+                        with archive.open(member) as src:
+                            written = _unpack(src, os.path.join(input_dir, name), budget)
+                    if written is None:
+                        skipped.append(f"{file.name}/{member.filename} (over the {max_unpacked_mb} MB unpack limit)")
+                        continue
+                    budget -= written
+                    sources.append({'name': name, 'path': os.path.join(input_dir, name)})
+                continue
+        if not _supported(file.name):
+            skipped.append(file.name)
+            continue
+        name = _unique_name(file.name, taken)
+        _spool(file, os.path.join(input_dir, name))
+        sources.append({'name': name, 'path': os.path.join(input_dir, name)})
+    return sources, skipped
+
+
+def batch_jobs(sources, batch_dir, clean_params):
+    # one batchclean job per file, each writing batch_dir/output/<name>.parquet
+    output_dir = os.path.join(batch_dir, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    return [{'name': s['name'], 'source': {'path': s['path']},
+             'output': {'path': os.path.join(output_dir, s['name'] + ".parquet")},
+             'clean_params': {**DEFAULT_CLEAN_PARAMS, **clean_params}, 'workers': 1}
+            for s in sources]
+
+
+def clean_uploads(sources, batch_dir, clean_params, workers=2, on_result=None):
+    # runs the batch; adds each job's output path to its summary
+    jobs = batch_jobs(sources, batch_dir, clean_params)
+    outputs = {job['name']: job['output']['path'] for job in jobs}
+    summary = run_batch(jobs, workers, on_result=on_result)
+    for result in summary['jobs']:
+        if result['status'] == 'ok':
+            result['output'] = outputs[result['name']]
+    return summary
+
+
+def _combined_type(types):
+    # one type for a column that was inferred differently in different files
+    # (compact dtypes differ between files: uint8 here, int32 there)
+    types = [t for t in types if not pa.types.is_null(t)] or types
+    if all(t == types[0] for t in types):
+        return types[0]
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+def combine_parquet(outputs, dest, source_column=SOURCE_COLUMN):
+    # concatenates {name: parquet path} into dest one file at a time; columns are matched by name
+    schemas = {name: pq.read_schema(path) for name, path in outputs.items()}
+    columns = []
+    for schema in schemas.values():
+        columns += [n for n in schema.names if n not in columns and not n.startswith('__index_level_')]
+    types = {c: _combined_type([s.field(c).type for s in schemas.values() if c in s.names]) for c in columns}
+    schema = pa.schema([(source_column, pa.string())] + [(c, types[c]) for c in columns])
+    rows = 0
+    with pq.ParquetWriter(dest, schema, compression='zstd') as writer:
+        for name, path in outputs.items():
+            table = pq.read_table(path)
+            arrays = [pa.array([name] * table.num_rows, pa.string())]
+            for c in columns:
+                if c in table.column_names:
+                    arrays.append(table[c].cast(types[c]))
+                else:
+                    arrays.append(pa.nulls(table.num_rows, types[c]))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += table.num_rows
+    return {'rows': rows, 'files': len(outputs), 'size_mb': round(os.path.getsize(dest) / 1024 ** 2, 2)}
+
+
+def zip_outputs(outputs, dest, fmt='parquet'):
+    # zip of the cleaned files, as Parquet or (deflated) CSV
+    from exporter import write_csv
+    compression = zipfile.ZIP_STORED if fmt == 'parquet' else zipfile.ZIP_DEFLATED
+    taken = set()
+    with zipfile.ZipFile(dest, 'w', compression=compression) as archive:
+        for name, path in outputs.items():
+            # from the unique upload name, extension included: jan.csv and jan.parquet
+            # become jan_csv_clean.parquet and jan_parquet_clean.parquet
+            member = _unique_name(f"{name.replace('.', '_')}_clean.{'parquet' if fmt == 'parquet' else 'csv'}",
+                                  taken)
+            if fmt == 'parquet':
+                archive.write(path, member)
+            else:
+                csv_path = os.path.splitext(path)[0] + "_clean.csv"
+                write_csv(pq.read_table(path).to_pandas(), csv_path)
+                archive.write(csv_path, member)
+                os.remove(csv_path)
+    return os.path.getsize(dest)
+
+
+def remove_old_batches(directory=None, max_age_seconds=24 * 3600):
+    # batch directories are left for the downloads; this clears the stale ones
+    directory = directory or BATCH_DIR
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith("batch_") and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
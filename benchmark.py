@@ -0,0 +1,196 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from instrumentation import stage
+
+# End-to-end benchmark of the app's pipeline on synthetic data:
+#   csv_parse -> sql_load -> dtype_coercion -> fast_clean -> autoclean -> csv_export -> sql_push
+# csv_parse is the app's ingest.read_csv. fast_clean times the vectorized engine with
+# the app's default manual settings, autoclean the AutoClean pipeline itself (parallel
+# with --workers > 1) with settings AutoClean 1.1.3 runs; the export and push stages
+# use AutoClean's result.
+# A local SQLite file stands in for SQL Server. Each stage reports wall time, peak
+# resident memory above the level at its start, and rows per second. Results are
+# written as JSON so runs can be compared over time:
+#
+#   python benchmark.py --rows 10000 100000 1000000 --output bench.json
+
+STAGES = ('csv_parse', 'sql_load', 'dtype_coercion', 'fast_clean', 'autoclean', 'csv_export', 'sql_push')
+# AutoClean 1.1.3 fails in auto mode on integer columns with gaps (which the generator
+# produces), raises for missing_num mean/median, and cannot winsorize the nullable
+# integers its own imputation creates; these settings run through
+DEFAULT_CLEAN_PARAMS = {'mode': 'manual', 'duplicates': 'auto', 'missing_num': 'auto',
+                        'missing_categ': 'most_frequent', 'outliers': 'delete', 'outlier_param': 1.5,
+                        'extract_datetime': 's', 'encode_categ': False}
+# the app's default manual settings, handled by the vectorized engine
+FAST_CLEAN_PARAMS = {'mode': 'manual', 'duplicates': 'auto', 'missing_num': 'median',
+                     'missing_categ': 'most_frequent', 'outliers': 'winz', 'outlier_param': 1.5,
+                     'extract_datetime': 's', 'encode_categ': False}
+CATEGORIES = 20
+
+
+def generate(rows, num_cols=8, cat_cols=4, datetime_cols=1, null_rate=0.05, outlier_rate=0.01,
+             duplicate_rate=0.02, seed=0):
+    # synthetic frame with the problems AutoClean handles: gaps, outliers, duplicates, dates as text
+    rng = np.random.default_rng(seed)
+    unique_rows = max(rows - int(rows * duplicate_rate), 1)
+    data = {}
+    for i in range(num_cols):
+        if i % 2:
+            values = rng.integers(0, 1_000, unique_rows).astype('float64')
+        else:
+            values = rng.normal(100, 15, unique_rows).round(2)
+        outliers = rng.random(unique_rows) < outlier_rate
+        values[outliers] *= rng.choice([-20, 20], outliers.sum())
+        values[rng.random(unique_rows) < null_rate] = np.nan
+        data[f"num_{i}"] = values
+    for i in range(cat_cols):
+        labels = np.array([f"cat{i}_{k}" for k in range(CATEGORIES)], dtype=object)
+        values = labels[rng.integers(0, CATEGORIES, unique_rows)]
+        values[rng.random(unique_rows) < null_rate] = None
+        data[f"cat_{i}"] = values
+    start = np.datetime64('2020-01-01T00:00:00')
+    for i in range(datetime_cols):
+        seconds = rng.integers(0, 5 * 365 * 86_400, unique_rows)
+        data[f"date_{i}"] = np.datetime_as_string(start + seconds.astype('timedelta64[s]'))
+    df = pd.DataFrame(data)
+    if rows > unique_rows:
+        copies = df.iloc[rng.integers(0, unique_rows, rows - unique_rows)]
+        df = pd.concat([df, copies], ignore_index=True).sample(frac=1, random_state=seed).reset_index(drop=True)
+    return df
+
+
+def _stage(results, name, rows_in, fn):
+    with stage(name, rows_in, log=False) as rec:
+        out = fn()
+        if isinstance(out, pd.DataFrame):
+            rec['rows_out'] = len(out)
+    results[name] = {k: rec[k] for k in ('seconds', 'cpu_seconds', 'peak_rss_delta_mb', 'rows_in', 'rows_out',
+                                         'rows_per_sec')}
+    return out
+
+
+def run_benchmark(rows, clean_params, workers=1, fast=True, work_dir=None, seed=0, fast_params=None, **gen_kwargs):
+    from sqlalchemy import create_engine
+
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="datatherapist_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    csv_path = os.path.join(work_dir, f"input_{rows}.csv")
+    db_path = os.path.join(work_dir, f"bench_{rows}.db")
+    try:
+        # setup, not timed: the input file and the source table
+        df = generate(rows, seed=seed, **gen_kwargs)
+        df.to_csv(csv_path, index=False)
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        engine = create_engine(f"sqlite:///{db_path}")
+        df.to_sql('source', engine, index=False, chunksize=50_000)
+        del df
+
+        stages = {}
+        try:
+            return _run_stages(stages, rows, csv_path, engine, clean_params, workers, fast, work_dir,
+                               fast_params or FAST_CLEAN_PARAMS)
+        except Exception as e:
+            # the stages that finished are still worth reporting
+            return {'rows': rows, 'stages': stages, 'error': f"{type(e).__name__}: {e}"}
+        finally:
+            engine.dispose()
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_stages(stages, rows, csv_path, engine, clean_params, workers, fast, work_dir, fast_params):
+    from bulkwriter import bulk_write
+    from cleaning import run_autoclean
+    from dtypeplanner import optimize_dtypes
+    from exporter import write_csv
+    from ingest import read_csv
+
+    df = _stage(stages, 'csv_parse', rows, lambda: read_csv(csv_path))
+    df = _stage(stages, 'sql_load', rows, lambda: pd.read_sql("SELECT * FROM source", engine))
+    df = _stage(stages, 'dtype_coercion', rows, lambda: optimize_dtypes(df)[0])
+    engine_used = {}
+
+    def clean(name, params, use_fast):
+        def run():
+            # AutoClean prints its timing even when not verbose; stdout is for the JSON results
+            with contextlib.redirect_stdout(sys.stderr):
+                cleaned_df, _, used = run_autoclean(df, params, workers, fast=use_fast)
+            engine_used[name] = used
+            return cleaned_df
+        return run
+
+    if fast:
+        _stage(stages, 'fast_clean', len(df), clean('fast_clean', fast_params, True))
+    cleaned_df = _stage(stages, 'autoclean', len(df), clean('autoclean', clean_params, False))
+    export_path = os.path.join(work_dir, "cleaned.csv")
+    _stage(stages, 'csv_export', len(cleaned_df), lambda: write_csv(cleaned_df, export_path))
+    _stage(stages, 'sql_push', len(cleaned_df), lambda: bulk_write(cleaned_df, engine, 'cleaned'))
+    return {'rows': rows, 'clean_engines': engine_used, 'stages': stages,
+            'total_seconds': round(sum(s['seconds'] for s in stages.values()), 4)}
+
+
+def environment():
+    return {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'pandas': pd.__version__, 'numpy': np.__version__}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark load / clean / export / push on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument("--num-cols", type=int, default=8)
+    parser.add_argument("--cat-cols", type=int, default=4)
+    parser.add_argument("--datetime-cols", type=int, default=1)
+    parser.add_argument("--null-rate", type=float, default=0.05)
+    parser.add_argument("--outlier-rate", type=float, default=0.01)
+    parser.add_argument("--duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--clean-params", default=json.dumps(DEFAULT_CLEAN_PARAMS),
+                        help="JSON clean_params for the AutoClean stage, as app.py builds them")
+    parser.add_argument("--fast-clean-params", default=json.dumps(FAST_CLEAN_PARAMS),
+                        help="JSON clean_params for the fast_clean stage")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--no-fast", action="store_true", help="skip the fast_clean stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="keep generated files here instead of a temp directory")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    from loguru import logger
+    logger.remove()
+    clean_params = dict(json.loads(args.clean_params), logfile=False, verbose=False)
+    fast_params = json.loads(args.fast_clean_params)
+    config = {k: v for k, v in vars(args).items() if k not in ('output', 'work_dir')}
+    results = []
+    for rows in args.rows:
+        result = run_benchmark(rows, clean_params, args.workers, fast=not args.no_fast, work_dir=args.work_dir,
+                               seed=args.seed, fast_params=fast_params, num_cols=args.num_cols, cat_cols=args.cat_cols,
+                               datetime_cols=args.datetime_cols, null_rate=args.null_rate,
+                               outlier_rate=args.outlier_rate, duplicate_rate=args.duplicate_rate)
+        line = ", ".join(f"{name} {s['seconds']:.2f}s" for name, s in result['stages'].items())
+        if 'error' in result:
+            line += f" -- failed: {result['error']}"
+        print(f"{rows:>12,} rows: {line}", file=sys.stderr)
+        results.append(result)
+
+    text = json.dumps({'environment': environment(), 'config': config, 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import time
+import uuid
+import pandas as pd
+from sqlalchemy import inspect, text, types
+
+DEFAULT_BATCH_ROWS = 10_000
+MAX_NVARCHAR = 4000
+
+
+def split_table_name(name, default_schema=None):
+    # "dbo.cleaned_data" -> ("dbo", "cleaned_data"), "cleaned_data" -> (default_schema, "cleaned_data")
+    schema, _, table = name.rpartition('.')
+    return (schema or default_schema), table
+
+
+def column_types(df):
+    # explicit SQL types so the driver does not have to infer them from the values
+    mapping = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s):
+            mapping[col] = types.Boolean()
+        elif pd.api.types.is_integer_dtype(s):
+            lo, hi = (s.min(), s.max()) if s.notna().any() else (0, 0)
+            if -2 ** 31 <= lo and hi < 2 ** 31:
+                mapping[col] = types.Integer()
+            else:
+                mapping[col] = types.BigInteger()
+        elif pd.api.types.is_float_dtype(s):
+            mapping[col] = types.Float(precision=53)
+        elif isinstance(s.dtype, pd.DatetimeTZDtype):
+            mapping[col] = types.DateTime(timezone=True)
+        elif pd.api.types.is_datetime64_dtype(s):
+            mapping[col] = types.DateTime()
+        elif pd.api.types.is_timedelta64_dtype(s):
+            mapping[col] = types.BigInteger()
+        else:
+            values = s.dropna()
+            width = int(values.astype(str).str.len().max()) if len(values) else 1
+            if width > MAX_NVARCHAR:
+                mapping[col] = types.UnicodeText()
+            else:
+                mapping[col] = types.Unicode(length=max(width, 1))
+    return mapping
+
+
+def qualified_name(engine, schema, table):
+    quote = engine.dialect.identifier_preparer
+    if schema:
+        return f"{quote.quote_schema(schema)}.{quote.quote(table)}"
+    return quote.quote(table)
+
+
+def drop_table(conn, engine, schema, table):
+    if engine.dialect.name == 'mssql':
+        name = f"{schema}.{table}" if schema else table
+        conn.execute(text(f"IF OBJECT_ID(:name, N'U') IS NOT NULL DROP TABLE {qualified_name(engine, schema, table)}"),
+                     {'name': name})
+    else:
+        conn.execute(text(f"DROP TABLE IF EXISTS {qualified_name(engine, schema, table)}"))
+
+
+def staging_name(table, purpose='staging'):
+    # unique per load, so concurrent loads into the same table never share a staging table
+    return f"{table}_{purpose}_{uuid.uuid4().hex[:8]}"
+
+
+def drop_table_quietly(engine, schema, table):
+    # best-effort cleanup after a failed load; the load's own error is the one to report
+    try:
+        with engine.begin() as conn:
+            drop_table(conn, engine, schema, table)
+    except Exception:
+        pass
+
+
+def swap_table(engine, schema, staging, table):
+    # replace the target with the fully loaded staging table in one transaction
+    with engine.begin() as conn:
+        drop_table(conn, engine, schema, table)
+        if engine.dialect.name == 'mssql':
+            source = f"{schema}.{staging}" if schema else staging
+            conn.execute(text("EXEC sp_rename :source, :target"), {'source': source, 'target': table})
+        else:
+            conn.execute(text(f"ALTER TABLE {qualified_name(engine, schema, staging)} "
+                              f"RENAME TO {engine.dialect.identifier_preparer.quote(table)}"))
+
+
+def append_table(engine, schema, staging, table, columns):
+    # add the fully loaded staging table's rows to the target in one transaction
+    quote = engine.dialect.identifier_preparer.quote
+    names = ", ".join(quote(c) for c in columns)
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {qualified_name(engine, schema, table)} ({names}) "
+                          f"SELECT {names} FROM {qualified_name(engine, schema, staging)}"))
+        drop_table(conn, engine, schema, staging)
+
+
+def bulk_write(df, engine, table, schema=None, if_exists='replace', chunksize=DEFAULT_BATCH_ROWS,
+               dtype=None, atomic=True, on_progress=None):
+    # write df in batched executemany calls; with atomic=True a replace or append goes through
+    # a staging table, so the target gets all rows or none
+    if if_exists not in ('replace', 'append', 'fail'):
+        raise ValueError(f"Unsupported if_exists value: {if_exists}")
+    dtype = dtype or column_types(df)
+    target = staging_name(table) if (atomic and if_exists in ('replace', 'append')) else table
+
+    start = time.perf_counter()
+    rows = 0
+    try:
+        with engine.connect() as conn:
+            for offset in range(0, max(len(df), 1), chunksize):
+                chunk = df.iloc[offset:offset + chunksize]
+                mode = if_exists if offset == 0 else 'append'
+                chunk.to_sql(target, conn, schema=schema, if_exists=mode, index=False,
+                             dtype=dtype, chunksize=chunksize, method=None)
+                conn.commit()
+                rows += len(chunk)
+                if on_progress is not None:
+                    on_progress(rows, len(df))
+
+        if target != table and if_exists == 'append' and inspect(engine).has_table(table, schema=schema):
+            append_table(engine, schema, target, table, df.columns)
+        elif target != table:
+            swap_table(engine, schema, target, table)
+    except BaseException:
+        if target != table:
+            drop_table_quietly(engine, schema, target)
+        raise
+
+    elapsed = time.perf_counter() - start
+    return {'rows': rows, 'seconds': round(elapsed, 3),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else float(rows)}
+
+
+def bulk_merge(df, engine, table, keys, schema=None, chunksize=DEFAULT_BATCH_ROWS, dtype=None, on_progress=None):
+    # upsert by key: load df into a staging table, then replace the matching target rows in one transaction
+    if not keys:
+        raise ValueError("bulk_merge needs at least one key column")
+    staging = staging_name(table, 'merge')
+    try:
+        stats = bulk_write(df, engine, staging, schema=schema, if_exists='replace', chunksize=chunksize,
+                           dtype=dtype, atomic=False, on_progress=on_progress)
+        start = time.perf_counter()
+        quote = engine.dialect.identifier_preparer.quote
+        target, source = qualified_name(engine, schema, table), qualified_name(engine, schema, staging)
+        match = " AND ".join(f"{target}.{quote(k)} = s.{quote(k)}" for k in keys)
+        columns = ", ".join(quote(c) for c in df.columns)
+        with engine.begin() as conn:
+            deleted = conn.execute(text(f"DELETE FROM {target} WHERE EXISTS "
+                                        f"(SELECT 1 FROM {source} s WHERE {match})"))
+            conn.execute(text(f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {source}"))
+            drop_table(conn, engine, schema, staging)
+    except BaseException:
+        drop_table_quietly(engine, schema, staging)
+        raise
+    stats['replaced'] = max(deleted.rowcount, 0)
+    stats['seconds'] = round(stats['seconds'] + time.perf_counter() - start, 3)
+    return stats
@@ -1,18 +1,19 @@
 import streamlit as st
-import pandas as pd
-from AutoClean import AutoClean
-import sweetviz
-import os
+from fileformats import CSV_UPLOAD_TYPES
+from ingest import read_csv
+from preview import show_head, show_preview
+from runtime import load
+from profiling import request_report, show_report
 
 st.set_page_config(page_title="Smart Data Cleaner", layout="wide")
 st.title("🧹 Automatic Data Cleaner App")
 
-uploaded_file = st.file_uploader("📤 Upload your CSV file", type=["csv"])
+uploaded_file = st.file_uploader("📤 Upload your CSV file", type=CSV_UPLOAD_TYPES)
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+    df = read_csv(uploaded_file)
     st.subheader("🔍 Original Data")
-    st.dataframe(df)
+    show_preview(df, "original")
 
     st.subheader("⚙️ Select Cleaning Mode")
     mode = st.selectbox("Choose Mode", ['auto', 'manual'])
@@ -50,7 +51,7 @@ if uploaded_file is not None:
     if st.button("🧼 Clean Data"):
         st.subheader("🚀 Running AutoClean...")
         try:
-            pipeline = AutoClean(df,
+            pipeline = load('AutoClean').AutoClean(df,
                                  mode=mode,
                                  duplicates=duplicates,
                                  missing_num=missing_num,
@@ -66,7 +67,7 @@ if uploaded_file is not None:
             st.success("✅ AutoClean completed!")
 
             st.subheader("🧽 Cleaned Data")
-            st.dataframe(cleaned_df)
+            show_head(cleaned_df)
 
             if hasattr(pipeline, 'log'):
                 st.subheader("⚠️ Issues AutoClean Couldn't Fix")
@@ -78,30 +79,16 @@ if uploaded_file is not None:
                                "cleaned_data.csv",
                                "text/csv")
 
-            st.subheader("📊 Sweetviz Report")
-            report = sweetviz.analyze([df, "Original Data"])
-            report_path = "sweetviz_report.html"
-            report.show_html(report_path)
-                        
-                        
-            with open(report_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-                st.components.v1.html(html_content, height=800, scrolling=True)
-            
-            
-            st.subheader("📊 Sweetviz Report2")
-            report2 = sweetviz.analyze([cleaned_df, "Cleaned Original Data"])
-            report_path2 = "sweetviz_report2.html"
-            report2.show_html(report_path2)
-
-            with open(report_path2, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-                st.components.v1.html(html_content, height=800, scrolling=True)
-
-            os.remove(report_path)
+            st.session_state.reports = [("📊 Sweetviz Report", request_report([(df, "Original Data")])),
+                                        ("📊 Sweetviz Report2", request_report([(cleaned_df, "Cleaned Original Data")]))]
 
         except Exception as e:
             st.error(f"❌ Error during cleaning: {e}")
 
+    # reports are built in the background and stay on the page across reruns
+    for title, report in st.session_state.get('reports', []):
+        st.subheader(title)
+        show_report(report)
+
 else:
     st.info("📁 Please upload a CSV file to begin.")
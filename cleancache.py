@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+CACHE_VERSION = 3
+MAX_ENTRIES = 16
+MAX_MEMORY_MB = 1024
+DISK_BUDGET_MB = 4096
+DEFAULT_DISK_DIR = os.environ.get("DATATHERAPIST_CACHE_DIR",
+                                  os.path.join(tempfile.gettempdir(), "datatherapist_cache"))
+
+LOG_METADATA_KEY = b'datatherapist_clean_log'   # the clean log, as JSON in the Parquet metadata
+
+# parameters that only change logging, not the cleaned output
+IGNORED_PARAMS = ('logfile', 'verbose')
+
+
+def fingerprint(df):
+    # fast content hash: vectorized per-row hashes plus the schema
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        # unhashable cell values (lists, dicts) are hashed through their text form
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    h.update(row_hashes.to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def canonical_params(clean_params):
+    params = {k: v for k, v in clean_params.items() if k not in IGNORED_PARAMS}
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def cache_key(df, clean_params):
+    raw = f"{CACHE_VERSION}|{fingerprint(df)}|{canonical_params(clean_params)}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+
+def private_dir(path):
+    # the directory must belong to this user and be closed to others, or files planted
+    # there by someone else would be read back; callers skip or relocate their files otherwise
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.stat(path)
+    except OSError:
+        return False
+    if hasattr(os, 'getuid'):   # POSIX; on Windows the ACLs of the temp dir apply
+        return info.st_uid == os.getuid() and not info.st_mode & 0o022
+    return True
+
+class ResultCache:
+    # two tier cache of cleaned frames: LRU in memory, optional Parquet files on disk
+    # cached frames are shared between sessions, treat them as read-only
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_memory_mb=MAX_MEMORY_MB,
+                 disk_dir=DEFAULT_DISK_DIR, disk_budget_mb=DISK_BUDGET_MB):
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_mb * 1024 ** 2
+        self.disk_dir = disk_dir
+        self.disk_budget_bytes = disk_budget_mb * 1024 ** 2
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key, use_disk=False):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                cleaned_df, log, _ = self._entries[key]
+                return cleaned_df, log
+        if use_disk:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                self._remember(key, *entry)
+                return entry
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, key, cleaned_df, log=None, use_disk=False):
+        self._remember(key, cleaned_df, log)
+        if use_disk:
+            self._write_disk(key, cleaned_df, log)
+
+    def summary(self):
+        with self._lock:
+            lookups = sum(self.stats.values())
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            return dict(self.stats,
+                        entries=len(self._entries),
+                        memory_mb=round(self._memory_bytes / 1024 ** 2, 1),
+                        disk_mb=round(self._disk_usage()[0] / 1024 ** 2, 1),
+                        hit_rate=round(hits / lookups, 3) if lookups else 0.0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    def memory_frames(self):
+        # (frame, bytes) of the memory tier, least recently used first
+        with self._lock:
+            return [(df, size) for df, _, size in self._entries.values()]
+
+    def release(self, df):
+        # drops df from the memory tier (a disk copy stays); used by the session store when it spills
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[0] is df]:
+                self._memory_bytes -= self._entries.pop(key)[2]
+
+    def _remember(self, key, cleaned_df, log):
+        size = int(cleaned_df.memory_usage(deep=True).sum())
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._memory_bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (cleaned_df, log, size)
+            self._memory_bytes += size
+            while len(self._entries) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._memory_bytes -= evicted
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.parquet")
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        if not os.path.exists(path) or not private_dir(self.disk_dir):
+            return None
+        try:
+            # Parquet and JSON hold data only, unlike pickles nothing in the file is executed
+            import pyarrow.parquet as pq
+            table = pq.read_table(path)
+            log = json.loads((table.schema.metadata or {}).get(LOG_METADATA_KEY, b'null'))
+            os.utime(path)  # mark as recently used for eviction
+            return table.to_pandas(), log
+        except Exception:
+            return None
+
+    def _write_disk(self, key, cleaned_df, log):
+        if not private_dir(self.disk_dir):
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        try:
+            table = pa.Table.from_pandas(cleaned_df)
+        except (pa.ArrowException, TypeError, ValueError):
+            return  # mixed-type object columns have no Parquet form; the result stays in memory only
+        metadata = dict(table.schema.metadata or {})
+        metadata[LOG_METADATA_KEY] = json.dumps(log, default=str).encode()
+        # a temporary file of its own: sessions and server processes may write the same key at once
+        fd, tmp_path = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=self.disk_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pq.write_table(table.replace_schema_metadata(metadata), f)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._evict_disk()
+
+    def _disk_usage(self):
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return 0, []
+        stats = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".parquet"):
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    stats.append((path, os.stat(path)))
+                except OSError:
+                    pass  # removed by another session meanwhile
+        return sum(s.st_size for _, s in stats), stats
+
+    def _evict_disk(self):
+        # drop least recently used files until the directory fits the budget
+        total, stats = self._disk_usage()
+        for path, info in sorted(stats, key=lambda x: x[1].st_mtime):
+            if total <= self.disk_budget_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= info.st_size
+            except OSError:
+                pass
+
+
+# shared by every session in this server process
+result_cache = ResultCache()
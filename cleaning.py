@@ -0,0 +1,31 @@
+from dtypeplanner import engine_dtypes, optimize_dtypes
+from fastclean import FastUnsupported, fast_clean, fast_supported
+from runtime import load
+
+# AutoClean (with scikit-learn) is only imported when a run needs it; the vectorized
+# engine works without it
+
+
+def run_autoclean(df, clean_params, workers=1, fast=True, compact=True):
+    # returns the cleaned original columns, the AutoClean log (if any) and the engine used;
+    # with compact=True the result is stored in the smallest lossless dtypes again
+    cleaned_df, log, engine = _run_engines(engine_dtypes(df), clean_params, workers, fast)
+    if compact:
+        cleaned_df, _ = optimize_dtypes(cleaned_df)
+    return cleaned_df, log, engine
+
+
+def _run_engines(df, clean_params, workers, fast):
+    if fast and fast_supported(clean_params):
+        try:
+            return fast_clean(df, clean_params), None, 'fast'
+        except FastUnsupported:
+            pass  # data needs the generic pipeline
+    if workers > 1:
+        parallelclean = load('parallelclean')
+        try:
+            return parallelclean.parallel_clean(df, clean_params, workers), None, 'parallel'
+        except parallelclean.ParallelUnsupported:
+            pass  # settings or data need the serial pipeline
+    pipeline = load('AutoClean').AutoClean(df, **clean_params)
+    return pipeline.output[df.columns], getattr(pipeline, 'log', None), 'serial'
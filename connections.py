@@ -0,0 +1,79 @@
+import atexit
+import threading
+import time
+import weakref
+import sqlalchemy
+
+DEFAULT_DRIVER = "ODBC Driver 17 for SQL Server"
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_RECYCLE = 1800   # seconds before a pooled connection is replaced
+IDLE_TIMEOUT = 900    # seconds before the registry stops keeping an unused engine alive
+
+# engines live at module level so every Streamlit session and rerun shares them. The
+# registry keeps a strong reference for IDLE_TIMEOUT after an engine was last asked for,
+# then only a weak one: an engine still held by a session or a running job stays shared
+# and usable, one nobody holds any more is collected together with its pooled connections.
+_engines = {}
+_lock = threading.Lock()
+
+
+def connection_url(server, database, driver=DEFAULT_DRIVER):
+    return (f"mssql+pyodbc://@{server}/{database}"
+            f"?trusted_connection=yes&driver={driver.replace(' ', '+')}")
+
+
+def get_engine(server, database, driver=DEFAULT_DRIVER, pool_size=POOL_SIZE,
+               max_overflow=MAX_OVERFLOW, pool_recycle=POOL_RECYCLE):
+    key = (server, database, driver)
+    with _lock:
+        _evict_idle(IDLE_TIMEOUT)
+        entry = _engines.get(key)
+        engine = entry['ref']() if entry is not None else None
+        if engine is None:
+            engine = sqlalchemy.create_engine(connection_url(server, database, driver),
+                                              pool_pre_ping=True,
+                                              pool_size=pool_size,
+                                              max_overflow=max_overflow,
+                                              pool_recycle=pool_recycle,
+                                              fast_executemany=True)
+            entry = _engines[key] = {'ref': weakref.ref(engine)}
+        entry.update(engine=engine, last_used=time.monotonic())
+        return engine
+
+
+def _evict_idle(timeout):
+    # let go of engines nobody has asked for recently; never dispose one that is still
+    # referenced elsewhere (session state, a running job) or has connections checked out
+    now = time.monotonic()
+    for key, entry in list(_engines.items()):
+        if entry['ref']() is None:
+            del _engines[key]
+        elif entry['engine'] is not None and now - entry['last_used'] > timeout \
+                and entry['engine'].pool.checkedout() == 0:
+            entry['engine'] = None
+
+
+def pool_status():
+    with _lock:
+        status = []
+        for (server, database, driver), entry in _engines.items():
+            engine = entry['ref']()
+            if engine is not None:
+                status.append({'server': server, 'database': database, 'driver': driver,
+                               'checked_out': engine.pool.checkedout(), 'status': engine.pool.status(),
+                               'idle_seconds': round(time.monotonic() - entry['last_used'], 1)})
+        return status
+
+
+def dispose_all():
+    # closes every pooled connection, on interpreter exit
+    with _lock:
+        for entry in _engines.values():
+            engine = entry['ref']()
+            if engine is not None:
+                engine.dispose()
+        _engines.clear()
+
+
+atexit.register(dispose_all)
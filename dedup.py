@@ -0,0 +1,321 @@
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Duplicate detection on 64-bit row hashes. Exact mode hashes each row (or a chosen
+# subset of key columns) with pandas' vectorized hashing and looks the hashes up in an
+# index of first occurrences, so chunks of any size can be streamed through and memory
+# grows with the number of distinct keys, not with the rows. Near-duplicate mode
+# normalizes the text (case, accents, punctuation, whitespace), takes character
+# shingles of each row, and compares MinHash signatures through LSH banding: rows
+# whose signatures agree on a whole band become candidates, and a candidate pair is
+# linked only when the share of agreeing signature positions (the estimated Jaccard
+# similarity) reaches the threshold. Near mode keeps every row's signature for that
+# check (NUM_PERM x 4 bytes a row). Both modes report clusters (the first row of each
+# cluster is its id) instead of just dropping rows.
+#
+# Hash collisions between different rows are possible but unlikely at 64 bits. Near
+# duplicates are approximate: a row is compared with the first earlier row sharing one
+# of its bands, so some similar pairs are missed, and links are transitive, so chains
+# of similar rows end up in one cluster.
+
+DEFAULT_CHUNK_ROWS = 100_000
+NUM_PERM = 64
+SHINGLE = 3
+THRESHOLD = 0.8
+SIGNATURE_BATCH = 200_000   # shingles hashed at once (NUM_PERM x 8 bytes each)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def row_hashes(df, subset=None):
+    # uint64 per row over the subset columns, equal rows give equal hashes
+    frame = df[list(subset)] if subset else df
+    floats = [c for c, t in frame.dtypes.items() if pd.api.types.is_float_dtype(t)]
+    if floats and frame.columns.is_unique:
+        # -0.0 == 0.0, but their bytes hash differently
+        frame = frame.copy(deep=False)
+        for col in floats:
+            frame[col] = frame[col] + 0.0
+    try:
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    except TypeError:
+        # unhashable cell values (lists, dicts) are hashed through their text form
+        return pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+
+
+def normalize_text(series):
+    # lowercase, accents and punctuation removed, whitespace collapsed; missing -> ''
+    text = series.astype('string').fillna('').str.lower()
+    text = text.map(lambda s: unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('ascii'),
+                    na_action='ignore')
+    text = text.str.replace(r'[^\w\s]', ' ', regex=True).str.replace(r'\s+', ' ', regex=True).str.strip()
+    return text.astype(object)
+
+
+def lsh_bands(num_perm=NUM_PERM, threshold=THRESHOLD):
+    # (bands, rows per band) with bands * rows = num_perm whose similarity cut-off,
+    # about (1 / bands) ** (1 / rows), is closest to threshold
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda o: abs((1 / o[0]) ** (1 / o[1]) - threshold))
+
+
+class SeenHashes:
+    # set of 64-bit row hashes kept as a few sorted numpy arrays, merged as they grow
+
+    def __init__(self):
+        self._levels = []
+
+    def __len__(self):
+        return sum(len(level) for level in self._levels)
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for level in self._levels:
+            idx = np.minimum(np.searchsorted(level, hashes), len(level) - 1)
+            found |= level[idx] == hashes
+        return found
+
+    def add(self, hashes):
+        if not len(hashes):
+            return
+        self._levels.append(np.unique(hashes))
+        while len(self._levels) > 1 and len(self._levels[-2]) <= 2 * len(self._levels[-1]):
+            last = self._levels.pop()
+            self._levels[-1] = np.union1d(self._levels[-1], last)
+
+    def to_array(self):
+        return np.unique(np.concatenate(self._levels)) if self._levels else np.empty(0, dtype=np.uint64)
+
+    @classmethod
+    def from_array(cls, hashes):
+        seen = cls()
+        seen.add(np.asarray(hashes, dtype=np.uint64))
+        return seen
+
+    def mark_repeats(self, hashes):
+        # True for hashes seen in an earlier chunk or earlier in this one
+        _, first = np.unique(hashes, return_index=True)
+        repeat = np.ones(len(hashes), dtype=bool)
+        repeat[first] = False
+        repeat |= self.contains(hashes)
+        self.add(hashes[~repeat])
+        return repeat
+
+
+class HashIndex:
+    # 64-bit hash -> row number of its first occurrence, in sorted levels like SeenHashes
+
+    def __init__(self):
+        self._levels = []   # (sorted hashes, rows)
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self._levels)
+
+    def first_rows(self, hashes, rows):
+        # row of the first occurrence of each hash, remembering the new ones
+        codes, uniques = pd.factorize(hashes)
+        first = np.full(len(uniques), -1, dtype=np.int64)
+        for keys, values in self._levels:
+            idx = np.minimum(np.searchsorted(keys, uniques), len(keys) - 1)
+            hit = (keys[idx] == uniques) & (first < 0)
+            first[hit] = values[idx[hit]]
+        new = first < 0
+        # pd.factorize numbers hashes in order of appearance: a code larger than all before it is a first row
+        appears = np.ones(len(codes), dtype=bool)
+        appears[1:] = codes[1:] > np.maximum.accumulate(codes)[:-1]
+        first[new] = rows[appears][new]
+        self._add(uniques[new], first[new])
+        return first[codes]
+
+    def _add(self, keys, values):
+        if not len(keys):
+            return
+        order = np.argsort(keys)
+        self._levels.append((keys[order], values[order]))
+        while len(self._levels) > 1 and len(self._levels[-2][0]) <= 2 * len(self._levels[-1][0]):
+            keys, values = self._levels.pop()
+            merged_keys = np.concatenate([self._levels[-1][0], keys])
+            order = np.argsort(merged_keys, kind='stable')
+            self._levels[-1] = (merged_keys[order], np.concatenate([self._levels[-1][1], values])[order])
+
+
+def _shingle_rows(text, shingle):
+    # rolling k-byte integers over each row's UTF-8 bytes; returns them with each row's first position
+    encoded = [s.ljust(shingle).encode('utf-8') for s in text]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    gram = np.zeros(len(data) - shingle + 1, dtype=np.uint64)
+    for i in range(shingle):
+        gram = (gram << np.uint64(8)) | data[i:len(data) - shingle + 1 + i]
+    # keep the shingles lying inside one row
+    counts = lengths - shingle + 1
+    keep = np.repeat(starts, counts) + _ranges(counts)
+    return gram[keep], np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+
+def _ranges(counts):
+    # 0..c-1 for each count, concatenated
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(counts.sum()) - offsets
+
+
+def minhash_signatures(text, num_perm=NUM_PERM, shingle=SHINGLE, seed=0):
+    # (rows, num_perm) uint32 MinHash signatures of normalized strings
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+    text = list(text)
+    signatures = np.empty((len(text), num_perm), dtype=np.uint32)
+    # batches of about SIGNATURE_BATCH shingles, however wide the rows are
+    grams = np.fromiter((max(len(t), shingle) - shingle + 1 for t in text), dtype=np.int64, count=len(text))
+    done = np.cumsum(grams)
+    start = 0
+    with np.errstate(over='ignore'):
+        while start < len(text):
+            before = done[start - 1] if start else 0
+            end = max(int(np.searchsorted(done, before + SIGNATURE_BATCH, side='right')), start + 1)
+            batch, offsets = _shingle_rows(text[start:end], shingle)
+            batch = batch * _MIX
+            # multiply-shift hashing: the high 32 bits of a * x + b
+            hashed = ((a[:, None] * batch[None, :] + b[:, None]) >> np.uint64(32)).astype(np.uint32)
+            signatures[start:end] = np.minimum.reduceat(hashed, offsets, axis=1).T
+            start = end
+    return signatures
+
+
+def _band_keys(signatures, bands, rows):
+    return [pd.util.hash_pandas_object(pd.DataFrame(signatures[:, i * rows:(i + 1) * rows]), index=False).to_numpy()
+            for i in range(bands)]
+
+
+def _components(left, right):
+    # connected components of the row pairs; each label is the smallest row of its component
+    nodes, inverse = np.unique(np.concatenate([left, right]), return_inverse=True)
+    a, b = inverse[:len(left)], inverse[len(left):]
+    labels = np.arange(len(nodes))
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        new = labels.copy()
+        np.minimum.at(new, a, low)
+        np.minimum.at(new, b, low)
+        new = new[new]   # pointer jumping
+        if np.array_equal(new, labels):
+            break
+        labels = new
+    return nodes, nodes[labels]
+
+
+class DuplicateTracker:
+    # streams chunks through exact or near-duplicate detection; row numbers continue across chunks
+
+    def __init__(self, subset=None, near=False, threshold=THRESHOLD, num_perm=NUM_PERM, shingle=SHINGLE, seed=0):
+        self.subset = list(subset) if subset else None
+        self.near = near
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.seed = seed
+        self.threshold = threshold
+        self.bands, self.band_rows = lsh_bands(num_perm, threshold) if near else (1, 0)
+        self._indexes = [HashIndex() for _ in range(self.bands)]
+        self._pairs = []
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)   # near mode: one per row so far
+        self.rows = 0
+
+    def _keys(self, chunk):
+        if not self.near:
+            return [row_hashes(chunk, self.subset)]
+        frame = chunk[self.subset] if self.subset else chunk
+        text = normalize_text(frame.iloc[:, 0]) if frame.shape[1] else pd.Series('', index=frame.index)
+        for col in frame.columns[1:]:
+            text = text + ' ' + normalize_text(frame[col])
+        signatures = minhash_signatures(text, self.num_perm, self.shingle, self.seed)
+        self._keep_signatures(signatures)
+        return _band_keys(signatures, self.bands, self.band_rows)
+
+    def _keep_signatures(self, signatures):
+        # grows by doubling, so appending chunk after chunk stays linear
+        needed = self.rows + len(signatures)
+        if needed > len(self._signatures):
+            grown = np.empty((max(needed, 2 * len(self._signatures)), self.num_perm), dtype=np.uint32)
+            grown[:self.rows] = self._signatures[:self.rows]
+            self._signatures = grown
+        self._signatures[self.rows:needed] = signatures
+
+    def _similar(self, left, right):
+        # estimated Jaccard similarity (share of equal MinHash values) at least the threshold
+        if not self.near:
+            return np.ones(len(left), dtype=bool)
+        agree = (self._signatures[left] == self._signatures[right]).mean(axis=1)
+        return agree >= self.threshold
+
+    def update(self, chunk):
+        # True for rows that belong to a cluster started by an earlier row
+        rows = np.arange(self.rows, self.rows + len(chunk), dtype=np.int64)
+        repeat = np.zeros(len(chunk), dtype=bool)
+        if len(chunk):
+            for index, keys in zip(self._indexes, self._keys(chunk)):
+                first = index.first_rows(keys, rows)
+                candidate = np.flatnonzero(first != rows)
+                linked = candidate[self._similar(rows[candidate], first[candidate])]
+                repeat[linked] = True
+                self._pairs.append((rows[linked], first[linked]))
+        self.rows += len(chunk)
+        return repeat
+
+    def distinct_keys(self):
+        return len(self._indexes[0])
+
+    def clusters(self):
+        # DataFrame of rows in clusters of two or more: row, cluster (its first row), size
+        left = np.concatenate([p[0] for p in self._pairs]) if self._pairs else np.empty(0, dtype=np.int64)
+        right = np.concatenate([p[1] for p in self._pairs]) if self._pairs else np.empty(0, dtype=np.int64)
+        if not len(left):
+            return pd.DataFrame({'row': pd.Series(dtype='int64'), 'cluster': pd.Series(dtype='int64'),
+                                 'size': pd.Series(dtype='int64')})
+        rows, clusters = _components(left, right)
+        report = pd.DataFrame({'row': rows, 'cluster': clusters})
+        report['size'] = report.groupby('cluster')['row'].transform('size')
+        return report.sort_values(['cluster', 'row'], ignore_index=True)
+
+
+def find_duplicates(df, subset=None, near=False, threshold=THRESHOLD, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # cluster report of an in-memory frame; 'row' is the position in df
+    tracker = DuplicateTracker(subset, near, threshold)
+    for start in range(0, len(df), chunk_rows):
+        tracker.update(df.iloc[start:start + chunk_rows])
+    return tracker.clusters()
+
+
+def find_duplicates_in_chunks(chunks, subset=None, near=False, threshold=THRESHOLD):
+    # same for an iterable of frames (e.g. pd.read_csv(..., chunksize=n)); rows are numbered across chunks
+    tracker = DuplicateTracker(subset, near, threshold)
+    for chunk in chunks:
+        tracker.update(chunk)
+    return tracker.clusters()
+
+
+def drop_duplicates(df, subset=None, near=False, threshold=THRESHOLD):
+    # keeps the first row of every cluster; returns the kept rows and the cluster report
+    report = find_duplicates(df, subset, near, threshold)
+    return keep_first(df, report), report
+
+
+def keep_first(df, report):
+    # df without the rows a cluster report marks as repeats
+    keep = np.ones(len(df), dtype=bool)
+    keep[report['row'][report['row'] != report['cluster']].to_numpy()] = False
+    return df.take(np.flatnonzero(keep))
+
+
+def cluster_summary(df, report, max_clusters=100):
+    # the rows of the largest clusters, with cluster id and size in front
+    if report.empty:
+        return df.iloc[:0]
+    top = report.drop_duplicates('cluster').nlargest(max_clusters, 'size')['cluster']
+    shown = report[report['cluster'].isin(top)]
+    rows = df.iloc[shown['row'].to_numpy()].reset_index(drop=True)
+    rows.insert(0, 'size', shown['size'].to_numpy())
+    rows.insert(0, 'cluster', shown['cluster'].to_numpy())
+    return rows.sort_values(['size', 'cluster'], ascending=[False, True], kind='stable', ignore_index=True)
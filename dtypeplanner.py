@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+# Picks the smallest dtype that holds each column without changing a value:
+# integers are downcast, integer-valued floats with NaN become nullable integers,
+# floats go to float32 only when every value survives the round trip and
+# repetitive text becomes a category.
+
+MAX_CATEGORY_RATIO = 0.5        # distinct values / rows
+MAX_CATEGORIES = 10_000
+SIGNED = ('int8', 'int16', 'int32', 'int64')
+
+
+def _memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def _smallest_int(lo, hi):
+    for name in SIGNED:
+        info = np.iinfo(name)
+        if info.min <= lo and hi <= info.max:
+            return name
+    return None
+
+
+def _plan_column(s):
+    # target dtype for one column, or None to keep it
+    dtype = s.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return None
+    if pd.api.types.is_integer_dtype(dtype):
+        if not s.notna().any():
+            return None
+        target = _smallest_int(int(s.min()), int(s.max()))
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            target = target.capitalize() if target else None
+        return target if target and target != str(dtype) else None
+    if pd.api.types.is_float_dtype(dtype):
+        values = s.to_numpy(dtype='float64', na_value=np.nan)
+        present = values[~np.isnan(values)]
+        if not len(present) or not np.isfinite(present).all():
+            return None
+        if (present % 1 == 0).all():
+            target = _smallest_int(present.min(), present.max())
+            if target:
+                # nullable integers keep the NaNs without the float64 upcast
+                return target.capitalize() if len(present) < len(values) else target
+        if dtype != np.float32 and (present.astype(np.float32).astype(np.float64) == present).all():
+            return 'float32'
+        return None
+    if dtype == object:
+        values = s.dropna()
+        if not len(values) or not values.map(type).eq(str).all():
+            return None
+        distinct = values.nunique()
+        if distinct <= MAX_CATEGORIES and distinct <= MAX_CATEGORY_RATIO * len(s):
+            return 'category'
+    return None
+
+
+def plan_dtypes(df):
+    plan = {}
+    for col in df.columns:
+        target = _plan_column(df[col])
+        if target is not None:
+            plan[col] = target
+    return plan
+
+
+def optimize_dtypes(df, plan=None):
+    # returns the compact frame and a report of what changed
+    plan = plan_dtypes(df) if plan is None else plan
+    before = _memory_mb(df)
+    # unchanged columns are shared with df instead of copied; callers replace df with the result
+    compact = df.astype(plan, copy=False) if plan else df
+    after = _memory_mb(compact)
+    report = {'memory_mb_before': round(before, 2),
+              'memory_mb_after': round(after, 2),
+              'saved_pct': round(100 * (1 - after / before), 1) if before else 0.0,
+              'columns': {col: f"{df[col].dtype} -> {target}" for col, target in plan.items()}}
+    return compact, report
+
+
+def engine_dtypes(df):
+    # the cleaning engines handle small numpy numbers, float32 and categories as they are;
+    # nullable integers fail in AutoClean's outlier stages (pd.NA in comparisons, float bounds
+    # written into an integer array), so only those are widened, for the duration of the call
+    widen = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if (pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                and isinstance(dtype, pd.api.extensions.ExtensionDtype)):
+            # back to the float-with-NaN form the stages handle
+            widen[col] = 'float64' if df[col].isna().any() else 'int64'
+    if not widen:
+        return df
+    return df.astype(widen)
+
+
+def plain_dtypes(df):
+    # numpy int64/float64 and object text, for libraries that know nothing of compact dtypes
+    widen = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            widen[col] = object
+        elif pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+                widen[col] = 'float64' if df[col].isna().any() else 'int64'
+            elif dtype != np.int64:
+                widen[col] = 'int64'
+        elif dtype == np.float32:
+            widen[col] = 'float64'
+    if not widen:
+        return df
+    return df.astype(widen)
+
+
+def round_numbers(df, decimals=2):
+    # numeric input rounded to a fixed number of decimals before cleaning, as the app always
+    # did; only float columns whose values change are copied, in float64
+    out = df
+    for col in df.columns:
+        s = df[col]
+        if not pd.api.types.is_float_dtype(s.dtype):
+            continue
+        rounded = s.astype('float64').round(decimals)
+        if rounded.astype(s.dtype).equals(s):
+            continue  # already within the decimals at this column's precision
+        if out is df:
+            out = df.copy(deep=False)
+        out[col] = rounded
+    return out
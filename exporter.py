@@ -0,0 +1,106 @@
+import gzip
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from fileformats import file_name, save_table
+
+# Download artifacts, built once per cleaned result and format instead of on every
+# Streamlit rerun. CSV is written to a temporary file CHUNK_ROWS rows at a time
+# (optionally gzip-compressed), so no single string of the whole frame is ever held;
+# Parquet and Feather are written straight to disk by pyarrow. The files are keyed by
+# the result's cache key, so sessions downloading the same result share one file, and
+# the oldest files are deleted once there are more than MAX_EXPORTS.
+
+EXPORT_DIR = os.environ.get("DATATHERAPIST_EXPORT_DIR",
+                            os.path.join(tempfile.gettempdir(), "datatherapist_exports"))
+CHUNK_ROWS = 100_000
+GZIP_LEVEL = 6
+MAX_EXPORTS = 32
+
+
+def write_csv(df, path, compression=None, chunk_rows=CHUNK_ROWS):
+    # same output as df.to_csv(path, index=False), written chunk by chunk
+    if compression not in (None, 'gzip'):
+        raise ValueError(f"Unsupported CSV compression: {compression}")
+    raw = gzip.open(path, 'wb', compresslevel=GZIP_LEVEL) if compression == 'gzip' else open(path, 'wb')
+    with io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+        if len(df) == 0:
+            df.to_csv(f, index=False)
+        for start in range(0, len(df), chunk_rows):
+            df.iloc[start:start + chunk_rows].to_csv(f, index=False, header=start == 0)
+    return os.path.getsize(path)
+
+
+def export_file(df, path, fmt='csv', compression=None, chunk_rows=CHUNK_ROWS):
+    # writes through a temporary name, so a half-written file is never served
+    partial = path + ".partial"
+    try:
+        if fmt == 'csv':
+            write_csv(df, partial, compression, chunk_rows)
+        elif fmt in ('parquet', 'feather'):
+            # save_table picks the format from the extension
+            partial = os.path.splitext(path)[0] + ".partial" + os.path.splitext(path)[1]
+            save_table(df, partial, compression)
+        else:
+            raise ValueError(f"Unknown format: {fmt}")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return os.path.getsize(path)
+
+
+class ExportStore:
+    # files of recent download artifacts; shared by all sessions of the server process
+
+    def __init__(self, export_dir=EXPORT_DIR, max_exports=MAX_EXPORTS):
+        self.export_dir = export_dir
+        self.max_exports = max_exports
+        self._dir = None
+        self._files = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key, fmt, compression):
+        if self._dir is None:
+            # one directory per process, files of earlier runs are not trusted
+            os.makedirs(self.export_dir, exist_ok=True)
+            self._dir = tempfile.mkdtemp(prefix="exports_", dir=self.export_dir)
+        return os.path.join(self._dir, file_name(key, fmt, compression))
+
+    def ready(self, key, fmt='csv', compression=None):
+        with self._lock:
+            return (key, fmt, compression) in self._files
+
+    def get(self, key, df, fmt='csv', compression=None):
+        # path of the artifact, built on the first request; concurrent requests wait for one build
+        entry = (key, fmt, compression)
+        with self._lock:
+            if entry in self._files:
+                self._files.move_to_end(entry)
+                return self._files[entry]
+            building = self._building.setdefault(entry, threading.Lock())
+        with building:
+            with self._lock:
+                if entry in self._files:
+                    return self._files[entry]
+                path = self._path(key, fmt, compression)
+            export_file(df, path, fmt, compression)
+            with self._lock:
+                self._files[entry] = path
+                self._building.pop(entry, None)
+                self._evict()
+        return path
+
+    def _evict(self):
+        while len(self._files) > self.max_exports:
+            _, path = self._files.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                pass   # still being read by a download; the temp dir is cleaned eventually
+
+
+exports = ExportStore()
@@ -0,0 +1,233 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# Vectorized version of the AutoClean stages for the simple strategies. It follows
+# AutoClean's rules value for value (integer detection, truncating winsorization of
+# integer columns, decimal restoration) and returns the cleaned input columns.
+#
+# Categorical encoding only adds new columns in AutoClean, so it does not change the
+# input columns returned here. For missing_num mean/median/most_frequent AutoClean
+# 1.1.3 raises (it calls a missing _impute_missing helper); these follow the rules of
+# its working _impute helper instead.
+
+FAST_MISSING_NUM = (False, 'mean', 'median', 'most_frequent')
+FAST_MISSING_CATEG = (False, 'most_frequent')
+FAST_OUTLIERS = (False, 'auto', 'winz', 'delete')
+FAST_DUPLICATES = (False, 'auto', True)
+DATETIME_VALUES = (False, 'auto', 'D', 'M', 'Y', 'h', 'm', 's')
+DATETIME_PARTS = ('Day', 'Month', 'Year', 'Hour', 'Minute', 'Sec')
+
+
+class FastUnsupported(Exception):
+    # raised when the data or settings need the generic AutoClean pipeline
+    pass
+
+
+def fast_supported(clean_params):
+    return (clean_params.get('mode') == 'manual'
+            and clean_params.get('duplicates', False) in FAST_DUPLICATES
+            and clean_params.get('missing_num', False) in FAST_MISSING_NUM
+            and clean_params.get('missing_categ', False) in FAST_MISSING_CATEG
+            and clean_params.get('outliers', False) in FAST_OUTLIERS
+            and clean_params.get('extract_datetime', False) in DATETIME_VALUES
+            and isinstance(clean_params.get('outlier_param', 1.5), (int, float)))
+
+
+def _is_integral(values):
+    # AutoClean's (col.fillna(-9999) % 1 == 0).all(), column-wise on a 2D block
+    return np.all(np.isnan(values) | (values % 1 == 0), axis=0)
+
+
+def _most_frequent(values):
+    # SimpleImputer(strategy='most_frequent'): ties go to the smallest value
+    values = values[~np.isnan(values)]
+    uniques, counts = np.unique(values, return_counts=True)
+    return uniques[np.argmax(counts)]
+
+
+def numeric_fill_values(block, strategy):
+    # one pass over the numeric block; NaN where a column has nothing to learn from
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if strategy == 'mean':
+            return np.nanmean(block, axis=0)
+        if strategy == 'median':
+            return np.nanmedian(block, axis=0)
+    fills = np.full(block.shape[1], np.nan)
+    for j in range(block.shape[1]):
+        if not np.isnan(block[:, j]).all():
+            fills[j] = _most_frequent(block[:, j])
+    return fills
+
+
+def categorical_fill_value(series):
+    # mode with ties broken by first appearance, as AutoClean's label mapping does
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return None
+    return uniques[np.argmax(np.bincount(codes[codes >= 0]))]
+
+
+def outlier_bounds(block, outlier_param):
+    # np.percentile gives NaN bounds for columns that still contain NaN, like AutoClean
+    if len(block) == 0:
+        raise FastUnsupported("no rows left to compute outlier bounds")
+    q1, q3 = np.percentile(block, [25, 75], axis=0)
+    iqr = q3 - q1
+    return q1 - outlier_param * iqr, q3 + outlier_param * iqr
+
+
+def winsorize(values, lower, upper, integral):
+    # in place; integer columns get the bound truncated, as AutoClean's astype(int) does
+    below = values < lower
+    above = values > upper
+    outliers = below | above
+    if not outliers.any():
+        return
+    if integral:
+        values[below] = np.trunc(lower)
+        values[above] = np.trunc(upper)
+        return
+    nonint = ~np.isnan(values) & (values % 1 != 0)
+    if (nonint & ~outliers).any():
+        # some non-integer values stay, so the column never turns integral
+        values[below] = lower
+        values[above] = upper
+        return
+    # every remaining fractional value is an outlier: AutoClean's check flips once they are gone
+    remaining = int(nonint.sum())
+    for i in np.flatnonzero(outliers):
+        bound = lower if below[i] else upper
+        if remaining == 0:
+            values[i] = np.trunc(bound)
+        else:
+            remaining -= int(nonint[i])
+            values[i] = bound
+            remaining += int(bound % 1 != 0)
+
+
+def text_decimals(series):
+    # AutoClean restores the largest number of decimals seen in the input text;
+    # equal values print the same, so only the distinct values need formatting
+    if not len(series):
+        return None
+    try:
+        values = series.unique()
+    except TypeError:
+        values = series
+    return max(str(v)[::-1].find('.') for v in values)
+
+
+def _numeric_columns(df):
+    return list(df.select_dtypes(include=np.number).columns)
+
+
+def _as_block(df, columns):
+    return np.column_stack([df[c].to_numpy(dtype='float64', na_value=np.nan) for c in columns]) \
+        if columns else np.empty((len(df), 0))
+
+
+def fast_clean(df, clean_params):
+    if not fast_supported(clean_params):
+        raise FastUnsupported("settings need the AutoClean pipeline")
+    if not all(isinstance(c, str) for c in df.columns) or df.columns.duplicated().any():
+        raise FastUnsupported("column names must be unique strings")
+    missing_num = clean_params.get('missing_num', False)
+    missing_categ = clean_params.get('missing_categ', False)
+    outliers = clean_params.get('outliers', False)
+    extract_datetime = clean_params.get('extract_datetime', False)
+    outlier_param = clean_params.get('outlier_param', 1.5)
+    if extract_datetime and any(c in DATETIME_PARTS for c in df.columns):
+        raise FastUnsupported("input already has datetime part columns")
+
+    input_data = df
+    out = df.reset_index(drop=True)
+
+    # duplicates
+    if clean_params.get('duplicates', False):
+        try:
+            out = out.drop_duplicates(ignore_index=True)
+        except TypeError:
+            pass  # unhashable values, AutoClean skips the step as well
+
+    # missing values
+    if (missing_num or missing_categ) and out.isna().to_numpy().any():
+        if out.isna().all(axis=1).any():
+            raise FastUnsupported("rows that are entirely empty shift AutoClean's index")
+        if missing_num:
+            num_cols = [c for c in _numeric_columns(out) if out[c].isna().any()]
+            block = _as_block(out, num_cols)
+            fills = numeric_fill_values(block, missing_num)
+            integral = _is_integral(block)
+            for j, col in enumerate(num_cols):
+                if np.isnan(fills[j]):
+                    continue  # all values missing: AutoClean's imputer fails and leaves it
+                values = block[:, j]
+                values[np.isnan(values)] = fills[j]
+                if integral[j]:
+                    out[col] = pd.array(np.round(values), dtype='Int64')
+                else:
+                    out[col] = values
+        if missing_categ:
+            num_cols = set(_numeric_columns(out))
+            for col in out.columns:
+                if col in num_cols or not out[col].isna().any():
+                    continue
+                if pd.api.types.is_datetime64_any_dtype(out[col]) or pd.api.types.is_timedelta64_dtype(out[col]):
+                    raise FastUnsupported(f"missing values in datetime column {col}")
+                fill = categorical_fill_value(out[col])
+                if fill is None:
+                    continue
+                values = out[col].to_numpy(dtype=object, copy=True)
+                values[pd.isna(values)] = fill
+                out[col] = values
+
+    # outliers
+    num_cols = _numeric_columns(out)
+    if outliers in ('auto', 'winz') and num_cols:
+        block = _as_block(out, num_cols)
+        lower, upper = outlier_bounds(block, outlier_param)
+        integral = _is_integral(block)
+        for j, col in enumerate(num_cols):
+            before = block[:, j].copy()
+            winsorize(block[:, j], lower[j], upper[j], integral[j])
+            if not np.array_equal(before, block[:, j], equal_nan=True):
+                out[col] = block[:, j]
+    elif outliers == 'delete' and num_cols:
+        block = _as_block(out, num_cols)
+        keep = np.arange(len(out))
+        for j in range(len(num_cols)):
+            values = block[keep, j]
+            lower, upper = outlier_bounds(values[:, None], outlier_param)
+            keep = keep[~((values < lower[0]) | (values > upper[0]))]
+        if len(keep) != len(out):
+            out = out.take(keep).reset_index(drop=True)
+
+    # datetime conversion of text columns
+    if extract_datetime:
+        num_cols = set(_numeric_columns(out))
+        for col in out.columns:
+            if col in num_cols:
+                continue
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    out[col] = pd.to_datetime(out[col])
+            except Exception:
+                pass
+
+    # type restoration, skipped by AutoClean when no step is enabled
+    if not any(clean_params.get(k, False) for k in ('duplicates', 'missing_num', 'missing_categ',
+                                                     'outliers', 'encode_categ', 'extract_datetime')):
+        return out
+    for col in _numeric_columns(out):
+        values = out[col].to_numpy(dtype='float64', na_value=np.nan)
+        if _is_integral(values[:, None])[0]:
+            out[col] = out[col].astype('Int64')
+        else:
+            out[col] = out[col].astype(float)
+            dec = text_decimals(input_data[col])
+            if dec is not None:
+                out[col] = out[col].round(decimals=dec)
+    return out
@@ -0,0 +1,106 @@
+import io
+import os
+import pandas as pd
+from ingest import csv_columns, read_csv
+
+# Columnar formats keep dtypes (Int64, datetimes, categories) through pandas' arrow
+# metadata, so a cleaned frame comes back exactly as it was written. CSV goes through
+# the pyarrow ingest engine, which also unpacks gzip, zstd, bz2 and zip uploads.
+
+CSV_UPLOAD_TYPES = ["csv", "gz", "zst", "bz2", "zip"]
+UPLOAD_TYPES = CSV_UPLOAD_TYPES + ["parquet", "pq", "feather", "arrow", "ipc"]
+COMPRESSION_OPTIONS = {
+    'csv': [None, 'gzip'],
+    'parquet': ['zstd', 'snappy', 'gzip', None],
+    'feather': ['lz4', 'zstd', None],
+}
+FORMAT_LABELS = {'csv': 'CSV', 'parquet': 'Parquet', 'feather': 'Feather'}
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+CSV_COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', 'bz2': '.bz2', 'zip': '.zip'}
+MIME_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet',
+              'feather': 'application/vnd.apache.arrow.file'}
+
+
+def format_of(name):
+    # (format, csv compression) from a file name
+    name = name.lower()
+    for compression, extension in CSV_COMPRESSION_EXTENSIONS.items():
+        if name.endswith(extension):
+            return 'csv', compression
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet', None
+    if name.endswith(('.feather', '.arrow', '.ipc')):
+        return 'feather', None
+    if name.endswith('.csv'):
+        return 'csv', None
+    raise ValueError(f"Unsupported file type: {name}")
+
+
+def read_table(file, name=None, columns=None):
+    # file is a path or a file-like object such as Streamlit's UploadedFile;
+    # columns limits the load to those columns
+    name = name or getattr(file, 'name', None) or str(file)
+    fmt, _ = format_of(name)
+    if fmt == 'parquet':
+        return pd.read_parquet(file, columns=columns)
+    if fmt == 'feather':
+        return pd.read_feather(file, columns=columns)
+    return read_csv(file, usecols=columns)   # compression is detected from the content
+
+
+def columns_of(file, name=None):
+    # column names without loading the data
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    name = name or getattr(file, 'name', None) or str(file)
+    fmt, _ = format_of(name)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    if fmt == 'parquet':
+        names = pq.read_schema(file).names
+    elif fmt == 'feather':
+        names = pyarrow.ipc.open_file(file).schema.names
+    else:
+        names = csv_columns(file)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return [n for n in names if not n.startswith('__index_level_')]
+
+
+def write_table(df, fmt='csv', compression=None):
+    # serialized bytes, ready for st.download_button
+    buffer = io.BytesIO()
+    if fmt == 'csv':
+        df.to_csv(buffer, index=False, compression=compression)
+    elif fmt == 'parquet':
+        df.to_parquet(buffer, index=False, compression=compression)
+    elif fmt == 'feather':
+        df.reset_index(drop=True).to_feather(buffer, compression=compression or 'uncompressed')
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return buffer.getvalue()
+
+
+def save_table(df, path, compression=None):
+    # writes straight to a path, format from the extension (.csv, .csv.gz, .parquet, .feather)
+    fmt, csv_compression = format_of(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False, compression=csv_compression)
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=False, compression=compression or 'zstd')
+    else:
+        df.reset_index(drop=True).to_feather(path, compression=compression or 'lz4')
+    return os.path.getsize(path)
+
+
+def file_name(stem, fmt='csv', compression=None):
+    name = stem + EXTENSIONS[fmt]
+    if fmt == 'csv' and compression:
+        name += CSV_COMPRESSION_EXTENSIONS[compression]
+    return name
+
+
+def mime_type(fmt='csv', compression=None):
+    if fmt == 'csv' and compression:
+        return 'application/octet-stream'
+    return MIME_TYPES[fmt]
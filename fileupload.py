@@ -1,20 +1,21 @@
 import streamlit as st
-import pandas as pd
+from preview import show_preview
+from fileformats import UPLOAD_TYPES, read_table
 
 st.set_page_config(page_title="Simple Test App", layout="wide")
 st.title("🚀 Data Cleaning App")
 
 # File uploader widget
-uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
+uploaded_file = st.file_uploader("Upload your CSV, Parquet or Feather file", type=UPLOAD_TYPES)
 
 # Conditional display
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+    df = read_table(uploaded_file)
     st.success("File uploaded successfully!")
     st.write("### Preview of your data:")
-    st.dataframe(df)
+    show_preview(df, "original")
 else:
-    st.info("Please upload a CSV file to get started.")
+    st.info("Please upload a CSV, Parquet or Feather file to get started.")
 
 
 
@@ -0,0 +1,208 @@
+import datetime
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, inspect, select
+from bulkwriter import DEFAULT_BATCH_ROWS, bulk_merge, bulk_write
+from cleancache import canonical_params
+from dedup import SeenHashes, row_hashes
+from outofcore import (ColumnStats, apply_plan, check_params, new_column_stats, plan_cleaning, row_masks,
+                       text_decimals, update_column_stats)
+
+# Incremental cleaning of append-mostly SQL tables. Each source keeps a small state
+# file with the last watermark (identity, timestamp or rowversion value) and the
+# column statistics of every row seen so far; a run reads only the rows past the
+# watermark, fills and winsorizes them with the combined statistics and appends or
+# merges them into the target. The target write is one transaction (appends and
+# merges go through a staging table) and the watermark only moves after it committed,
+# so a failed run leaves the target untouched and is repeated in full by the next one.
+#
+# Rows cleaned in earlier runs are not revisited when the statistics shift. Duplicates
+# are judged against the last DUPLICATE_WINDOW_ROWS distinct rows, so the state and
+# the time to load it stay bounded as the table grows.
+
+STATE_DIR = os.environ.get("DATATHERAPIST_STATE_DIR", os.path.join(os.path.expanduser("~"), ".datatherapist", "state"))
+STATE_SKETCH_SIZE = 20_000
+DUPLICATE_WINDOW_ROWS = 5_000_000   # 8 bytes each
+
+
+def _state_paths(name, state_dir):
+    base = os.path.join(state_dir, name)
+    return base + ".json", base + ".hashes.npy"
+
+
+class RecentHashes(SeenHashes):
+    # SeenHashes that remembers the arrival order, so only the newest `window` are saved
+
+    def __init__(self, window=DUPLICATE_WINDOW_ROWS):
+        super().__init__()
+        self.window = window
+        self._order = [np.empty(0, dtype=np.uint64)]
+
+    def add(self, hashes):
+        super().add(hashes)
+        self._order.append(np.asarray(hashes, dtype=np.uint64))
+
+    def to_array(self):
+        return np.concatenate(self._order)[-self.window:]
+
+    @classmethod
+    def from_array(cls, hashes, window=DUPLICATE_WINDOW_ROWS):
+        seen = cls(window)
+        seen.add(np.asarray(hashes, dtype=np.uint64)[-window:])
+        return seen
+
+
+def _encode_watermark(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'type': 'bytes', 'value': bytes(value).hex()}
+    if isinstance(value, (pd.Timestamp, datetime.datetime, np.datetime64)):
+        return {'type': 'datetime', 'value': pd.Timestamp(value).isoformat()}
+    if isinstance(value, (int, np.integer)):
+        return {'type': 'int', 'value': int(value)}
+    if isinstance(value, (float, np.floating)):
+        return {'type': 'float', 'value': float(value)}
+    return {'type': 'str', 'value': str(value)}
+
+
+def _decode_watermark(encoded):
+    if encoded is None:
+        return None
+    kind, value = encoded['type'], encoded['value']
+    if kind == 'bytes':
+        return bytes.fromhex(value)
+    if kind == 'datetime':
+        return pd.Timestamp(value).to_pydatetime()
+    return {'int': int, 'float': float, 'str': str}[kind](value)
+
+
+def load_state(name, clean_params, state_dir=STATE_DIR, duplicate_window=DUPLICATE_WINDOW_ROWS):
+    json_path, hashes_path = _state_paths(name, state_dir)
+    if not os.path.exists(json_path):
+        return {'name': name, 'params': canonical_params(clean_params), 'watermark': None,
+                'kinds': {}, 'stats': {}, 'runs': 0, 'rows': 0}, RecentHashes(duplicate_window)
+    with open(json_path, encoding='utf-8') as f:
+        state = json.load(f)
+    if state['params'] != canonical_params(clean_params):
+        raise ValueError(f"clean_params changed since the last run of '{name}'; "
+                         f"reset the state to rebuild the statistics")
+    state['stats'] = {col: ColumnStats.from_state(s) for col, s in state['stats'].items()}
+    seen = RecentHashes.from_array(np.load(hashes_path), duplicate_window) if os.path.exists(hashes_path) \
+        else RecentHashes(duplicate_window)
+    return state, seen
+
+
+def save_state(state, seen, state_dir=STATE_DIR):
+    os.makedirs(state_dir, exist_ok=True)
+    json_path, hashes_path = _state_paths(state['name'], state_dir)
+    data = dict(state, stats={col: s.to_state() for col, s in state['stats'].items()})
+    with open(json_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(data, f, default=lambda v: v.item() if hasattr(v, 'item') else str(v))
+    with open(hashes_path + ".tmp", 'wb') as f:
+        np.save(f, seen.to_array())
+    os.replace(hashes_path + ".tmp", hashes_path)
+    os.replace(json_path + ".tmp", json_path)
+
+
+def reset_state(name, state_dir=STATE_DIR):
+    for path in _state_paths(name, state_dir):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def read_delta(engine, table, watermark_column, watermark=None, schema=None):
+    # SELECT * FROM table WHERE watermark_column > :watermark ORDER BY watermark_column
+    source = Table(table, MetaData(), schema=schema, autoload_with=engine)
+    stmt = select(source)
+    if watermark is not None:
+        stmt = stmt.where(source.c[watermark_column] > watermark)
+    stmt = stmt.order_by(source.c[watermark_column])
+    with engine.connect() as conn:
+        return pd.read_sql(stmt, conn)
+
+
+def clean_delta(delta, state, seen, clean_params, keep_columns=()):
+    # cleans the new rows with statistics of everything seen so far (updated in place)
+    kinds = state['kinds']
+    for col in delta.columns:
+        if col not in kinds:
+            dtype = delta[col].dtype
+            if col in keep_columns or pd.api.types.is_bool_dtype(dtype) \
+                    or pd.api.types.is_datetime64_any_dtype(dtype):
+                kinds[col] = 'keep'
+            else:
+                kinds[col] = 'num' if pd.api.types.is_numeric_dtype(dtype) else 'text'
+    num_kinds = {c: k for c, k in kinds.items() if k == 'num' and c in delta.columns}
+
+    chunk = delta.reset_index(drop=True)
+    for col in num_kinds:
+        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+    cleanable = [c for c in chunk.columns if kinds[c] != 'keep']
+
+    _, drop_empty, drop_num, drop_categ = row_masks(chunk, num_kinds, clean_params, None)
+    drop_dup = np.zeros(len(chunk), dtype=bool)
+    if clean_params.get('duplicates', False):
+        # the watermark and key columns always differ, so duplicates are judged on the other columns
+        drop_dup = seen.mark_repeats(row_hashes(chunk, cleanable))
+
+    stats = state['stats']
+    for col in cleanable:
+        if col not in stats:
+            stats[col] = new_column_stats(kinds[col], clean_params, STATE_SKETCH_SIZE, seed=len(stats) + 1)
+        if kinds[col] == 'num':
+            dec = text_decimals(delta[col].dropna())
+            if dec is not None and dec >= 0 and not pd.api.types.is_integer_dtype(delta[col].dtype):
+                stats[col].decimals = dec if stats[col].decimals is None else max(stats[col].decimals, dec)
+    fill_rows = ~(drop_dup | drop_empty | drop_num)
+    current = {c: stats[c] for c in cleanable}
+    update_column_stats(current, chunk, fill_rows, fill_rows & ~drop_categ, clean_params)
+
+    kept = chunk[fill_rows & ~drop_categ].copy()
+    cleaned, deleted, winsorized = apply_plan(kept, plan_cleaning({'stats': current}, clean_params), clean_params)
+    cleaned = cleaned[~deleted].reset_index(drop=True)
+    return cleaned, {'duplicates_removed': int(drop_dup.sum()),
+                     'missing_rows_removed': int((~drop_dup & (drop_empty | drop_num | drop_categ)).sum()),
+                     'outliers_winsorized': winsorized,
+                     'outliers_deleted': int(deleted.sum())}
+
+
+def run_incremental(name, source_engine, table, watermark_column, target_engine, target_table,
+                    clean_params, schema=None, target_schema=None, mode='append', keys=None,
+                    state_dir=STATE_DIR, chunksize=DEFAULT_BATCH_ROWS, duplicate_window=DUPLICATE_WINDOW_ROWS):
+    # one incremental run; returns a JSON-ready summary
+    check_params(clean_params, "Incremental cleaning")
+    if mode not in ('append', 'merge'):
+        raise ValueError(f"Unknown mode: {mode}")
+    if mode == 'merge' and not keys:
+        raise ValueError("merge mode needs key columns")
+    start = time.perf_counter()
+    state, seen = load_state(name, clean_params, state_dir, duplicate_window)
+    watermark = _decode_watermark(state['watermark'])
+
+    delta = read_delta(source_engine, table, watermark_column, watermark, schema)
+    summary = {'name': name, 'rows_in': len(delta), 'rows_out': 0, 'watermark_from': state['watermark']}
+    if delta.empty:
+        summary.update(watermark_to=state['watermark'], seconds=round(time.perf_counter() - start, 3))
+        return summary
+
+    new_watermark = _encode_watermark(delta[watermark_column].max())
+    cleaned, counts = clean_delta(delta, state, seen, clean_params,
+                                  keep_columns=[watermark_column] + list(keys or []))
+    summary.update(counts, rows_out=len(cleaned))
+
+    if mode == 'merge' and inspect(target_engine).has_table(target_table, schema=target_schema):
+        stats = bulk_merge(cleaned, target_engine, target_table, keys, schema=target_schema, chunksize=chunksize)
+        summary['rows_replaced'] = stats['replaced']
+    else:
+        # staged, then added in one INSERT ... SELECT: a failed run commits no rows
+        bulk_write(cleaned, target_engine, target_table, schema=target_schema, if_exists='append',
+                   chunksize=chunksize, atomic=True)
+
+    state['watermark'] = new_watermark
+    state['runs'] += 1
+    state['rows'] += len(delta)
+    save_state(state, seen, state_dir)
+    summary.update(watermark_to=new_watermark, runs=state['runs'], seconds=round(time.perf_counter() - start, 3))
+    return summary
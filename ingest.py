@@ -0,0 +1,194 @@
+import codecs
+import csv
+import re
+import zipfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+# CSV ingest on pyarrow's multithreaded parser. Compression (gzip, zstd, bz2, zip) is
+# recognized from the first bytes of the file, so uploads can be compressed whatever
+# their name; the delimiter and encoding are sniffed from a sample, and column types
+# are inferred from the first SAMPLE_BYTES instead of the whole file. When a later
+# value does not fit the inferred type, that column is widened (int -> float -> text)
+# and the file parsed again. The result has the dtypes pd.read_csv would give: text
+# stays text (no timestamp parsing), empty strings are missing values and columns
+# without any value are float64.
+
+SAMPLE_BYTES = 1024 ** 2
+BLOCK_BYTES = 16 * 1024 ** 2
+DELIMITERS = ",;\t|"
+MAX_WIDENINGS = 50
+MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\x28\xb5\x2f\xfd', 'zstd'), (b'BZh', 'bz2'), (b'PK\x03\x04', 'zip'))
+BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'))
+
+
+def detect_compression(head):
+    for magic, codec in MAGIC:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return file
+
+
+def _source(file):
+    # something pyarrow can stream from without closing the caller's file
+    if hasattr(file, 'getbuffer'):
+        return pa.BufferReader(file.getbuffer())   # BytesIO / Streamlit's UploadedFile, no copy
+    if hasattr(file, 'read'):
+        return pa.BufferReader(_rewind(file).read())
+    return file
+
+
+def _peek(file, n):
+    if hasattr(file, 'read'):
+        head = _rewind(file).read(n)
+        _rewind(file)
+        return head
+    with open(file, 'rb') as f:
+        return f.read(n)
+
+
+def _zip_member(archive):
+    # the only file in the archive, or its only CSV
+    names = [n for n in archive.namelist() if not n.endswith('/')]
+    csvs = [n for n in names if n.lower().endswith(('.csv', '.txt', '.tsv'))]
+    if len(names) == 1:
+        return names[0]
+    if len(csvs) == 1:
+        return csvs[0]
+    raise ValueError(f"Zip archive should hold a single CSV file, found: {', '.join(names[:10])}")
+
+
+def open_csv(file):
+    # decompressed binary stream of a path or file-like object; a fresh stream per call
+    compression = detect_compression(_peek(file, 4))
+    if compression == 'zip':
+        archive = zipfile.ZipFile(_rewind(file))
+        return archive.open(_zip_member(archive))
+    return pa.input_stream(_source(file), compression=compression)
+
+
+def _sample(file, n=SAMPLE_BYTES):
+    # the first n decompressed bytes, cut after the last complete line
+    with open_csv(file) as stream:
+        sample = stream.read(n)
+        complete = len(sample) < n
+    if not complete and b'\n' in sample:
+        sample = sample[:sample.rindex(b'\n') + 1]
+    return sample, complete
+
+
+def sniff(sample):
+    # {'encoding', 'delimiter'} of a raw sample
+    encoding = None
+    for bom, name in BOMS:
+        if sample.startswith(bom):
+            encoding, sample = name, sample[len(bom):]
+            break
+    if encoding is None:
+        try:
+            sample.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError as e:
+            # a multi-byte character cut off at the end of the sample is still UTF-8
+            encoding = 'utf-8' if e.start >= len(sample) - 3 else 'cp1252'
+    text = sample.decode(encoding, errors='replace')
+    lines = text.splitlines()[:50]
+    try:
+        delimiter = csv.Sniffer().sniff("\n".join(lines), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ','
+    return {'encoding': encoding, 'delimiter': delimiter}
+
+
+def _options(encoding, delimiter, usecols=None, column_types=None, threads=True):
+    read = pv.ReadOptions(use_threads=threads, block_size=BLOCK_BYTES,
+                          encoding='utf8' if encoding in ('utf-8', 'utf-8-sig') else encoding)
+    parse = pv.ParseOptions(delimiter=delimiter)
+    convert = pv.ConvertOptions(include_columns=usecols, column_types=column_types,
+                                strings_can_be_null=True, quoted_strings_can_be_null=True)
+    return read, parse, convert
+
+
+def _sample_types(sample, encoding, delimiter, usecols):
+    # types of a head sample, with the ones pandas would not infer turned into text; a
+    # column empty in the sample starts as float64, like pandas' all-NaN column
+    read, parse, convert = _options(encoding, delimiter, usecols)
+    table = pv.read_csv(pa.py_buffer(sample), read_options=read, parse_options=parse, convert_options=convert)
+    types = {}
+    for field in table.schema:
+        if pa.types.is_null(field.type):
+            types[field.name] = pa.float64()
+        elif pa.types.is_temporal(field.type) or pa.types.is_decimal(field.type):
+            types[field.name] = pa.string()
+        else:
+            types[field.name] = field.type
+    return types
+
+
+def _null_as_float(table):
+    # Arrow's null type would come back as an object column of None
+    for i, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table
+
+
+def _widen(arrow_type):
+    if pa.types.is_integer(arrow_type):
+        return pa.float64()
+    return pa.string()
+
+
+def _header(sample, encoding, delimiter):
+    read, parse, _ = _options(encoding, delimiter)
+    return pv.open_csv(pa.py_buffer(sample), read_options=read, parse_options=parse).schema.names
+
+
+def csv_columns(file):
+    # column names from the header line, without reading the rest of the file
+    sample, _ = _sample(file, 64 * 1024)
+    sniffed = sniff(sample)
+    return _header(sample, sniffed['encoding'], sniffed['delimiter'])
+
+
+def _arrow_read(file, sample, complete, encoding, delimiter, usecols, threads):
+    # the sample is the whole file: let pyarrow infer as usual
+    types = None if complete else _sample_types(sample, encoding, delimiter, usecols)
+    for _ in range(MAX_WIDENINGS):
+        read, parse, convert = _options(encoding, delimiter, usecols, types, threads)
+        try:
+            with open_csv(file) as stream:
+                return pv.read_csv(stream, read_options=read, parse_options=parse, convert_options=convert)
+        except pa.ArrowInvalid as e:
+            # "In CSV column #3: Row #70000: CSV conversion error to int64: invalid value 'x'"
+            match = re.search(r"column #(\d+)", str(e))
+            if types is None or match is None:
+                raise
+            name = _header(sample, encoding, delimiter)[int(match.group(1))]
+            if types.get(name, pa.string()) == pa.string():
+                raise
+            types[name] = _widen(types[name])
+    raise pa.ArrowInvalid("Too many columns changed type after the sample")
+
+
+def read_csv(file, usecols=None, encoding=None, delimiter=None, threads=True):
+    # path or file-like (e.g. Streamlit's UploadedFile), plain or compressed
+    sample, complete = _sample(file)
+    sniffed = sniff(sample)
+    encoding = encoding or sniffed['encoding']
+    delimiter = delimiter or sniffed['delimiter']
+    usecols = list(usecols) if usecols else None
+    try:
+        table = _arrow_read(file, sample, complete, encoding, delimiter, usecols, threads)
+        return _null_as_float(table).to_pandas()
+    except (pa.ArrowInvalid, UnicodeDecodeError):
+        # ragged rows, odd quoting and the like: pandas' parser is more forgiving
+        with open_csv(file) as stream:
+            return pd.read_csv(stream, sep=delimiter, encoding=encoding, usecols=usecols)
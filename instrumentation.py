@@ -0,0 +1,187 @@
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+# Per-stage measurements of the pipeline (load, coerce, autoclean, display, download,
+# push): wall and CPU seconds, peak resident memory above the level at the start of the
+# stage, rows in/out and rows per second. Every stage is appended to a JSON lines log,
+# tagged with the session and the table or file it worked on, and folded into counters
+# per stage and status written as a Prometheus text file (for node_exporter's textfile
+# collector). Tables and files are unbounded, so they appear only in the log, never as
+# labels. The log is rotated at STAGE_LOG_MAX_MB, keeping STAGE_LOG_BACKUPS old files.
+#
+# RSS and CPU time are process-wide, so stages of sessions running at the same time
+# inflate each other's figures.
+
+METRICS_DIR = os.environ.get("DATATHERAPIST_METRICS_DIR",
+                             os.path.join(tempfile.gettempdir(), "datatherapist_metrics"))
+STAGE_LOG = "stages.jsonl"
+STAGE_LOG_MAX_MB = int(os.environ.get("DATATHERAPIST_STAGE_LOG_MAX_MB", 50))
+STAGE_LOG_BACKUPS = 3
+PROM_FILE = "datatherapist.prom"
+SAMPLE_SECONDS = 0.01
+
+_lock = threading.Lock()
+_totals = defaultdict(lambda: {'runs': 0, 'seconds': 0.0, 'cpu_seconds': 0.0, 'rows': 0, 'peak_rss_bytes': 0})
+
+
+def _windows_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    if not kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return 0
+    return counters.WorkingSetSize
+
+
+def _rss_bytes():
+    if sys.platform == 'win32':
+        # working set, the Windows counterpart of the resident set
+        return _windows_rss()
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # no procfs: the lifetime peak is the best available figure
+        if resource is None:
+            return 0
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class PeakRss:
+    # samples the resident set size on a thread while a stage runs
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def delta_bytes(self):
+        return max(self.peak - self.start, 0)
+
+    @property
+    def delta_mb(self):
+        return round(self.delta_bytes / 1024 ** 2, 1)
+
+
+@contextmanager
+def stage(name, rows_in=None, session=None, source=None, records=None, log=True):
+    # with stage('autoclean', len(df), ...) as rec: ...; rec['rows_out'] = len(result)
+    rec = {'stage': name, 'session': session, 'source': source,
+           'started': datetime.datetime.now().isoformat(timespec='seconds'),
+           'rows_in': rows_in, 'rows_out': rows_in, 'status': 'ok'}
+    mem = PeakRss().__enter__()
+    start, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield rec
+    except BaseException as e:
+        rec.update(status='failed', error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        cpu_seconds = time.process_time() - cpu
+        mem.__exit__(None, None, None)
+        rec.update(seconds=round(seconds, 4), cpu_seconds=round(cpu_seconds, 4), peak_rss_delta_mb=mem.delta_mb,
+                   rows_per_sec=round(rec['rows_in'] / seconds, 1) if rec['rows_in'] and seconds > 0 else None)
+        if records is not None:
+            records.append(rec)
+        if log:
+            record(rec, mem.delta_bytes)
+
+
+def record(rec, peak_rss_bytes=0, metrics_dir=None):
+    metrics_dir = metrics_dir or METRICS_DIR
+    with _lock:
+        totals = _totals[(rec['stage'], rec['status'])]
+        totals['runs'] += 1
+        totals['seconds'] += rec['seconds']
+        totals['cpu_seconds'] += rec['cpu_seconds']
+        totals['rows'] += rec['rows_in'] or 0
+        totals['peak_rss_bytes'] = max(totals['peak_rss_bytes'], peak_rss_bytes)
+        try:
+            os.makedirs(metrics_dir, exist_ok=True)
+            log_path = os.path.join(metrics_dir, STAGE_LOG)
+            _rotate(log_path)
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(rec, default=str) + "\n")
+            prom_path = os.path.join(metrics_dir, PROM_FILE)
+            with open(prom_path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(prometheus_text())
+            os.replace(prom_path + ".tmp", prom_path)
+        except OSError:
+            pass  # metrics must never break the pipeline
+
+
+def _rotate(path, max_mb=STAGE_LOG_MAX_MB, backups=STAGE_LOG_BACKUPS):
+    # stages.jsonl -> stages.jsonl.1 -> ... -> stages.jsonl.<backups>, the oldest is dropped
+    try:
+        if os.path.getsize(path) < max_mb * 1024 ** 2:
+            return
+    except OSError:
+        return  # no log yet
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    if backups:
+        os.replace(path, f"{path}.1")
+    else:
+        os.remove(path)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    # text exposition format of the totals; record() calls it with _lock held
+    metrics = (
+        ('datatherapist_stage_runs_total', 'counter', 'Pipeline stages run.', 'runs'),
+        ('datatherapist_stage_seconds_total', 'counter', 'Wall time spent in pipeline stages.', 'seconds'),
+        ('datatherapist_stage_cpu_seconds_total', 'counter', 'Process CPU time spent in pipeline stages.',
+         'cpu_seconds'),
+        ('datatherapist_stage_rows_total', 'counter', 'Input rows processed by pipeline stages.', 'rows'),
+        ('datatherapist_stage_peak_rss_delta_bytes', 'gauge',
+         'Largest resident memory growth seen during one stage.', 'peak_rss_bytes'),
+    )
+    lines = []
+    for metric, kind, help_text, field in metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for (name, status), totals in sorted(_totals.items()):
+            labels = f'stage="{_label(name)}",status="{_label(status)}"'
+            lines.append(f"{metric}{{{labels}}} {round(totals[field], 6)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Long-running load/clean/push work runs on a process-wide thread pool instead of the
+# Streamlit script thread. Jobs live in a registry shared by every session, so a page
+# that reconnects (or another tab holding the job id) can pick up the result.
+# Cancellation is cooperative: a job stops the next time it reports progress.
+
+MAX_WORKERS = int(os.environ.get("DATATHERAPIST_JOB_WORKERS", 4))
+KEEP_FINISHED_SECONDS = 3600
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, kind, description=""):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def report(self, progress=None, message=None):
+        # called by the job function; raises JobCancelled once a cancel was requested
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return round((self.finished or time.time()) - self.started, 1)
+
+    def to_dict(self):
+        return {'id': self.id, 'kind': self.kind, 'description': self.description, 'status': self.status,
+                'progress': self.progress, 'message': self.message, 'error': self.error,
+                'seconds': self.seconds}
+
+
+class JobRunner:
+
+    def __init__(self, max_workers=MAX_WORKERS, keep_finished_seconds=KEEP_FINISHED_SECONDS):
+        self.keep_finished_seconds = keep_finished_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, description="", **kwargs):
+        # fn(job, *args, **kwargs); its return value becomes job.result
+        job = Job(kind, description)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, kind=None):
+        with self._lock:
+            return [j for j in self._jobs.values() if kind is None or j.kind == kind]
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.finished, job.status = time.time(), CANCELLED
+            return
+        job.status, job.started = RUNNING, time.time()
+        result = None
+        try:
+            result = fn(job, *args, **kwargs)
+            status = DONE
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            job.error = f"{e}"
+            job.message = traceback.format_exc(limit=5)
+            status = FAILED
+        job.finished = time.time()
+        if status == DONE:
+            job.result, job.progress = result, 1.0
+        job.status = status
+
+    def _purge(self):
+        # drop finished jobs (and their results) nobody picked up in time
+        cutoff = time.time() - self.keep_finished_seconds
+        for job_id in [i for i, j in self._jobs.items() if j.done and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+# shared by every session in this server process
+runner = JobRunner()
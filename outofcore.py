@@ -0,0 +1,442 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dedup import SeenHashes, row_hashes
+from fastclean import (DATETIME_VALUES, FAST_DUPLICATES, FAST_MISSING_CATEG, FAST_MISSING_NUM,
+                       FAST_OUTLIERS, text_decimals)
+
+# Two streaming passes over a CSV: the first gathers per-column statistics, the second
+# applies the cleaning decisions chunk by chunk and appends to the output file.
+# Memory is bounded by the chunk size, the quantile sketches, MAX_TRACKED_VALUES value
+# counts per column and 8 bytes per distinct row for duplicate detection. Most frequent
+# values come from a Misra-Gries summary: exact while a column has at most
+# MAX_TRACKED_VALUES distinct values, and any value filling more than 1/MAX_TRACKED_VALUES
+# of the column is still found beyond that. Medians and IQR bounds come from a fixed-size uniform
+# sample, so they are exact up to SKETCH_SIZE values and approximate beyond that;
+# outlier deletion uses bounds from the whole file instead of AutoClean's column by
+# column recomputation.
+
+DEFAULT_CHUNK_ROWS = 100_000
+SKETCH_SIZE = 200_000
+MAX_TRACKED_VALUES = 10_000
+# the app only reads and writes server files below this directory; unset, it cannot
+DATA_DIR = os.environ.get("DATATHERAPIST_DATA_DIR")
+MISSING_NUM = FAST_MISSING_NUM + ('delete',)
+MISSING_CATEG = FAST_MISSING_CATEG + ('delete',)
+
+
+class QuantileSketch:
+    # uniform reservoir sample of a numeric column
+
+    def __init__(self, size=SKETCH_SIZE, seed=0):
+        self.size = size
+        self.sample = np.empty(0)
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        take = min(max(self.size - len(self.sample), 0), len(values))
+        if take:
+            self.sample = np.concatenate([self.sample, values[:take]])
+        rest = values[take:]
+        if len(rest):
+            # item number t replaces a random slot with probability size / t
+            positions = self.seen + take + np.arange(1, len(rest) + 1)
+            slots = (self._rng.random(len(rest)) * positions).astype(np.int64)
+            hit = slots < self.size
+            self.sample[slots[hit]] = rest[hit]
+        self.seen += len(values)
+
+    def to_state(self):
+        return {'size': self.size, 'seen': self.seen, 'sample': self.sample.tolist()}
+
+    @classmethod
+    def from_state(cls, state, seed=0):
+        sketch = cls(state['size'], seed)
+        sketch.sample = np.asarray(state['sample'], dtype='float64')
+        sketch.seen = state['seen']
+        return sketch
+
+    def quantiles(self, qs, extra_value=None, extra_count=0):
+        # quantiles as if extra_count copies of extra_value had been added (imputed values)
+        sample = self.sample
+        if extra_count and extra_value is not None and not np.isnan(extra_value):
+            k = extra_count if self.seen <= self.size else int(round(len(sample) * extra_count / self.seen))
+            sample = np.concatenate([sample, np.full(k, extra_value)])
+        if not len(sample):
+            return [np.nan] * len(qs)
+        return list(np.percentile(sample, qs))
+
+
+class ColumnStats:
+
+    def __init__(self, kind):
+        self.kind = kind          # 'num' or 'text'
+        self.count = 0
+        self.total = 0.0
+        self.missing = 0          # missing values left for imputation
+        self.integral = True
+        self.decimals = None
+        self.fill_sketch = None
+        self.bounds_sketch = None
+        self.counts = {}          # value -> count (Misra-Gries), in order of first appearance
+        self.datetime_ok = True
+        self.coerced = 0
+
+    def to_dict(self):
+        return {'kind': self.kind, 'count': self.count, 'missing': self.missing,
+                'integral': self.integral, 'decimals': self.decimals, 'coerced': self.coerced}
+
+    def to_state(self):
+        # everything needed to continue collecting later (JSON-serializable)
+        state = dict(self.to_dict(), total=self.total, datetime_ok=self.datetime_ok,
+                     counts=[[v, c] for v, c in self.counts.items()])
+        if self.fill_sketch is not None:
+            state['fill_sketch'] = self.fill_sketch.to_state()
+            if self.bounds_sketch is not self.fill_sketch:
+                state['bounds_sketch'] = self.bounds_sketch.to_state()
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        s = cls(state['kind'])
+        for name in ('count', 'total', 'missing', 'integral', 'decimals', 'datetime_ok', 'coerced'):
+            setattr(s, name, state[name])
+        s.counts = {v: c for v, c in state['counts']}
+        if 'fill_sketch' in state:
+            s.fill_sketch = QuantileSketch.from_state(state['fill_sketch'])
+            s.bounds_sketch = QuantileSketch.from_state(state['bounds_sketch'], seed=1) \
+                if 'bounds_sketch' in state else s.fill_sketch
+        return s
+
+
+def new_column_stats(kind, clean_params, sketch_size=SKETCH_SIZE, seed=0):
+    s = ColumnStats(kind)
+    if kind == 'num':
+        s.fill_sketch = QuantileSketch(sketch_size, seed=seed)
+        s.bounds_sketch = s.fill_sketch
+        if clean_params.get('missing_categ') == 'delete':
+            # rows deleted for missing text still count for the fill values, not for the bounds
+            s.bounds_sketch = QuantileSketch(sketch_size, seed=seed + 10_000)
+    return s
+
+
+def add_counts(s, pairs, limit=MAX_TRACKED_VALUES):
+    # Misra-Gries over (value, count) pairs: past limit distinct values, every count drops
+    # by the (limit + 1)-th largest one and values at zero are forgotten
+    for val, c in pairs:
+        s.counts[val] = s.counts.get(val, 0) + int(c)
+    if len(s.counts) > limit:
+        cut = np.partition(np.fromiter(s.counts.values(), dtype=np.int64, count=len(s.counts)),
+                           len(s.counts) - limit - 1)[len(s.counts) - limit - 1]
+        s.counts = {v: c - cut for v, c in s.counts.items() if c > cut}
+
+
+def data_path(path, data_dir=DATA_DIR):
+    # path below data_dir (relative ones are taken from there), with symlinks resolved
+    if not data_dir:
+        raise ValueError("Server files are disabled; set DATATHERAPIST_DATA_DIR to the directory they may be in.")
+    root = os.path.realpath(data_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"{path} is outside the data directory {root}.")
+    return resolved
+
+
+def update_column_stats(stats, chunk, fill_rows, bounds_rows, clean_params):
+    # add one typed chunk to the per-column statistics
+    for col, s in stats.items():
+        values = chunk[col]
+        if s.kind == 'num':
+            v = values.to_numpy()
+            fv = v[fill_rows]
+            nonnull = fv[~np.isnan(fv)]
+            s.count += len(nonnull)
+            s.total += float(nonnull.sum())
+            s.integral &= bool(np.all(nonnull % 1 == 0))
+            s.fill_sketch.update(fv)
+            bv = v[bounds_rows]
+            s.missing += int(np.isnan(bv).sum())
+            if s.bounds_sketch is not s.fill_sketch:
+                s.bounds_sketch.update(bv)
+            if clean_params.get('missing_num') == 'most_frequent':
+                add_counts(s, pd.Series(nonnull).value_counts(sort=False).items())
+        else:
+            tv = values[fill_rows]
+            s.missing += int(tv.isna().sum())
+            if clean_params.get('missing_categ') == 'most_frequent':
+                vc = tv.value_counts(sort=False)
+                add_counts(s, ((val, vc[val]) for val in pd.unique(tv.dropna())))
+            if clean_params.get('extract_datetime') and s.datetime_ok and tv.notna().any():
+                try:
+                    pd.to_datetime(tv)
+                except Exception:
+                    s.datetime_ok = False
+
+
+def check_params(clean_params, what="Out-of-core cleaning"):
+    ok = (clean_params.get('mode') == 'manual'
+          and clean_params.get('duplicates', False) in FAST_DUPLICATES
+          and clean_params.get('missing_num', False) in MISSING_NUM
+          and clean_params.get('missing_categ', False) in MISSING_CATEG
+          and clean_params.get('outliers', False) in FAST_OUTLIERS
+          and clean_params.get('extract_datetime', False) in DATETIME_VALUES)
+    if not ok:
+        raise ValueError(f"{what} supports manual mode with mean/median/most_frequent/delete "
+                         "missing values, winz/delete outliers, duplicates and datetime conversion.")
+
+
+def _read_chunks(src, chunksize, read_kwargs):
+    # every column is read as text so types and row hashes agree across chunks
+    if hasattr(src, 'seek'):
+        src.seek(0)
+    return pd.read_csv(src, chunksize=chunksize, dtype=str, **(read_kwargs or {}))
+
+
+def _decide_kinds(chunk, kinds):
+    for col in chunk.columns:
+        if kinds.get(col) is None and chunk[col].notna().any():
+            parsed = pd.to_numeric(chunk[col], errors='coerce')
+            kinds[col] = 'num' if parsed.notna().sum() == chunk[col].notna().sum() else 'text'
+
+
+def _typed(chunk, kinds):
+    # numeric columns as float64 (unparseable text becomes NaN), the rest as text
+    coerced = {}
+    for col, kind in kinds.items():
+        if kind == 'num':
+            parsed = pd.to_numeric(chunk[col], errors='coerce')
+            coerced[col] = int(chunk[col].notna().sum() - parsed.notna().sum())
+            chunk[col] = parsed.astype('float64')
+    return chunk, coerced
+
+
+def row_masks(chunk, kinds, clean_params, seen):
+    # rows removed before statistics: duplicates, empty rows and 'delete' missing values
+    drop_dup = seen.mark_repeats(row_hashes(chunk)) \
+        if seen is not None else np.zeros(len(chunk), dtype=bool)
+    missing_num = clean_params.get('missing_num', False)
+    missing_categ = clean_params.get('missing_categ', False)
+    isna = chunk.isna()
+    drop_empty = isna.all(axis=1).to_numpy() & bool(missing_num or missing_categ)
+    num_cols = [c for c, k in kinds.items() if k == 'num']
+    text_cols = [c for c in chunk.columns if c not in num_cols]
+    drop_num = isna[num_cols].any(axis=1).to_numpy() if missing_num == 'delete' and num_cols \
+        else np.zeros(len(chunk), dtype=bool)
+    drop_categ = isna[text_cols].any(axis=1).to_numpy() if missing_categ == 'delete' and text_cols \
+        else np.zeros(len(chunk), dtype=bool)
+    return drop_dup, drop_empty, drop_num, drop_categ
+
+
+def collect_stats(src, clean_params, chunksize=DEFAULT_CHUNK_ROWS, sketch_size=SKETCH_SIZE,
+                  read_kwargs=None, on_progress=None):
+    # pass 1. Kinds are decided from a column's first values; a column typed numeric that
+    # later turns out to hold text is re-typed as text and the pass repeated, so no value
+    # is coerced to NaN and then imputed (pandas reads such a column as text as well)
+    check_params(clean_params)
+    forced = {}
+    while True:
+        collected = _collect(src, clean_params, chunksize, sketch_size, read_kwargs, on_progress, forced)
+        retyped = [c for c, s in collected['stats'].items() if s.kind == 'num' and s.coerced]
+        if not retyped:
+            collected['retyped'] = list(forced)
+            return collected
+        forced.update(dict.fromkeys(retyped, 'text'))
+
+
+def _collect(src, clean_params, chunksize, sketch_size, read_kwargs, on_progress, forced):
+    kinds = dict(forced)
+    stats = {}
+    seen = SeenHashes() if clean_params.get('duplicates', False) else None
+    duplicate_rows = []
+    rows = 0
+    for raw in _read_chunks(src, chunksize, read_kwargs):
+        _decide_kinds(raw, kinds)
+        for col in raw.columns:
+            kinds.setdefault(col, None)
+        decided = {c: k for c, k in kinds.items() if k is not None}
+        chunk, coerced = _typed(raw, decided)
+
+        for col in chunk.columns:
+            if col not in stats and kinds[col] is not None:
+                stats[col] = new_column_stats(kinds[col], clean_params, sketch_size, seed=len(stats) + 1)
+            if col in stats and stats[col].kind == 'num':
+                # decimals follow AutoClean: taken from every input row
+                dec = text_decimals(chunk[col])
+                if dec is not None:
+                    stats[col].decimals = dec if stats[col].decimals is None else max(stats[col].decimals, dec)
+                stats[col].coerced += coerced.get(col, 0)
+
+        drop_dup, drop_empty, drop_num, drop_categ = row_masks(chunk, decided, clean_params, seen)
+        duplicate_rows.append(np.flatnonzero(drop_dup) + rows)
+        fill_rows = ~(drop_dup | drop_empty | drop_num)
+        bounds_rows = fill_rows & ~drop_categ
+
+        update_column_stats(stats, chunk, fill_rows, bounds_rows, clean_params)
+        rows += len(raw)
+        if on_progress is not None:
+            on_progress(1, rows)
+
+    for col, kind in kinds.items():
+        if kind is None:
+            stats[col] = ColumnStats('text')  # never had a value
+            stats[col].datetime_ok = False
+    return {'stats': stats, 'columns': list(kinds), 'rows': rows,
+            'duplicate_rows': np.concatenate(duplicate_rows) if duplicate_rows else np.empty(0, dtype=np.int64)}
+
+
+def plan_cleaning(collected, clean_params):
+    # turn pass-1 statistics into fill values and bounds
+    missing_num = clean_params.get('missing_num', False)
+    missing_categ = clean_params.get('missing_categ', False)
+    outliers = clean_params.get('outliers', False)
+    outlier_param = clean_params.get('outlier_param', 1.5)
+    plan = {}
+    for col, s in collected['stats'].items():
+        p = plan[col] = {'kind': s.kind, 'fill': None, 'lower': None, 'upper': None,
+                         'integral': s.integral, 'decimals': s.decimals,
+                         'datetime': bool(clean_params.get('extract_datetime')) and s.kind == 'text' and s.datetime_ok}
+        if s.kind == 'num':
+            if missing_num in ('mean', 'median', 'most_frequent') and s.count:
+                if missing_num == 'mean':
+                    fill = s.total / s.count
+                elif missing_num == 'median':
+                    fill = s.fill_sketch.quantiles([50])[0]
+                else:
+                    top = max(s.counts.values())
+                    fill = min(v for v, c in s.counts.items() if c == top)
+                p['fill'] = float(np.round(fill)) if s.integral else float(fill)
+            if outliers:
+                extra = s.missing if p['fill'] is not None else 0
+                q1, q3 = s.bounds_sketch.quantiles([25, 75], p['fill'], extra)
+                if not (np.isnan(q1) or (s.missing and p['fill'] is None)):
+                    iqr = q3 - q1
+                    p['lower'] = float(q1 - outlier_param * iqr)
+                    p['upper'] = float(q3 + outlier_param * iqr)
+        elif missing_categ == 'most_frequent' and s.counts:
+            top = max(s.counts.values())
+            p['fill'] = next(v for v, c in s.counts.items() if c == top)
+    return plan
+
+
+def apply_plan(chunk, plan, clean_params):
+    # returns the cleaned chunk, rows to delete as outliers and the number of winsorized values
+    deleted = np.zeros(len(chunk), dtype=bool)
+    winsorized = 0
+    for col, p in plan.items():
+        if p['kind'] == 'num':
+            values = chunk[col].to_numpy(dtype='float64', copy=True)
+            if p['fill'] is not None:
+                values[np.isnan(values)] = p['fill']
+            if p['lower'] is not None:
+                below = values < p['lower']
+                above = values > p['upper']
+                if clean_params.get('outliers') == 'delete':
+                    deleted |= below | above
+                else:
+                    lower, upper = (np.trunc(p['lower']), np.trunc(p['upper'])) if p['integral'] \
+                        else (p['lower'], p['upper'])
+                    values[below] = lower
+                    values[above] = upper
+                    winsorized += int(below.sum() + above.sum())
+            if p['integral']:
+                chunk[col] = pd.array(values, dtype='Float64').astype('Int64')
+            elif p['decimals'] is not None:
+                chunk[col] = np.round(values, p['decimals'])
+            else:
+                chunk[col] = values
+        else:
+            if p['fill'] is not None:
+                chunk[col] = chunk[col].fillna(p['fill'])
+            if p['datetime']:
+                chunk[col] = pd.to_datetime(chunk[col])
+    return chunk, deleted, winsorized
+
+
+class _Output:
+    # incremental csv (optionally compressed) or parquet writer
+
+    def __init__(self, dest):
+        self.dest = dest
+        self.parquet = dest.endswith('.parquet')
+        self._writer = None
+        self._first = True
+
+    def write(self, chunk):
+        if self.parquet:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._writer is None:
+                # columns without a value in the first chunk are written as text
+                self._schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                          for f in table.schema], metadata=table.schema.metadata)
+                self._writer = pq.ParquetWriter(self.dest, self._schema, compression='zstd')
+            self._writer.write_table(table.cast(self._schema))
+        else:
+            chunk.to_csv(self.dest, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self, columns):
+        if self.parquet:
+            if self._writer is None:
+                pq.write_table(pa.table({c: pa.array([], pa.string()) for c in columns}), self.dest)
+            else:
+                self._writer.close()
+        elif self._first:
+            pd.DataFrame(columns=columns).to_csv(self.dest, index=False)
+
+
+def clean_csv_out_of_core(src, dest, clean_params, chunksize=DEFAULT_CHUNK_ROWS, sketch_size=SKETCH_SIZE,
+                          read_kwargs=None, on_progress=None):
+    # pass 1 + pass 2; returns a JSON-friendly summary
+    start = time.perf_counter()
+    collected = collect_stats(src, clean_params, chunksize, sketch_size, read_kwargs, on_progress)
+    plan = plan_cleaning(collected, clean_params)
+    kinds = {c: p['kind'] for c, p in plan.items()}
+
+    duplicate_rows = collected['duplicate_rows']
+    summary = {'rows_in': collected['rows'], 'rows_out': 0, 'duplicates_removed': len(duplicate_rows),
+               'empty_rows_removed': 0, 'missing_rows_removed': 0, 'outliers_winsorized': 0,
+               'outliers_deleted': 0, 'retyped_as_text': collected['retyped']}
+    out = _Output(dest)
+    rows = 0
+    for raw in _read_chunks(src, chunksize, read_kwargs):
+        chunk, _ = _typed(raw, kinds)
+        lo, hi = np.searchsorted(duplicate_rows, [rows, rows + len(chunk)])
+        is_dup = np.zeros(len(chunk), dtype=bool)
+        is_dup[duplicate_rows[lo:hi] - rows] = True
+        _, drop_empty, drop_num, drop_categ = row_masks(chunk, kinds, clean_params, None)
+        drop_empty &= ~is_dup
+        drop_missing = (drop_num | drop_categ) & ~(is_dup | drop_empty)
+        summary['empty_rows_removed'] += int(drop_empty.sum())
+        summary['missing_rows_removed'] += int(drop_missing.sum())
+        rows += len(raw)
+
+        chunk = chunk[~(is_dup | drop_empty | drop_missing)].copy()
+        chunk, deleted, winsorized = apply_plan(chunk, plan, clean_params)
+        summary['outliers_winsorized'] += winsorized
+        if deleted.any():
+            summary['outliers_deleted'] += int(deleted.sum())
+            chunk = chunk[~deleted]
+
+        out.write(chunk)
+        summary['rows_out'] += len(chunk)
+        if on_progress is not None:
+            on_progress(2, rows)
+    out.close(collected['columns'])
+
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    summary['output_mb'] = round(os.path.getsize(dest) / 1024 ** 2, 2)
+    summary['columns'] = {c: dict(collected['stats'][c].to_dict(), fill=_jsonable(p['fill']),
+                                  lower=p['lower'], upper=p['upper'], datetime=p['datetime'])
+                          for c, p in plan.items()}
+    return summary
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
@@ -0,0 +1,256 @@
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from AutoClean.autoclean import AutoClean
+from AutoClean.modules import Adjust, Duplicates, EncodeCateg, MissingValues, Outliers
+from sklearn.impute import KNNImputer, SimpleImputer
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+# columns AutoClean creates when extracting datetimes; an input column with one of
+# these names would be overwritten differently per worker
+DATETIME_PARTS = ('Day', 'Month', 'Year', 'Hour', 'Minute', 'Sec')
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+class ParallelUnsupported(Exception):
+    # raised when the settings need the serial AutoClean pipeline to stay exact
+    pass
+
+
+def get_pool(workers):
+    # one pool shared by every session; a different size replaces it. The old pool is
+    # shut down without waiting, so work already submitted to it still finishes
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _settings(clean_params):
+    # same parameter resolution as AutoClean.__init__
+    p = dict(clean_params)
+    if p.get('mode', 'auto') == 'auto':
+        p.update(duplicates='auto', missing_num='auto', missing_categ='auto', outliers='winz',
+                 encode_categ=['auto'], extract_datetime='s')
+    return SimpleNamespace(mode=p.get('mode', 'auto'),
+                           duplicates=p.get('duplicates', False),
+                           missing_num=p.get('missing_num', False),
+                           missing_categ=p.get('missing_categ', False),
+                           outliers=p.get('outliers', False),
+                           encode_categ=p.get('encode_categ', False),
+                           extract_datetime=p.get('extract_datetime', False),
+                           outlier_param=p.get('outlier_param', 1.5))
+
+
+# ---- arrow hand-off -------------------------------------------------------
+
+def _null_kinds(df):
+    # arrow turns both NaN and None into null; remember which one object columns used
+    kinds = {}
+    for col in df.columns:
+        if df[col].dtype == object and df[col].isna().any():
+            nulls = df[col][df[col].isna()]
+            if nulls.map(lambda v: v is None).all():
+                kinds[col] = 'none'
+            elif nulls.map(lambda v: isinstance(v, float)).all():
+                kinds[col] = 'nan'
+            else:
+                raise ParallelUnsupported(f"mixed null markers in column {col}")
+    return kinds
+
+
+def _write_frame(df, path):
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ParallelUnsupported(f"frame cannot be shared as arrow: {e}")
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return {'path': path, 'dtypes': {c: str(t) for c, t in df.dtypes.items()},
+            'nulls': _null_kinds(df)}
+
+
+def _read_frame(meta, columns=None):
+    # memory-mapped read: only the requested columns are materialized
+    with pa.memory_map(meta['path'], 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        df = table.to_pandas()
+    for col in df.columns:
+        if meta['dtypes'][col] == 'object':
+            df[col] = df[col].astype(object)
+            if col in meta['nulls']:
+                marker = None if meta['nulls'][col] == 'none' else np.nan
+                df[col] = df[col].where(df[col].notna(), marker)
+    return df
+
+
+# ---- worker ----------------------------------------------------------------
+
+def _run_stage(ns, df, stage, input_data):
+    if stage == 'knn_num':
+        return MissingValues._impute(ns, df, KNNImputer(n_neighbors=3), type='num')
+    if stage == 'simple_num':
+        return MissingValues._impute(ns, df, SimpleImputer(strategy=ns.missing_num), type='num')
+    if stage == 'knn_categ':
+        return MissingValues._impute(ns, df, KNNImputer(n_neighbors=3), type='categ')
+    if stage == 'simple_categ':
+        return MissingValues._impute(ns, df, SimpleImputer(strategy='most_frequent'), type='categ')
+    if stage == 'winz':
+        return Outliers._winsorization(ns, df)
+    if stage == 'datetime':
+        return Adjust.convert_datetime(ns, df)
+    if stage == 'encode':
+        return EncodeCateg.handle(ns, df)
+    if stage == 'round':
+        return Adjust.round_values(ns, df, input_data)
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def _clean_columns(frame_meta, input_meta, columns, stages, ns, out_path):
+    from loguru import logger
+    logger.remove()
+    df = _read_frame(frame_meta, columns)
+    input_data = _read_frame(input_meta, columns) if 'round' in stages else None
+    for stage in stages:
+        df = _run_stage(ns, df, stage, input_data)
+    return _write_frame(df[columns], out_path)
+
+
+# ---- parent ----------------------------------------------------------------
+
+def _plan(ns):
+    # ordered steps; 'columns' steps run per column group in the pool, the rest serially
+    steps = [('serial', 'duplicates')]
+    if ns.missing_num or ns.missing_categ:
+        steps.append(('serial', 'drop_empty_rows'))
+        if ns.missing_num == 'auto':
+            steps += [('serial', 'linreg'), ('columns', 'knn_num')]
+        elif ns.missing_num == 'knn':
+            steps.append(('columns', 'knn_num'))
+        elif ns.missing_num in ('mean', 'median', 'most_frequent'):
+            steps.append(('columns', 'simple_num'))
+        elif ns.missing_num:
+            raise ParallelUnsupported(f"missing_num={ns.missing_num!r} deletes rows")
+        if ns.missing_categ == 'auto':
+            steps += [('serial', 'logreg'), ('columns', 'knn_categ')]
+        elif ns.missing_categ == 'knn':
+            steps.append(('columns', 'knn_categ'))
+        elif ns.missing_categ == 'most_frequent':
+            steps.append(('columns', 'simple_categ'))
+        elif ns.missing_categ:
+            raise ParallelUnsupported(f"missing_categ={ns.missing_categ!r} deletes rows")
+    if ns.outliers in ('auto', 'winz'):
+        steps.append(('columns', 'winz'))
+    elif ns.outliers == 'delete':
+        steps.append(('serial', 'delete_outliers'))
+    steps += [('columns', 'datetime'), ('columns', 'encode'), ('columns', 'round')]
+    return steps
+
+
+def _run_serial_step(ns, df, step, state):
+    if step == 'duplicates':
+        return Duplicates.handle(ns, df)
+    if step == 'drop_empty_rows':
+        state['has_missing'] = df.isna().sum().sum() != 0
+        if state['has_missing']:
+            kept = df.dropna(how='all')
+            if len(kept) != len(df):
+                # AutoClean keeps the gaps in the index here, which the later stages depend on
+                raise ParallelUnsupported("frame contains rows that are entirely empty")
+        return df
+    if step == 'delete_outliers':
+        return Outliers._delete(ns, df)
+    if not state.get('has_missing'):
+        return df
+    if step == 'linreg':
+        return MissingValues._lin_regression_impute(ns, df, LinearRegression())
+    if step == 'logreg':
+        return MissingValues._log_regression_impute(ns, df, LogisticRegression())
+    raise ValueError(f"Unknown step: {step}")
+
+
+def _column_groups(df, workers):
+    # spread columns over workers by memory footprint, largest first
+    sizes = df.memory_usage(deep=True, index=False).sort_values(ascending=False)
+    groups = [[] for _ in range(workers)]
+    loads = [0] * workers
+    for col, size in sizes.items():
+        i = loads.index(min(loads))
+        groups[i].append(col)
+        loads[i] += size
+    return [g for g in groups if g]
+
+
+def _run_columns(ns, df, input_meta, stages, workers, work_dir, step_no):
+    frame_meta = _write_frame(df, os.path.join(work_dir, f"step{step_no}.arrow"))
+    pool = get_pool(workers)
+    futures = []
+    for i, columns in enumerate(_column_groups(df, workers)):
+        out_path = os.path.join(work_dir, f"step{step_no}_part{i}.arrow")
+        futures.append(pool.submit(_clean_columns, frame_meta, input_meta, columns, stages, ns, out_path))
+    parts = [_read_frame(f.result()) for f in futures]
+    merged = pd.concat(parts, axis=1)
+    merged.index = df.index
+    return merged[list(df.columns)]
+
+
+def parallel_clean(df, clean_params, workers):
+    # column-parallel AutoClean; returns the cleaned original columns
+    ns = _settings(clean_params)
+    AutoClean._validate_params(ns, df, clean_params.get('verbose', False), clean_params.get('logfile', True))
+    if not all(isinstance(c, str) for c in df.columns) or df.columns.duplicated().any():
+        raise ParallelUnsupported("column names must be unique strings")
+    if ns.extract_datetime and any(c in DATETIME_PARTS for c in df.columns):
+        raise ParallelUnsupported("input already has datetime part columns")
+    if not (ns.duplicates or ns.missing_num or ns.missing_categ or ns.outliers
+            or ns.encode_categ or ns.extract_datetime):
+        return df.reset_index(drop=True)
+
+    steps = _plan(ns)
+    # parallel stages that follow each other share one trip to the workers
+    merged_steps = []
+    for kind, name in steps:
+        if kind == 'columns' and merged_steps and merged_steps[-1][0] == 'columns':
+            merged_steps[-1][1].append(name)
+        else:
+            merged_steps.append((kind, [name]))
+
+    work_dir = tempfile.mkdtemp(prefix="parallelclean_", dir=SHARED_DIR)
+    try:
+        from loguru import logger
+        logger.remove()
+        out = df.reset_index(drop=True)
+        input_meta = None
+        state = {}
+        for step_no, (kind, names) in enumerate(merged_steps):
+            if kind == 'serial':
+                out = _run_serial_step(ns, out, names[0], state)
+                if names[0] == 'duplicates':
+                    # decimals are restored from the input; duplicates removed have the same values
+                    input_meta = _write_frame(out, os.path.join(work_dir, "input.arrow"))
+            else:
+                if 'has_missing' in state and not state['has_missing']:
+                    names = [n for n in names if n not in ('knn_num', 'simple_num', 'knn_categ', 'simple_categ')]
+                if names:
+                    out = _run_columns(ns, out, input_meta, names, workers, work_dir, step_no)
+        return out[list(df.columns)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
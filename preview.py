@@ -0,0 +1,134 @@
+import re
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Only the visible window is sent to the browser. Sorting and filtering run here on
+# the server; the resulting row order is kept in session state so paging through it
+# does not sort again on every rerun. It is keyed by the frame's version (the session
+# store's generation), since a replaced frame can have the length and even the id()
+# of the old one.
+
+PAGE_SIZES = [50, 100, 500, 1000]
+SAMPLE_SIZE = 1000
+MAX_DEFAULT_COLUMNS = 50
+MAX_STRATA = 100
+_COMPARISON = re.compile(r"^\s*(<=|>=|!=|==|=|<|>)\s*(.+)$")
+
+
+def page(data, page_no, page_size, columns=None, positions=None):
+    # rows of one page; data is a DataFrame or a ParquetStore
+    start = page_no * page_size
+    if positions is not None:
+        return data.iloc[positions[start:start + page_size]][columns or list(data.columns)]
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[start:start + page_size][columns or list(data.columns)]
+    return data.rows(start, page_size, columns)
+
+
+def filter_mask(series, text):
+    # numeric columns accept comparisons like "> 10" or "= 3", everything else a substring
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        match = _COMPARISON.match(text)
+        op, value = match.groups() if match else ('==', text)
+        try:
+            value = float(value)
+        except ValueError:
+            return np.zeros(len(series), dtype=bool)
+        ops = {'<': series.lt, '<=': series.le, '>': series.gt, '>=': series.ge,
+               '=': series.eq, '==': series.eq, '!=': series.ne}
+        return ops[op](value).fillna(False).to_numpy(dtype=bool)
+    return series.astype(str).str.contains(text, case=False, regex=False).to_numpy(dtype=bool)
+
+
+def row_positions(df, sort_col=None, ascending=True, filter_col=None, filter_text=""):
+    # positional row order after filtering and sorting, or None for the frame as is
+    positions = None
+    if filter_col and filter_text:
+        positions = np.flatnonzero(filter_mask(df[filter_col], filter_text))
+    if sort_col:
+        values = df[sort_col] if positions is None else df[sort_col].iloc[positions]
+        order = np.argsort(values.rank(method='first', na_option='bottom', ascending=ascending).to_numpy(),
+                           kind='stable')
+        positions = order if positions is None else positions[order]
+    return positions
+
+
+def stratified_sample(df, n, by=None, positions=None, seed=0):
+    # up to n rows; with by, every group keeps its share of the rows (at least one)
+    positions = np.arange(len(df)) if positions is None else positions
+    if len(positions) <= n:
+        return positions
+    rng = np.random.default_rng(seed)
+    if by is None:
+        return np.sort(rng.choice(positions, n, replace=False))
+    groups = df[by].iloc[positions].astype(object).fillna("<missing>").to_numpy()
+    ranks = pd.Series(rng.random(len(positions))).groupby(groups).rank(method='first').to_numpy()
+    sizes = pd.Series(groups).map(pd.Series(groups).value_counts()).to_numpy()
+    quota = np.maximum(1, np.floor(n * sizes / len(positions)))
+    return np.sort(positions[ranks <= quota])
+
+
+def _cached_positions(key, df, version, sort_col, ascending, filter_col, filter_text):
+    if version is None:
+        return row_positions(df, sort_col, ascending, filter_col, filter_text)
+    token = (version, sort_col, ascending, filter_col, filter_text)
+    cached = st.session_state.get(f"{key}_positions")
+    if cached is None or cached[0] != token:
+        cached = (token, row_positions(df, sort_col, ascending, filter_col, filter_text))
+        st.session_state[f"{key}_positions"] = cached
+    return cached[1]
+
+
+def show_preview(data, key, page_size=100, version=None):
+    # data is a DataFrame or a ParquetStore (paging and column selection only); version
+    # changes whenever data is replaced, without it the row order is not kept across reruns
+    in_memory = isinstance(data, pd.DataFrame)
+    columns = list(data.columns)
+    total = len(data) if in_memory else data.num_rows
+
+    with st.expander("🔎 Columns, sort and filter"):
+        selected = st.multiselect("Columns", columns, default=columns[:MAX_DEFAULT_COLUMNS],
+                                  key=f"{key}_columns") or columns
+        sort_col = filter_col = None
+        ascending, filter_text = True, ""
+        if in_memory:
+            sort_col = st.selectbox("Sort by", [None] + columns, key=f"{key}_sort")
+            ascending = st.toggle("Ascending", value=True, key=f"{key}_ascending")
+            filter_col = st.selectbox("Filter column", [None] + columns, key=f"{key}_filter_col")
+            filter_text = st.text_input("Filter (text, or > 10, = 3 for numbers)", key=f"{key}_filter")
+        else:
+            st.caption("Sorting and filtering are available once the data is in memory.")
+
+    positions = None
+    if in_memory:
+        positions = _cached_positions(key, data, version, sort_col, ascending, filter_col, filter_text)
+    rows = total if positions is None else len(positions)
+
+    view = "Pages"
+    if in_memory:
+        view = st.radio("View", ["Pages", "Sample"], horizontal=True, key=f"{key}_view")
+
+    if view == "Sample":
+        strata = [c for c in columns if isinstance(data[c].dtype, pd.CategoricalDtype)
+                  or (data[c].dtype == object and data[c].nunique() <= MAX_STRATA)]
+        by = st.selectbox("Stratify by", [None] + strata, key=f"{key}_strata")
+        sample = stratified_sample(data, SAMPLE_SIZE, by, positions)
+        st.dataframe(data.iloc[sample][selected], use_container_width=True)
+        st.caption(f"Sample of {len(sample):,} out of {rows:,} rows")
+        return
+
+    size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(page_size), key=f"{key}_page_size")
+    pages = max(1, -(-rows // size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = 1  # filter or page size left fewer pages
+    page_no = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, key=f"{key}_page") - 1
+    st.dataframe(page(data, page_no, size, selected, positions), use_container_width=True)
+    st.caption(f"Rows {min(page_no * size + 1, rows):,}–{min((page_no + 1) * size, rows):,} of {rows:,}")
+
+
+def show_head(data, rows=PAGE_SIZES[1]):
+    # static first page, for places where widgets would not survive a rerun (inside button blocks)
+    total = len(data) if isinstance(data, pd.DataFrame) else data.num_rows
+    st.dataframe(page(data, 0, rows), use_container_width=True)
+    st.caption(f"Showing first {min(rows, total):,} of {total:,} rows")
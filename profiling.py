@@ -0,0 +1,182 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import streamlit as st
+from cleancache import fingerprint, private_dir
+from dtypeplanner import plain_dtypes
+from runtime import load
+
+# Sweetviz reports are built from a row sample, on a background thread, and kept in a
+# shared directory keyed by the data fingerprint. Each build writes into its own
+# temporary directory and is moved into place when complete, so sessions never read
+# a half-written file or overwrite each other's reports. Reports not viewed for
+# REPORT_MAX_AGE_SECONDS are removed, and the least recently viewed ones go first when
+# the directory grows past REPORT_MAX_MB; the check runs after each build. When REPORT_DIR
+# is not private to this user (see cleancache.private_dir), reports go to a private
+# temporary directory of this process instead. A failed build keeps only its message,
+# so the sampled frames are not held alive by a traceback.
+
+SAMPLE_ROWS = 50_000
+POLL_SECONDS = 2
+REPORT_DIR = os.environ.get("DATATHERAPIST_REPORT_DIR",
+                            os.path.join(tempfile.gettempdir(), "datatherapist_reports"))
+REPORT_MAX_AGE_SECONDS = 7 * 24 * 3600
+REPORT_MAX_MB = int(os.environ.get("DATATHERAPIST_REPORT_MAX_MB", 500))
+
+# sweetviz draws with matplotlib, which is not thread-safe: one build at a time
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profiling")
+_pending = {}
+_pending_lock = threading.Lock()
+_report_dir = None
+
+
+class ProfilingFailed(Exception):
+    # carries the message of a failed build; the message is shown to the user
+    pass
+
+
+def report_dir():
+    global _report_dir
+    if _report_dir is None:
+        _report_dir = REPORT_DIR if private_dir(REPORT_DIR) else tempfile.mkdtemp(prefix="datatherapist_reports_")
+    return _report_dir
+
+
+def sample_frame(df, rows=SAMPLE_ROWS, seed=0):
+    # uniform sample in the original row order
+    if rows is None or len(df) <= rows:
+        return df
+    return df.sample(n=rows, random_state=seed).sort_index()
+
+
+def report_key(frames, rows=SAMPLE_ROWS):
+    h = hashlib.blake2b(digest_size=16)
+    for df, label in frames:
+        h.update(f"{fingerprint(df)}|{label}|".encode())
+    h.update(str(rows).encode())
+    return h.hexdigest()
+
+
+def report_path(key):
+    return os.path.join(report_dir(), f"{key}.html")
+
+
+def _build(frames, rows, path):
+    sweetviz = load('sweetviz')
+    samples = [[plain_dtypes(sample_frame(df, rows)), label] for df, label in frames]
+    work_dir = tempfile.mkdtemp(prefix="sweetviz_")
+    try:
+        if len(samples) == 1:
+            report = sweetviz.analyze(samples[0])
+        else:
+            report = sweetviz.compare(samples[0], samples[1])
+        tmp_path = os.path.join(work_dir, "report.html")
+        report.show_html(tmp_path, open_browser=False)
+        shutil.move(tmp_path, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        remove_old_reports(keep=path)
+        return path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _build_or_fail(frames, rows, path):
+    # the error is raised again without the traceback, whose frames reference the samples
+    try:
+        return _build(frames, rows, path)
+    except Exception as e:
+        message = f"{type(e).__name__}: {e}"
+    frames = None
+    raise ProfilingFailed(message)
+
+
+def remove_old_reports(directory=None, max_age_seconds=REPORT_MAX_AGE_SECONDS, max_mb=REPORT_MAX_MB, keep=None):
+    # a report's mtime is its last view; stale ones go, then the oldest until the budget fits
+    directory = directory or report_dir()
+    if not os.path.isdir(directory):
+        return
+    reports = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue  # removed meanwhile
+        if name.endswith(".html") and path != keep:
+            reports.append((stat.st_mtime, stat.st_size, path))
+        elif name.endswith(".html"):
+            max_mb -= stat.st_size / 1024 ** 2
+    cutoff = time.time() - max_age_seconds
+    total = sum(size for _, size, _ in reports)
+    for mtime, size, path in sorted(reports):
+        if mtime >= cutoff and total <= max_mb * 1024 ** 2:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def _touch(path):
+    # marks the report as viewed; False when it was removed
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def request_report(frames, rows=SAMPLE_ROWS):
+    # frames: [(df, label)] for sweetviz.analyze, or two of them for sweetviz.compare;
+    # returns a Future with the report path, shared by every session asking for the same data
+    key = report_key(frames, rows)
+    path = report_path(key)
+    if _touch(path):
+        done = Future()
+        done.set_result(path)
+        return done
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _executor.submit(_build_or_fail, frames, rows, path)
+            _pending[key] = future
+            future.add_done_callback(lambda f: _forget(key, f))
+        return future
+
+
+def _forget(key, future):
+    # finished builds are served from disk; failed ones stay so the error can be shown
+    if future.exception() is None:
+        with _pending_lock:
+            _pending.pop(key, None)
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def _wait_for(future):
+    if future.done():
+        st.rerun()  # full rerun renders the finished report
+    st.info("⏳ Building the profiling report in the background...")
+
+
+def show_report(future, height=800):
+    # renders the report when it is ready, otherwise polls without blocking the page
+    if not future.done():
+        _wait_for(future)
+        return
+    try:
+        path = future.result()
+    except Exception as e:
+        st.error(f"❌ Profiling failed: {e}")
+        return
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+    except FileNotFoundError:
+        st.warning("⚠️ This profiling report was cleared from the server. Generate it again.")
+        return
+    st.components.v1.html(html, height=height, scrolling=True)
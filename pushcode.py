@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
-import sqlalchemy
-from AutoClean import AutoClean
-import sweetviz
+from preview import show_head, show_preview
+from bulkwriter import bulk_write, split_table_name
+from connections import get_engine
+from runtime import load
 import os
 
 
@@ -29,8 +30,7 @@ table = st.text_input("📋 Table Name ", value="dbo.TestCustomers")
 # Step 2: Load data from SQL
 if st.button("🔄 Load Data from SQL Server"):
     try:
-        conn_str = f"mssql+pyodbc://@{server}/{database}?trusted_connection=yes&driver=ODBC+Driver+17+for+SQL+Server"
-        engine = sqlalchemy.create_engine(conn_str)
+        engine = get_engine(server, database)
         st.session_state.engine = engine
         df = pd.read_sql(f"SELECT * FROM {table}", engine)
         st.session_state.df = df
@@ -41,7 +41,7 @@ if st.button("🔄 Load Data from SQL Server"):
 # Show original data if available
 if 'df' in st.session_state:
     st.subheader("📊 Original Data")
-    st.dataframe(st.session_state.df)
+    show_preview(st.session_state.df, "original")
 
     # Step 3: Mode selection
     st.subheader("⚙️ Cleaning Configuration")
@@ -77,13 +77,13 @@ if 'df' in st.session_state:
         try:
             #covert all numeric columns to float
             
-            df_cleaning = st.session_state.df.copy()
+            df_cleaning = st.session_state.df.copy(deep=False)  # columns are replaced below, not modified
             for col in df_cleaning.select_dtypes(include=['number']).columns:
                 df_cleaning[col] = pd.to_numeric(df_cleaning[col], errors='coerce').astype('float64')
                 print(f"{col}: {df_cleaning[col].dtype}")
             
             
-            pipeline = AutoClean(df_cleaning, **clean_params)
+            pipeline = load('AutoClean').AutoClean(df_cleaning, **clean_params)
             print("Auto Clean Complete")
             cleaned_df = pipeline.output[df_cleaning.columns]
             st.session_state.cleaned_df = cleaned_df
@@ -91,7 +91,7 @@ if 'df' in st.session_state:
 
             # Show cleaned data
             st.subheader("🧽 Cleaned Data")
-            st.dataframe(cleaned_df)
+            show_head(cleaned_df)
 
             # Show issues
             if hasattr(pipeline, 'log'):
@@ -125,12 +125,9 @@ if 'cleaned_df' in st.session_state:
     target_table = st.text_input("📌 Target Table Name", value="dbo.cleaned_data")
     if st.button("🚀 Push to SQL Server"):
         try:
-            st.session_state.cleaned_df.to_sql(name=target_table.split('.')[-1],
-                                               con= st.session_state.engine,
-                                               schema=target_table.split('.')[0],
-                                               if_exists='replace',
-                                               index=False)
-            st.success(f"✅ Saved to SQL Server as: {target_table}")
+            schema, name = split_table_name(target_table)
+            stats = bulk_write(st.session_state.cleaned_df, st.session_state.engine, name, schema=schema)
+            st.success(f"✅ Saved to SQL Server as: {target_table} ({stats['rows_per_sec']:,.0f} rows/sec)")
         except Exception as e:
             st.error(f"❌ Failed to save: {e}")
 
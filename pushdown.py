@@ -0,0 +1,208 @@
+import time
+from sqlalchemy import MetaData, Table, text, types
+from bulkwriter import drop_table_quietly, qualified_name, staging_name, swap_table
+from fastclean import FAST_DUPLICATES, FAST_OUTLIERS
+
+# Push-down cleaning: the supported clean_params are translated into one set-based
+# statement that reads the source table and creates the cleaned target table inside
+# the database, so no rows travel through Python. The steps follow AutoClean's order:
+#
+#   pd_dedup      ROW_NUMBER() OVER (PARTITION BY <all columns>) = 1
+#   pd_kept       drop rows that are entirely empty, or miss a number with missing_num='delete'
+#   pd_fills      mean / median / most frequent value per column, learned on pd_kept
+#   pd_filled     COALESCE(column, fill), drop rows missing text with missing_categ='delete'
+#   pd_quartiles  Q1 and Q3 per numeric column, learned on pd_filled
+#   final select  winsorize (or delete) outside Q1 - k*IQR .. Q3 + k*IQR, cast back to the source type
+#
+# SQL Server computes the quantiles with PERCENTILE_CONT; other databases (SQLite,
+# DuckDB, ...) use an equivalent ROW_NUMBER interpolation. Differences to AutoClean:
+# ties for the most frequent text value go to the smallest value, no decimal
+# restoration beyond the source column type, and outlier deletion uses bounds from
+# all rows at once (as the out-of-core engine does).
+
+PUSHDOWN_MISSING_NUM = (False, 'mean', 'median', 'most_frequent', 'delete')
+PUSHDOWN_MISSING_CATEG = (False, 'most_frequent', 'delete')
+
+
+class PushdownUnsupported(Exception):
+    # raised when the settings or column types cannot be expressed in SQL
+    pass
+
+
+def pushdown_supported(clean_params):
+    return (clean_params.get('mode') == 'manual'
+            and clean_params.get('duplicates', False) in FAST_DUPLICATES
+            and clean_params.get('missing_num', False) in PUSHDOWN_MISSING_NUM
+            and clean_params.get('missing_categ', False) in PUSHDOWN_MISSING_CATEG
+            and clean_params.get('outliers', False) in FAST_OUTLIERS
+            and not clean_params.get('extract_datetime', False)
+            and isinstance(clean_params.get('outlier_param', 1.5), (int, float)))
+
+
+def _kind(sql_type):
+    if isinstance(sql_type, types.Boolean):
+        return 'keep'
+    if isinstance(sql_type, (types.Integer, types.Numeric)):
+        return 'int' if isinstance(sql_type, types.Integer) else 'num'
+    if isinstance(sql_type, types.String):
+        return 'text'
+    return 'keep'   # dates, binary and anything else pass through unchanged
+
+
+def _trunc(engine, expr):
+    # towards zero; CAST does that in SQL Server and SQLite but rounds in PostgreSQL and DuckDB
+    if engine.dialect.name in ('mssql', 'sqlite'):
+        return f"CAST({expr} AS BIGINT)"
+    return f"TRUNC({expr})"
+
+
+def _quantile(engine, relation, col, q):
+    # linear interpolation between the two closest ranks, like numpy's percentile
+    if engine.dialect.name == 'mssql':
+        return (f"(SELECT DISTINCT PERCENTILE_CONT({q}) WITHIN GROUP (ORDER BY {col}) OVER () "
+                f"FROM {relation})")
+    lo = _trunc(engine, "q_pos")
+    return (f"(SELECT SUM(q_value * CASE WHEN q_rank = {lo} THEN 1 - (q_pos - {lo}) "
+            f"WHEN q_rank = {lo} + 1 THEN q_pos - {lo} ELSE 0 END) "
+            f"FROM (SELECT CAST({col} AS FLOAT) AS q_value, ROW_NUMBER() OVER (ORDER BY {col}) - 1 AS q_rank, "
+            f"(COUNT(*) OVER () - 1) * {q} AS q_pos FROM {relation} WHERE {col} IS NOT NULL) q)")
+
+
+def _most_frequent(relation, col):
+    # ties go to the smallest value
+    return (f"(SELECT m_value FROM (SELECT {col} AS m_value, "
+            f"ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC, {col}) AS m_rank "
+            f"FROM {relation} WHERE {col} IS NOT NULL GROUP BY {col}) m WHERE m_rank = 1)")
+
+
+def _integral(relation, col):
+    # 1 when every value is a whole number
+    return (f"(SELECT CASE WHEN MAX(CASE WHEN {col} <> ROUND({col}, 0) THEN 1 ELSE 0 END) = 1 "
+            f"THEN 0 ELSE 1 END FROM {relation})")
+
+
+def build_cleaning_sql(engine, table, clean_params, schema=None, into=None):
+    # returns the statement producing the cleaned rows (creating table `into` when given)
+    # and the column kinds it used
+    if not pushdown_supported(clean_params):
+        raise PushdownUnsupported("Push-down supports manual mode with mean/median/most_frequent/delete "
+                                  "missing values, winz/delete outliers and duplicates, without "
+                                  "datetime extraction.")
+    source = Table(table, MetaData(), schema=schema, autoload_with=engine)
+    quote = engine.dialect.identifier_preparer.quote
+    columns = [c.name for c in source.columns]
+    kinds = {c.name: _kind(c.type) for c in source.columns}
+    names = {c: quote(c) for c in columns}
+    numeric = [c for c in columns if kinds[c] in ('int', 'num')]
+    textual = [c for c in columns if kinds[c] == 'text']
+    col_list = ", ".join(names.values())
+
+    missing_num = clean_params.get('missing_num', False)
+    missing_categ = clean_params.get('missing_categ', False)
+    outliers = clean_params.get('outliers', False)
+    k = float(clean_params.get('outlier_param', 1.5))
+
+    ctes = []
+    src = qualified_name(engine, schema, table)
+    if clean_params.get('duplicates', False):
+        if engine.dialect.name == 'mssql' and any(isinstance(c.type, (types.Text, types.LargeBinary))
+                                                  for c in source.columns):
+            raise PushdownUnsupported("text, ntext and image columns cannot be compared for duplicates")
+        ctes.append(f"pd_dedup AS (SELECT {col_list} FROM (SELECT {col_list}, ROW_NUMBER() OVER "
+                    f"(PARTITION BY {col_list} ORDER BY (SELECT NULL)) AS pd_rn FROM {src}) d WHERE pd_rn = 1)")
+        src = "pd_dedup"
+
+    conditions = []
+    if missing_num or missing_categ:
+        conditions.append("NOT (" + " AND ".join(f"{names[c]} IS NULL" for c in columns) + ")")
+    if missing_num == 'delete':
+        conditions += [f"{names[c]} IS NOT NULL" for c in numeric]
+    ctes.append(f"pd_kept AS (SELECT {col_list} FROM {src}" +
+                (f" WHERE {' AND '.join(conditions)})" if conditions else ")"))
+
+    # one row of fill values learned on pd_kept; whole-number columns get a rounded fill
+    fills, filled_cols = [], []
+    for i, c in enumerate(columns):
+        if c in numeric and missing_num in ('mean', 'median', 'most_frequent'):
+            if missing_num == 'mean':
+                fills.append(f"(SELECT AVG(CAST({names[c]} AS FLOAT)) FROM pd_kept) AS f{i}")
+            elif missing_num == 'median':
+                fills.append(f"{_quantile(engine, 'pd_kept', names[c], 0.5)} AS f{i}")
+            else:
+                fills.append(f"{_most_frequent('pd_kept', names[c])} AS f{i}")
+            fills.append(f"{'1' if kinds[c] == 'int' else _integral('pd_kept', names[c])} AS n{i}")
+            filled_cols.append(f"COALESCE({names[c]}, CASE WHEN fv.n{i} = 1 THEN ROUND(fv.f{i}, 0) "
+                               f"ELSE fv.f{i} END) AS {names[c]}")
+        elif c in textual and missing_categ == 'most_frequent':
+            fills.append(f"{_most_frequent('pd_kept', names[c])} AS f{i}")
+            filled_cols.append(f"COALESCE({names[c]}, fv.f{i}) AS {names[c]}")
+        else:
+            filled_cols.append(names[c])
+    if fills:
+        ctes.append(f"pd_fills AS (SELECT {', '.join(fills)})")
+    where = " AND ".join(f"{names[c]} IS NOT NULL" for c in textual) if missing_categ == 'delete' else ""
+    ctes.append(f"pd_filled AS (SELECT {', '.join(filled_cols)} FROM pd_kept" +
+                (" CROSS JOIN pd_fills fv" if fills else "") + (f" WHERE {where})" if where else ")"))
+
+    # quartiles per numeric column; NULL when values are still missing, so nothing is bounded (as with AutoClean)
+    bounded = numeric if outliers else []
+    if bounded:
+        parts = []
+        for i, c in enumerate(columns):
+            if c not in bounded:
+                continue
+            complete = f"(SELECT COUNT(*) - COUNT({names[c]}) FROM pd_filled) = 0"
+            for name, q in (('q1', 0.25), ('q3', 0.75)):
+                parts.append(f"CASE WHEN {complete} THEN {_quantile(engine, 'pd_filled', names[c], q)} END "
+                             f"AS {name}_{i}")
+            parts.append(f"{'1' if kinds[c] == 'int' else _integral('pd_filled', names[c])} AS n{i}")
+        ctes.append(f"pd_quartiles AS (SELECT {', '.join(parts)})")
+
+    select, deletes = [], []
+    for i, c in enumerate(source.columns):
+        expr = names[c.name]
+        if c.name in bounded:
+            lower = f"(b.q1_{i} - {k} * (b.q3_{i} - b.q1_{i}))"
+            upper = f"(b.q3_{i} + {k} * (b.q3_{i} - b.q1_{i}))"
+            if outliers == 'delete':
+                deletes.append(f"CASE WHEN {expr} < {lower} OR {expr} > {upper} THEN 1 ELSE 0 END = 0")
+            else:
+                # whole-number columns get the bound truncated, as AutoClean's astype(int) does
+                expr = (f"CASE WHEN {expr} < {lower} THEN CASE WHEN b.n{i} = 1 THEN {_trunc(engine, lower)} "
+                        f"ELSE {lower} END WHEN {expr} > {upper} THEN CASE WHEN b.n{i} = 1 "
+                        f"THEN {_trunc(engine, upper)} ELSE {upper} END ELSE {expr} END")
+        if c.name in numeric and (expr != names[c.name] or missing_num in ('mean', 'median', 'most_frequent')):
+            # back to the source type (integer columns stay integers, decimals keep their scale)
+            expr = f"CAST({expr} AS {c.type.compile(dialect=engine.dialect)})"
+        select.append(expr if expr == names[c.name] else f"{expr} AS {names[c.name]}")
+
+    # SQL Server creates the table with SELECT ... INTO, the others with CREATE TABLE ... AS
+    into_clause = f" INTO {into}" if into and engine.dialect.name == 'mssql' else ""
+    query = (f"WITH {', '.join(ctes)}\nSELECT {', '.join(select)}{into_clause} FROM pd_filled" +
+             (" CROSS JOIN pd_quartiles b" if bounded else "") +
+             (f" WHERE {' AND '.join(deletes)}" if deletes else ""))
+    if into and not into_clause:
+        query = f"CREATE TABLE {into} AS {query}"
+    return query, kinds
+
+
+def pushdown_clean(engine, table, target_table, clean_params, schema=None, target_schema=None):
+    # builds target_table from table inside the database; the target is replaced through a staging table
+    start = time.perf_counter()
+    staging = staging_name(target_table)
+    query, kinds = build_cleaning_sql(engine, table, clean_params, schema,
+                                      into=qualified_name(engine, target_schema, staging))
+    try:
+        with engine.begin() as conn:
+            rows_in = conn.execute(text(f"SELECT COUNT(*) FROM {qualified_name(engine, schema, table)}")).scalar()
+            conn.execute(text(query))
+            rows_out = conn.execute(
+                text(f"SELECT COUNT(*) FROM {qualified_name(engine, target_schema, staging)}")).scalar()
+        swap_table(engine, target_schema, staging, target_table)
+    except BaseException:
+        drop_table_quietly(engine, target_schema, staging)
+        raise
+    elapsed = time.perf_counter() - start
+    return {'rows_in': rows_in, 'rows_out': rows_out, 'seconds': round(elapsed, 3),
+            'rows_per_sec': round(rows_in / elapsed, 1) if elapsed > 0 else float(rows_in),
+            'columns': kinds, 'sql': query}
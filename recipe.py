@@ -0,0 +1,280 @@
+import datetime
+import gzip
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from dedup import SeenHashes, row_hashes
+from fastclean import text_decimals
+from outofcore import (DATETIME_VALUES, FAST_DUPLICATES, FAST_OUTLIERS, MISSING_CATEG, MISSING_NUM, SKETCH_SIZE,
+                       apply_plan, new_column_stats, plan_cleaning, row_masks, update_column_stats)
+
+# Fit once, apply many: a recipe learns everything the cleaning decides from the data
+# (fill values, winsorization bounds, category encoders, datetime formats) on a
+# reference dataset, using the out-of-core engine's statistics, and stores it in a
+# small gzipped JSON file. transform() then cleans new batches with those values in
+# one vectorized pass, without looking at the batch's own distribution, so daily
+# feeds are cleaned consistently with the reference.
+#
+#   recipe = CleaningRecipe.fit(reference_df, clean_params)
+#   recipe.save("orders.recipe.json.gz")
+#   cleaned, counts = CleaningRecipe.load("orders.recipe.json.gz").transform(todays_df)
+#
+# Duplicates and rows to delete for missing values are judged within each batch.
+
+RECIPE_VERSION = 1
+RECIPE_EXTENSION = ".recipe.json.gz"
+ENCODE_VALUES = (False, 'auto', 'onehot', 'label')
+ONEHOT_MAX_VALUES = 10   # AutoClean's auto encoding: one-hot up to 10 values, labels up to 20
+LABEL_MAX_VALUES = 20
+MAX_ENCODED_VALUES = 1_000
+
+
+class RecipeUnsupported(Exception):
+    # raised for settings whose learned state cannot be stored (regression imputers, auto mode)
+    pass
+
+
+def _encode_method(clean_params):
+    # AutoClean takes a list such as ['onehot'] or ['label', [columns]]
+    method = clean_params.get('encode_categ', False)
+    if isinstance(method, (list, tuple)):
+        method = method[0] if method else False
+    return method
+
+
+def recipe_supported(clean_params):
+    return (clean_params.get('mode') == 'manual'
+            and clean_params.get('duplicates', False) in FAST_DUPLICATES
+            and clean_params.get('missing_num', False) in MISSING_NUM
+            and clean_params.get('missing_categ', False) in MISSING_CATEG
+            and clean_params.get('outliers', False) in FAST_OUTLIERS
+            and clean_params.get('extract_datetime', False) in DATETIME_VALUES
+            and _encode_method(clean_params) in ENCODE_VALUES
+            and isinstance(clean_params.get('outlier_param', 1.5), (int, float)))
+
+
+def _kind(series):
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype) \
+            or pd.api.types.is_timedelta64_dtype(dtype):
+        return 'keep'
+    return 'num' if pd.api.types.is_numeric_dtype(dtype) else 'text'
+
+
+def _datetime_format(values):
+    # strftime format of the first value, kept when it parses the whole sample
+    sample = values.dropna().astype(str).head(1_000)
+    if sample.empty:
+        return None
+    fmt = pd.tseries.api.guess_datetime_format(sample.iloc[0])
+    if fmt is None:
+        return None
+    try:
+        pd.to_datetime(sample, format=fmt)
+    except (ValueError, TypeError):
+        return None
+    return fmt
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+class CleaningRecipe:
+
+    def __init__(self, clean_params, columns, fitted_rows=0, created=None):
+        self.clean_params = dict(clean_params)
+        self.columns = columns            # name -> plan entry, encoder and datetime format
+        self.fitted_rows = fitted_rows
+        self.created = created or datetime.datetime.now().isoformat(timespec='seconds')
+
+    @classmethod
+    def fit(cls, df, clean_params, keep_columns=(), chunksize=100_000):
+        return cls.fit_chunks((df.iloc[i:i + chunksize] for i in range(0, max(len(df), 1), chunksize)),
+                              clean_params, keep_columns)
+
+    @classmethod
+    def fit_chunks(cls, chunks, clean_params, keep_columns=(), sketch_size=SKETCH_SIZE):
+        # learns from frames streamed one after the other (e.g. pd.read_csv(..., chunksize=n))
+        if not recipe_supported(clean_params):
+            raise RecipeUnsupported("Recipes support manual mode with mean/median/most_frequent/delete missing "
+                                    "values, winz/delete outliers, duplicates, datetime conversion and "
+                                    "auto/onehot/label encoding.")
+        kinds, stats, seen, rows = {}, {}, SeenHashes() if clean_params.get('duplicates', False) else None, 0
+        seen_values, formats = {}, {}
+        for raw in chunks:
+            for col in raw.columns:
+                if col not in kinds:
+                    kinds[col] = 'keep' if col in keep_columns else _kind(raw[col])
+            chunk = raw.reset_index(drop=True)
+            num_kinds = {c: 'num' for c in chunk.columns if kinds[c] == 'num'}
+            for col in num_kinds:
+                dec = text_decimals(chunk[col].dropna())
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+                if col not in stats:
+                    stats[col] = new_column_stats('num', clean_params, sketch_size, seed=len(stats) + 1)
+                if dec is not None and dec >= 0 and not pd.api.types.is_integer_dtype(raw[col].dtype):
+                    stats[col].decimals = dec if stats[col].decimals is None else max(stats[col].decimals, dec)
+            cleanable = [c for c in chunk.columns if kinds[c] != 'keep']
+            for col in cleanable:
+                if col not in stats:
+                    stats[col] = new_column_stats('text', clean_params, sketch_size, seed=len(stats) + 1)
+                if kinds[col] == 'text' and col not in formats:
+                    formats[col] = _datetime_format(chunk[col])
+
+            drop_dup = seen.mark_repeats(row_hashes(chunk[cleanable])) if seen is not None and cleanable \
+                else np.zeros(len(chunk), dtype=bool)
+            _, drop_empty, drop_num, drop_categ = row_masks(chunk[cleanable], num_kinds, clean_params, None)
+            fill_rows = ~(drop_dup | drop_empty | drop_num)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)   # the datetime check parses without a format
+                update_column_stats({c: stats[c] for c in cleanable}, chunk, fill_rows, fill_rows & ~drop_categ,
+                                    clean_params)
+            for col in cleanable:
+                if kinds[col] == 'text' and _encode_method(clean_params):
+                    values = seen_values.setdefault(col, {})   # dict as an ordered set
+                    for value in pd.unique(chunk[col][fill_rows & ~drop_categ].dropna()):
+                        if len(values) <= MAX_ENCODED_VALUES:
+                            values[value] = True
+            rows += len(raw)
+
+        plan = plan_cleaning({'stats': stats}, clean_params)
+        columns = {}
+        for col, kind in kinds.items():
+            entry = {'kind': kind}
+            if col in plan:
+                entry.update({k: _jsonable(v) for k, v in plan[col].items()})
+                entry['kind'] = kind
+                if entry.get('datetime'):
+                    entry['datetime_format'] = formats.get(col)
+                elif kind == 'text':
+                    entry['encoder'] = cls._fit_encoder(clean_params, seen_values.get(col, {}), entry.get('fill'))
+            columns[col] = entry
+        return cls(clean_params, columns, rows)
+
+    @staticmethod
+    def _fit_encoder(clean_params, values, fill):
+        method = _encode_method(clean_params)
+        classes = list(values)
+        if fill is not None and fill not in values:
+            classes.append(fill)
+        if not method or len(classes) > MAX_ENCODED_VALUES:
+            return None
+        if method == 'auto':
+            if len(classes) <= ONEHOT_MAX_VALUES:
+                method = 'onehot'
+            elif len(classes) <= LABEL_MAX_VALUES:
+                method = 'label'
+            else:
+                return None
+        # LabelEncoder numbers the sorted classes
+        classes = sorted(classes, key=str) if method == 'label' else classes
+        return {'method': method, 'classes': [_jsonable(c) for c in classes]}
+
+    def transform(self, df, seen=None):
+        # cleaned copy of df plus counts; columns the recipe does not know pass through unchanged.
+        # Passing the same SeenHashes for consecutive batches drops duplicates across them too
+        chunk = df.reset_index(drop=True)
+        known = [c for c in chunk.columns if c in self.columns]
+        plan = {c: self.columns[c] for c in known if self.columns[c]['kind'] in ('num', 'text')}
+        num_kinds = {c: 'num' for c, p in plan.items() if p['kind'] == 'num'}
+        for col in num_kinds:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+        for col, p in plan.items():
+            if p['kind'] == 'text' and isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                # the learned fill value need not be one of this batch's categories
+                chunk[col] = chunk[col].astype(object)
+
+        drop_dup = np.zeros(len(chunk), dtype=bool)
+        if self.clean_params.get('duplicates', False) and plan:
+            drop_dup = (seen if seen is not None else SeenHashes()).mark_repeats(row_hashes(chunk[list(plan)]))
+        _, drop_empty, drop_num, drop_categ = row_masks(chunk[list(plan)], num_kinds, self.clean_params, None)
+        dropped = drop_dup | drop_empty | drop_num | drop_categ
+        chunk = chunk[~dropped].copy()
+
+        plain = {c: dict(p, datetime=False) for c, p in plan.items()}
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            chunk, deleted, winsorized = apply_plan(chunk, plain, self.clean_params)
+        chunk = chunk[~deleted].reset_index(drop=True)
+        for col, p in plan.items():
+            if p.get('datetime'):
+                # one vectorized parse with the learned format; values that do not fit become NaT
+                chunk[col] = pd.to_datetime(chunk[col], format=p.get('datetime_format'), errors='coerce')
+            elif p.get('encoder'):
+                chunk = self._encode(chunk, col, p['encoder'])
+        return chunk, {'rows_in': len(df), 'rows_out': len(chunk),
+                       'duplicates_removed': int(drop_dup.sum()),
+                       'missing_rows_removed': int((~drop_dup & (drop_empty | drop_num | drop_categ)).sum()),
+                       'outliers_winsorized': winsorized, 'outliers_deleted': int(deleted.sum()),
+                       'unknown_columns': [c for c in df.columns if c not in self.columns],
+                       'missing_columns': [c for c in self.columns if c not in df.columns]}
+
+    def transform_chunks(self, chunks):
+        # transform() over frames streamed one after the other, with duplicates judged across
+        # all of them; only the cleaned result is held in memory
+        seen, parts, counts = SeenHashes(), [], None
+        for chunk in chunks:
+            cleaned, chunk_counts = self.transform(chunk, seen)
+            parts.append(cleaned)
+            if counts is None:
+                counts = chunk_counts
+            else:
+                for k, v in chunk_counts.items():
+                    if isinstance(v, int):
+                        counts[k] += v
+        if not parts:
+            return self.transform(pd.DataFrame(columns=list(self.columns)))
+        return pd.concat(parts, ignore_index=True), counts
+
+    @staticmethod
+    def _encode(df, col, encoder):
+        # values not seen while fitting get label -1 and no one-hot column
+        categories = pd.Categorical(df[col], categories=encoder['classes'])
+        if encoder['method'] == 'label':
+            df[col + '_lab'] = categories.codes.astype('int32')
+            return df
+        onehot = pd.get_dummies(categories, prefix=col)
+        onehot.index = df.index
+        return df.join(onehot)
+
+    def to_dict(self):
+        return {'version': RECIPE_VERSION, 'created': self.created, 'fitted_rows': self.fitted_rows,
+                'clean_params': self.clean_params, 'columns': self.columns}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != RECIPE_VERSION:
+            raise ValueError(f"Unsupported recipe version: {data.get('version')}")
+        return cls(data['clean_params'], data['columns'], data.get('fitted_rows', 0), data.get('created'))
+
+    def to_bytes(self):
+        return gzip.compress(json.dumps(self.to_dict(), default=_jsonable, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.from_dict(json.loads(gzip.decompress(data).decode('utf-8')))
+
+    def save(self, path):
+        with open(path + ".tmp", 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def summary(self):
+        # one row per column, for display
+        return [{'column': col, 'kind': p['kind'], 'fill': p.get('fill'), 'lower': p.get('lower'),
+                 'upper': p.get('upper'), 'datetime_format': p.get('datetime_format'),
+                 'encoding': (p.get('encoder') or {}).get('method')}
+                for col, p in self.columns.items()]
@@ -0,0 +1,79 @@
+import importlib
+import sys
+import threading
+import time
+
+# Heavy libraries (AutoClean pulls in scikit-learn and scipy, sweetviz pulls in
+# matplotlib) are imported on first use instead of at the top of the scripts, so a
+# fresh session renders without paying for them. load() times every first import for
+# the startup report, and warm_up() imports modules on a background thread once it is
+# likely they will be needed, e.g. as soon as data has been loaded.
+#
+#   python runtime.py        # cold import cost of each heavy module in a fresh process
+
+HEAVY_MODULES = ('pandas', 'pyarrow.parquet', 'sqlalchemy', 'AutoClean', 'sweetviz')
+
+_lock = threading.Lock()
+_import_times = {}
+_warming = {}
+
+
+def load(name, reason="on demand"):
+    # importlib.import_module that records how long the first import took
+    # (a module the warm-up thread is still importing is in sys.modules already;
+    # import_module waits for it to finish)
+    loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not loaded:
+        with _lock:
+            _import_times.setdefault(name, {'module': name, 'seconds': round(time.perf_counter() - start, 3),
+                                            'reason': reason})
+    return module
+
+
+def warm_up(names=HEAVY_MODULES):
+    # imports names in the background, once per process; returns the thread doing it
+    with _lock:
+        names = tuple(n for n in names if n not in sys.modules and n not in _warming)
+        if not names:
+            return None
+        thread = threading.Thread(target=_warm, args=(names,), daemon=True, name="warm-up")
+        for name in names:
+            _warming[name] = thread
+    thread.start()
+    return thread
+
+
+def _warm(names):
+    for name in names:
+        try:
+            load(name, reason="warm-up")
+        except Exception:
+            pass  # an optional library that is missing fails later, where it is used
+
+
+def import_report():
+    # first imports made through load(), plus heavy modules nobody has needed yet
+    with _lock:
+        report = sorted(_import_times.values(), key=lambda r: -r['seconds'])
+    pending = [{'module': n, 'seconds': None, 'reason': 'not loaded'}
+               for n in HEAVY_MODULES if n not in sys.modules]
+    return report + pending
+
+
+def main():
+    total = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            load(name, reason="cold start")
+        except ImportError as e:
+            print(f"{name:<20} not installed ({e})")
+    for row in import_report():
+        if row['seconds'] is not None:
+            print(f"{row['module']:<20} {row['seconds']:>7.3f}s")
+    print(f"{'total':<20} {time.perf_counter() - total:>7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from sqlalchemy import MetaData, Table, func, inspect, literal_column, select, tablesample, text, types
+
+# Schema inspection and projected loads: list tables with approximate row counts,
+# list columns with their types, and build a SELECT of only the chosen columns, with
+# an optional row limit (TOP / LIMIT) and sample. Table and column names go through
+# SQLAlchemy's reflection and quoting instead of being formatted into the SQL text.
+
+WIDE_TEXT_LENGTH = 4000
+SYSTEM_SCHEMAS = ('sys', 'INFORMATION_SCHEMA', 'information_schema', 'guest', 'pg_catalog', 'pg_toast')
+
+_ROW_COUNT_SQL = {
+    # from the storage metadata, no table scans
+    'mssql': "SELECT s.name, t.name, SUM(p.rows) FROM sys.tables t "
+             "JOIN sys.schemas s ON s.schema_id = t.schema_id "
+             "JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1) "
+             "GROUP BY s.name, t.name",
+    'postgresql': "SELECT n.nspname, c.relname, c.reltuples::bigint FROM pg_class c "
+                  "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE c.relkind IN ('r', 'p')",
+}
+
+
+def approximate_row_counts(engine):
+    # {(schema, table): rows}; empty for databases without cheap statistics (SQLite)
+    query = _ROW_COUNT_SQL.get(engine.dialect.name)
+    if query is None:
+        return {}
+    with engine.connect() as conn:
+        return {(schema, table): int(rows) if rows is not None and rows >= 0 else None
+                for schema, table, rows in conn.execute(text(query))}
+
+
+def list_tables(engine):
+    inspector = inspect(engine)
+    counts = approximate_row_counts(engine)
+    tables = []
+    for schema in inspector.get_schema_names():
+        if schema in SYSTEM_SCHEMAS or schema.startswith('db_'):
+            continue
+        for name in inspector.get_table_names(schema=schema):
+            tables.append({'schema': schema, 'table': name, 'rows': counts.get((schema, name))})
+    return tables
+
+
+def is_wide(sql_type):
+    # BLOBs and unbounded or very long text
+    if isinstance(sql_type, (types.LargeBinary, types.Text)):
+        return True
+    if isinstance(sql_type, types.String):
+        return sql_type.length is None or sql_type.length > WIDE_TEXT_LENGTH
+    return False
+
+
+def list_columns(engine, table, schema=None):
+    return [{'name': c['name'], 'type': str(c['type']), 'nullable': c.get('nullable', True),
+             'wide': is_wide(c['type']), 'binary': isinstance(c['type'], types.LargeBinary)}
+            for c in inspect(engine).get_columns(table, schema=schema)]
+
+
+def count_rows(engine, table, schema=None):
+    # exact count, for databases without row statistics
+    source = Table(table, MetaData(), schema=schema, autoload_with=engine)
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(source)).scalar()
+
+
+def build_select(engine, table, schema=None, columns=None, limit=None, sample_percent=None):
+    # SELECT [TOP n] <columns> FROM <table> [TABLESAMPLE]; pass the result to pd.read_sql
+    source = Table(table, MetaData(), schema=schema, autoload_with=engine)
+    missing = [c for c in columns or [] if c not in source.c]
+    if missing:
+        raise ValueError(f"Unknown columns in {table}: {', '.join(missing)}")
+    sampled = None
+    if sample_percent is not None and 0 < sample_percent < 100:
+        percent = float(sample_percent)
+        if engine.dialect.name == 'mssql':
+            # page-level sampling: fast, but rows come in clusters
+            source = tablesample(source, func.system(literal_column(f"{percent} PERCENT")))
+        elif engine.dialect.name == 'postgresql':
+            source = tablesample(source, func.system(literal_column(str(percent))))
+        else:
+            # no TABLESAMPLE (SQLite): keep each row with the given probability
+            sampled = func.abs(func.random() % 10_000) < int(percent * 100)
+    stmt = select(*[source.c[c] for c in columns]) if columns else select(source)
+    if sampled is not None:
+        stmt = stmt.where(sampled)
+    if limit:
+        stmt = stmt.limit(int(limit))
+    return stmt
@@ -0,0 +1,357 @@
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import pyarrow as pa
+import pyarrow.feather as feather
+from cleancache import private_dir, result_cache
+
+# Session frames (the loaded table, the cleaned result) live here instead of in
+# st.session_state, which keeps every browser tab's frames alive for as long as the
+# server runs. Memory is tracked per session and for the whole process; the process
+# figure includes the result cache's memory tier, and frames held in several places are
+# counted once. Frames of sessions idle for IDLE_SECONDS are written to Arrow (Feather)
+# files and dropped from memory, from the result cache too, so the memory is really
+# freed; the next get() reads them back. New frames are refused with QuotaExceeded when
+# they would take a session over SESSION_QUOTA_MB or the server over GLOBAL_QUOTA_MB,
+# after other sessions were spilled and unused cache entries dropped to make room.
+# Housekeeping runs opportunistically on each access, at most every SWEEP_SECONDS.
+# Files are written and read outside the store's lock, so a large spill does not hold
+# up the other sessions. Spill files live in a private directory (see
+# cleancache.private_dir); a frame whose file was removed from disk meanwhile is
+# forgotten, and reading it raises SessionExpired.
+#
+#   data = frames.session(session_id)
+#   data['df'] = df            # may raise QuotaExceeded
+#   if 'df' in data: show(data['df'])
+
+SPILL_DIR = os.environ.get("DATATHERAPIST_SPILL_DIR",
+                           os.path.join(tempfile.gettempdir(), "datatherapist_sessions"))
+SESSION_QUOTA_MB = int(os.environ.get("DATATHERAPIST_SESSION_QUOTA_MB", 2048))
+GLOBAL_QUOTA_MB = int(os.environ.get("DATATHERAPIST_GLOBAL_QUOTA_MB", 8192))
+IDLE_SECONDS = int(os.environ.get("DATATHERAPIST_IDLE_SECONDS", 600))
+SESSION_TTL_SECONDS = 24 * 3600   # sessions unseen for this long are forgotten, files included
+SWEEP_SECONDS = 30
+
+
+class QuotaExceeded(Exception):
+    # raised when a frame does not fit the session or server memory quota; the message is shown to the user
+    pass
+
+
+class SessionExpired(Exception):
+    # raised when a spilled frame's file is gone (e.g. removed by a temp cleaner); the message is shown to the user
+    pass
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _mb(n):
+    return round(n / 1024 ** 2, 1)
+
+
+class _Frame:
+
+    def __init__(self, df, size, generation):
+        self.df = df          # None while spilled
+        self.size = size
+        self.generation = generation   # new for every frame put under a name; unchanged by spilling
+        self.path = None      # spill file, kept after reloading until the frame is replaced
+        self.busy = False     # being written to disk
+
+
+class SessionData:
+    # dict-like view of one session's frames
+
+    def __init__(self, store, session_id):
+        self._store = store
+        self.session_id = session_id
+
+    def __contains__(self, name):
+        return self._store.has(self.session_id, name)
+
+    def __getitem__(self, name):
+        df = self._store.get(self.session_id, name)
+        if df is None:
+            raise KeyError(name)
+        return df
+
+    def __setitem__(self, name, df):
+        self._store.put(self.session_id, name, df)
+
+    def get(self, name, default=None):
+        df = self._store.get(self.session_id, name)
+        return default if df is None else df
+
+    def generation(self, name):
+        # identifies the frame stored under name, e.g. to key state derived from it; None when absent
+        return self._store.generation(self.session_id, name)
+
+    def pop(self, name, default=None):
+        # a spilled frame is not read back just to be dropped
+        df = self._store.remove(self.session_id, name)
+        return default if df is None else df
+
+    def usage(self):
+        return self._store.session_usage(self.session_id)
+
+
+class SessionStore:
+    # frames of every session in this server process
+
+    def __init__(self, spill_dir=SPILL_DIR, session_quota_mb=SESSION_QUOTA_MB, global_quota_mb=GLOBAL_QUOTA_MB,
+                 idle_seconds=IDLE_SECONDS, session_ttl_seconds=SESSION_TTL_SECONDS, shared=None):
+        self.spill_dir = spill_dir
+        self.session_quota_bytes = session_quota_mb * 1024 ** 2
+        self.global_quota_bytes = global_quota_mb * 1024 ** 2
+        self.idle_seconds = idle_seconds
+        self.session_ttl_seconds = session_ttl_seconds
+        self.shared = shared    # cache whose frames sessions also hold: memory_frames() and release(df)
+        self._dir = None
+        self._sessions = {}     # session id -> {name: _Frame}
+        self._seen = {}         # session id -> last access
+        self._last_sweep = 0.0
+        self._generations = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def session(self, session_id):
+        # marks the session active; called once per script run
+        with self._lock:
+            self._seen[session_id] = time.time()
+            self._sessions.setdefault(session_id, {})
+            idle = self._sweep()
+        for other in idle:
+            self.spill(other)
+        return SessionData(self, session_id)
+
+    def has(self, session_id, name):
+        with self._lock:
+            frames = self._sessions.get(session_id, {})
+            frame = frames.get(name)
+            if frame is not None and frame.df is None and not os.path.exists(frame.path):
+                del frames[name]   # spill file removed from disk
+                return False
+            return frame is not None
+
+    def get(self, session_id, name):
+        with self._lock:
+            frame = self._sessions.get(session_id, {}).get(name)
+            if frame is None:
+                return None
+            self._seen[session_id] = time.time()
+            if frame.df is not None:
+                return frame.df
+            path = frame.path
+        try:
+            df = self._reload(path)
+        except OSError:
+            with self._lock:
+                frames = self._sessions.get(session_id, {})
+                if frames.get(name) is not frame:
+                    return self.get(session_id, name)   # replaced meanwhile, its file is gone
+                del frames[name]
+            raise SessionExpired(f"The server no longer has this session's '{name}' data. Load it again.")
+        with self._lock:
+            if self._sessions.get(session_id, {}).get(name) is not frame:
+                return self.get(session_id, name)
+            if frame.df is None:
+                frame.df = df
+            df = frame.df
+        self._make_room(exclude=session_id)
+        return df
+
+    def put(self, session_id, name, df):
+        size = frame_bytes(df)
+        with self._lock:
+            frames = self._sessions.setdefault(session_id, {})
+            self._seen[session_id] = time.time()
+            current = frames.get(name)
+            if current is not None and current.df is df:
+                return
+            session_bytes = sum(f.size for n, f in frames.items() if n != name) + size
+            if session_bytes > self.session_quota_bytes:
+                raise QuotaExceeded(
+                    f"This table needs {_mb(size)} MB in memory, which would take your session to "
+                    f"{_mb(session_bytes)} MB, over its limit of {_mb(self.session_quota_bytes)} MB. Load fewer "
+                    f"columns or rows, or stream large SQL results to disk.")
+            replaced = current.df if current is not None else None
+        self._make_room(exclude=session_id, include=(df, size), replaced=replaced)
+        with self._lock:
+            total = self._global_bytes(include=(df, size), exclude=replaced)
+            if total > self.global_quota_bytes:
+                raise QuotaExceeded(
+                    f"The server is short of memory ({_mb(total)} MB of {_mb(self.global_quota_bytes)} MB would "
+                    f"be in use). Try again later or load a smaller table.")
+            frames = self._sessions.setdefault(session_id, {})
+            self._discard(frames.get(name))
+            frames[name] = _Frame(df, size, next(self._generations))
+
+    def generation(self, session_id, name):
+        with self._lock:
+            frame = self._sessions.get(session_id, {}).get(name)
+            return frame.generation if frame is not None else None
+
+    def remove(self, session_id, name):
+        with self._lock:
+            frame = self._sessions.get(session_id, {}).pop(name, None)
+            self._discard(frame)
+            return frame.df if frame is not None else None
+
+    def drop_session(self, session_id):
+        with self._lock:
+            for frame in self._sessions.pop(session_id, {}).values():
+                self._discard(frame)
+            self._seen.pop(session_id, None)
+
+    def spill(self, session_id):
+        # writes the session's frames to disk and lets go of them; returns the bytes released
+        with self._lock:
+            todo = [(name, frame, frame.df) for name, frame in self._sessions.get(session_id, {}).items()
+                    if frame.df is not None and not frame.busy]
+            for _, frame, _ in todo:
+                frame.busy = True
+        released = 0
+        for name, frame, df in todo:
+            try:
+                path = frame.path or self._write(session_id, name, df)   # outside the lock
+            finally:
+                with self._lock:
+                    frame.busy = False
+            with self._lock:
+                if self._sessions.get(session_id, {}).get(name) is not frame or frame.df is not df:
+                    # replaced or removed while the file was written
+                    if frame.path is None:
+                        self._remove_file(path)
+                    continue
+                frame.path, frame.df = path, None
+                released += frame.size
+            if self.shared is not None:
+                self.shared.release(df)
+        return released
+
+    def session_usage(self, session_id):
+        with self._lock:
+            frames = self._sessions.get(session_id, {})
+            return {'memory_mb': _mb(sum(f.size for f in frames.values() if f.df is not None)),
+                    'spilled_mb': _mb(sum(f.size for f in frames.values() if f.df is None)),
+                    'quota_mb': _mb(self.session_quota_bytes)}
+
+    def summary(self):
+        with self._lock:
+            spilled = [f for frames in self._sessions.values() for f in frames.values() if f.df is None]
+            return {'sessions': len(self._sessions),
+                    'memory_mb': _mb(self._global_bytes()),
+                    'spilled_mb': _mb(sum(f.size for f in spilled)),
+                    'spilled_frames': len(spilled),
+                    'quota_mb': _mb(self.global_quota_bytes)}
+
+    def _held(self):
+        # frames in memory, keyed by id: held by several sessions or also cached, they count once
+        held = {id(f.df): (f.df, f.size) for frames in self._sessions.values() for f in frames.values()
+                if f.df is not None}
+        if self.shared is not None:
+            for df, size in self.shared.memory_frames():
+                held.setdefault(id(df), (df, size))
+        return held
+
+    def _global_bytes(self, include=None, exclude=None):
+        held = self._held()
+        if exclude is not None:
+            held.pop(id(exclude), None)
+        if include is not None:
+            held[id(include[0])] = include
+        return sum(size for _, size in held.values())
+
+    def _make_room(self, exclude=None, include=None, replaced=None):
+        # spills other sessions, least recently seen first, then drops cache entries no
+        # session holds, until the process fits its quota (and include with it)
+        def fits():
+            with self._lock:
+                return self._global_bytes(include=include, exclude=replaced) <= self.global_quota_bytes
+
+        if fits():
+            return True
+        with self._lock:
+            others = [s for s in sorted(self._sessions, key=lambda s: self._seen.get(s, 0)) if s != exclude]
+        for session_id in others:
+            self.spill(session_id)
+            if fits():
+                return True
+        if self.shared is not None:
+            for df, _ in self.shared.memory_frames():
+                with self._lock:
+                    in_use = any(f.df is df for frames in self._sessions.values() for f in frames.values())
+                if not in_use and (include is None or df is not include[0]):
+                    self.shared.release(df)
+                    if fits():
+                        return True
+        return fits()
+
+    def _sweep(self):
+        # forgets expired sessions; returns the idle ones to spill (outside the lock)
+        now = time.time()
+        if now - self._last_sweep < SWEEP_SECONDS:
+            return []
+        self._last_sweep = now
+        for session_id in [s for s, seen in self._seen.items() if now - seen > self.session_ttl_seconds]:
+            self.drop_session(session_id)
+        return [s for s in self._sessions if now - self._seen.get(s, 0) > self.idle_seconds]
+
+    def _spill_path(self, session_id, name, df):
+        with self._lock:
+            if self._dir is None:
+                # one directory per process, files of earlier runs are not trusted; a spill
+                # directory others could tamper with is not used, pickles are read back from it
+                base = self.spill_dir if private_dir(self.spill_dir) else None
+                self._dir = tempfile.mkdtemp(prefix="spill_", dir=base)
+            return os.path.join(self._dir, f"{session_id}_{name}_{id(df):x}.arrow")
+
+    def _write(self, session_id, name, df):
+        path = self._spill_path(session_id, name, df)
+        try:
+            # uncompressed, so reading back is a plain copy rather than a decompression
+            feather.write_feather(df, path + ".partial", compression='uncompressed')
+        except (pa.ArrowException, TypeError, ValueError):
+            # mixed-type object columns and non-text column names have no Arrow form
+            path = path[:-len(".arrow")] + ".pkl"
+            with open(path + ".partial", 'wb') as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".partial", path)
+        return path
+
+    @staticmethod
+    def _reload(path):
+        if path.endswith(".pkl"):
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        # to_pandas copies the columns anyway, a memory map would only keep the file open
+        return feather.read_table(path, memory_map=False).to_pandas()
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _discard(self, frame):
+        if frame is not None and frame.path is not None:
+            self._remove_file(frame.path)
+
+    def clear(self):
+        with self._lock:
+            for session_id in list(self._sessions):
+                self.drop_session(session_id)
+            if self._dir is not None:
+                shutil.rmtree(self._dir, ignore_errors=True)
+                self._dir = None
+
+
+# shared by every session in this server process; frames also held by the result cache
+# are counted with it and released from it when spilled
+frames = SessionStore(shared=result_cache)
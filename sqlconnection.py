@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
-import sqlalchemy
-from AutoClean import AutoClean
-import sweetviz
+from preview import show_preview
+from bulkwriter import bulk_write, split_table_name
+from connections import get_engine
+from runtime import load
 
 # Page config
 st.set_page_config(page_title="SQL Data Cleaner", layout="wide")
@@ -24,8 +25,7 @@ if 'run_cleaning' not in st.session_state:
 # Load data button
 if st.button("🔄 Load Data from SQL Server"):
     try:
-        conn_str = f"mssql+pyodbc://@{server}/{database}?trusted_connection=yes&driver=ODBC+Driver+17+for+SQL+Server"
-        engine = sqlalchemy.create_engine(conn_str)
+        engine = get_engine(server, database)
         df = pd.read_sql(f"SELECT * FROM {table}", engine)
         st.session_state.df = df
         st.success("✅ Data loaded successfully!")
@@ -35,7 +35,7 @@ if st.button("🔄 Load Data from SQL Server"):
 # Show original data
 if st.session_state.df is not None:
     st.subheader("📊 Original Data")
-    st.dataframe(st.session_state.df)
+    show_preview(st.session_state.df, "original")
 
     # Button to trigger cleaning
     if st.button("🧼 Run AutoClean"):
@@ -44,12 +44,12 @@ if st.session_state.df is not None:
 # Run AutoClean only if button was clicked
 if st.session_state.run_cleaning:
     try:
-        pipeline = AutoClean(st.session_state.df, mode='auto', verbose=True)
+        pipeline = load('AutoClean').AutoClean(st.session_state.df, mode='auto', verbose=True)
         cleaned_df = pipeline.output[st.session_state.df.columns]
         st.session_state.cleaned_df = cleaned_df
         st.success("✅ AutoClean completed!")
         st.subheader("🧽 Cleaned Data")
-        st.dataframe(cleaned_df)
+        show_preview(cleaned_df, "cleaned")
 
         if hasattr(pipeline, 'log'):
             st.subheader("⚠️ AutoClean Issues Log")
@@ -71,12 +71,9 @@ if st.session_state.cleaned_df is not None:
     target_table = st.text_input("📌 New Table Name", value="dbo.cleaned_movies")
     if st.button("🚀 Push Cleaned Data to SQL Server"):
         try:
-            st.session_state.cleaned_df.to_sql(name=target_table.split('.')[-1],
-                                               con=engine,
-                                               schema=target_table.split('.')[0],
-                                               if_exists='replace',
-                                               index=False)
-            st.success(f"✅ Data saved to SQL Server as: {target_table}")
+            schema, name = split_table_name(target_table)
+            stats = bulk_write(st.session_state.cleaned_df, get_engine(server, database), name, schema=schema)
+            st.success(f"✅ Data saved to SQL Server as: {target_table} ({stats['rows_per_sec']:,.0f} rows/sec)")
         except Exception as e:
             st.error(f"❌ Failed to save to SQL Server: {e}")
 
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+class ParquetStore:
+    # on-disk columnar copy of a query result, read lazily by the app
+
+    def __init__(self, path, truncated=False):
+        self.path = path
+        self.truncated = truncated
+        self._file = pq.ParquetFile(path)
+
+    @property
+    def num_rows(self):
+        return self._file.metadata.num_rows
+
+    @property
+    def columns(self):
+        return self._file.schema_arrow.names
+
+    @property
+    def size_mb(self):
+        return os.path.getsize(self.path) / 1024 ** 2
+
+    def head(self, n=1000, columns=None):
+        # read only as many row groups as needed for the first n rows
+        batches = self._file.iter_batches(batch_size=n, columns=columns)
+        try:
+            return pa.Table.from_batches([next(batches)]).to_pandas()
+        except StopIteration:
+            return self._file.schema_arrow.empty_table().to_pandas()
+
+    def rows(self, start, n, columns=None):
+        # read only the row groups that overlap rows [start, start + n)
+        meta = self._file.metadata
+        groups, first, offset = [], None, 0
+        for i in range(meta.num_row_groups):
+            count = meta.row_group(i).num_rows
+            if offset + count > start and offset < start + n:
+                first = offset if first is None else first
+                groups.append(i)
+            offset += count
+        if not groups:
+            return self._file.schema_arrow.empty_table().select(columns or self.columns).to_pandas()
+        table = self._file.read_row_groups(groups, columns=columns)
+        return table.slice(start - first, n).to_pandas()
+
+    def iter_chunks(self, chunksize=DEFAULT_CHUNK_ROWS, columns=None):
+        for batch in self._file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+
+    def to_pandas(self, columns=None):
+        return pq.read_table(self.path, columns=columns).to_pandas()
+
+
+def new_store_path(directory=None):
+    directory = directory or tempfile.mkdtemp(prefix="datatherapist_")
+    return os.path.join(directory, "loaded.parquet")
+
+
+def _writer_schema(schema):
+    # columns that were all NULL in the first chunk have no usable type yet
+    fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema]
+    return pa.schema(fields)
+
+
+def stream_sql_to_parquet(engine, query, path=None, chunksize=DEFAULT_CHUNK_ROWS,
+                          max_rows=None, max_mb=None, on_progress=None):
+    # pull the result through a server-side cursor and append each chunk to a parquet file
+    from sqlalchemy import text
+    path = path or new_store_path()
+    writer = None
+    rows = 0
+    mem_bytes = 0
+    max_bytes = max_mb * 1024 ** 2 if max_mb else None
+    full = False
+    truncated = False
+    columns = []
+
+    try:
+        with engine.connect().execution_options(stream_results=True) as conn:
+            result = conn.execute(text(query) if isinstance(query, str) else query)
+            columns = list(result.keys())
+            for records in iter(lambda: result.fetchmany(chunksize), []):
+                if full:
+                    # a limit was reached exactly; only rows beyond it make the result truncated
+                    truncated = True
+                    break
+                # what pd.read_sql(..., chunksize=n) builds, but the column names are known up front
+                chunk = pd.DataFrame.from_records(records, columns=columns, coerce_float=True)
+                chunk_bytes = int(chunk.memory_usage(deep=True).sum())
+                # the cut-off is decided before writing: the rows that still fit both limits
+                keep = len(chunk)
+                if max_rows:
+                    keep = min(keep, max_rows - rows)
+                if max_bytes:
+                    keep = min(keep, int((max_bytes - mem_bytes) * len(chunk) // max(chunk_bytes, 1)))
+                if keep < len(chunk):
+                    chunk = chunk.iloc[:keep]
+                    chunk_bytes = int(chunk.memory_usage(deep=True).sum())
+                    truncated = True
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    schema = _writer_schema(table.schema)
+                    writer = pq.ParquetWriter(path, schema, compression="zstd")
+                try:
+                    table = table.cast(schema)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    raise ValueError(f"Column types changed between chunks at row {rows}: {e}")
+                if len(chunk):
+                    writer.write_table(table)
+
+                rows += len(chunk)
+                mem_bytes += chunk_bytes
+                if on_progress is not None:
+                    on_progress(rows)
+
+                if truncated:
+                    break
+                full = bool((max_rows and rows >= max_rows) or (max_bytes and mem_bytes >= max_bytes))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        # empty result: the columns come from the cursor, typed as text like all-NULL columns
+        pq.write_table(pa.schema([pa.field(c, pa.string()) for c in columns]).empty_table(), path)
+
+    return ParquetStore(path, truncated=truncated)
@@ -0,0 +1,78 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from AutoClean import AutoClean
+from fastclean import FastUnsupported, fast_clean, fast_supported
+
+# fast_clean must return what AutoClean returns for the input columns, for every
+# setting it claims to support. AutoClean 1.1.3 raises for missing_num
+# mean/median/most_frequent, so those fills are checked against the plain statistics.
+
+
+def _frames():
+    rng = np.random.default_rng(7)
+    n = 200
+    mixed = pd.DataFrame({
+        'qty': rng.integers(0, 50, n).astype(float),
+        'price': rng.normal(100, 15, n).round(2),
+        'city': rng.choice(['Oslo', 'Lima', 'Pune', None], n),
+        'flag': rng.choice(['y', 'n'], n),
+    })
+    mixed.loc[[3, 40], 'qty'] = [900.0, -500.0]
+    mixed.loc[[5, 77], 'price'] = [10_000.25, -3_000.75]
+    mixed = pd.concat([mixed, mixed.iloc[:20]], ignore_index=True)
+
+    numbers = pd.DataFrame({
+        'a': [1, 2, 2, 3, 4, 5, 100, 2, 3, 4],
+        'b': [0.5, 0.25, 0.25, 0.75, 1.5, 0.5, 0.25, 0.25, 99.5, 0.5],
+    })
+
+    dates = pd.DataFrame({
+        'day': ['2024-01-05', '2024-02-11', '2024-02-11', '2024-03-30', None, '2024-05-01'],
+        'amount': [10, 12, 12, 11, 13, 400],
+    })
+    return {'mixed': mixed, 'numbers': numbers, 'dates': dates}
+
+
+FRAMES = _frames()
+PARAMS = [dict(mode='manual', duplicates=duplicates, missing_categ=missing_categ, outliers=outliers)
+          for duplicates, missing_categ, outliers in itertools.product(
+              (False, 'auto'), (False, 'most_frequent'), (False, 'winz', 'delete'))]
+
+
+def _autoclean(df, clean_params):
+    return AutoClean(df.copy(), logfile=False, **clean_params).output[df.columns]
+
+
+@pytest.mark.parametrize('name', sorted(FRAMES))
+@pytest.mark.parametrize('clean_params', PARAMS)
+def test_matches_autoclean(name, clean_params):
+    df = FRAMES[name]
+    assert fast_supported(clean_params)
+    pd.testing.assert_frame_equal(fast_clean(df, clean_params), _autoclean(df, clean_params))
+
+
+def test_matches_autoclean_datetime():
+    df = FRAMES['dates'].dropna()
+    clean_params = dict(mode='manual', duplicates='auto', extract_datetime='auto')
+    pd.testing.assert_frame_equal(fast_clean(df, clean_params), _autoclean(df, clean_params))
+
+
+@pytest.mark.parametrize('strategy, values, expected', [
+    ('mean', [1.0, np.nan, 2.0, 3.0, 4.0, 2.5, 2.5, 2.5], 2.5),
+    ('median', [1.0, np.nan, 2.0, 3.0, 4.0, 2.5, 2.5, 2.5], 2.5),
+    ('most_frequent', [1.0, np.nan, 1.0, 4.0, 4.0, 1.0, 2.5, 4.0], 1.0),   # ties go to the smallest value
+])
+def test_numeric_fills(strategy, values, expected):
+    cleaned = fast_clean(pd.DataFrame({'x': values, 'id': range(len(values))}), dict(mode='manual', missing_num=strategy))
+    assert cleaned['x'].isna().sum() == 0
+    assert cleaned.loc[1, 'x'] == expected
+
+
+def test_unsupported():
+    assert not fast_supported(dict(mode='auto'))
+    assert not fast_supported(dict(mode='manual', missing_num='knn'))
+    with pytest.raises(FastUnsupported):
+        fast_clean(pd.DataFrame({'a': [1.0, None], 'b': [None, None]}).iloc[[1, 0]],
+                   dict(mode='manual', missing_num='mean'))
@@ -0,0 +1,111 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy
+from sqlalchemy import types
+from fastclean import fast_clean, text_decimals
+from pushdown import PushdownUnsupported, build_cleaning_sql, pushdown_clean
+
+# pushdown_clean must produce the rows fast_clean produces, here on an in-memory SQLite
+# database. Row order is not defined in SQL, so both sides are sorted before comparing.
+# Outlier deletion is compared on frames with one numeric column: push-down learns the
+# bounds of all columns at once, fast_clean (like AutoClean) one column after the other.
+# Push-down keeps the source column's precision, so its results are rounded to the
+# decimals seen in the input before comparing, as fast_clean does.
+
+DTYPES = {'int': types.Integer(), 'num': types.Float(), 'text': types.String(20)}
+
+
+def _frames():
+    rng = np.random.default_rng(11)
+    n = 120
+    orders = pd.DataFrame({
+        'qty': rng.integers(1, 40, n).astype(float),
+        'price': rng.normal(50, 8, n).round(3),
+        'city': rng.choice(['Oslo', 'Lima', 'Pune', 'Kyiv'], n).astype(object),
+    })
+    orders.loc[[2, 9, 30], 'qty'] = np.nan
+    orders.loc[[4, 51], 'price'] = np.nan
+    orders.loc[[7, 8, 60], 'city'] = None
+    orders.loc[[11, 12], ['qty', 'price']] = [[700.0, 900.5], [-300.0, -80.25]]
+    orders = pd.concat([orders, orders.iloc[:15]], ignore_index=True)
+
+    readings = pd.DataFrame({
+        'value': [3.5, 4.25, np.nan, 4.0, 5.5, 3.75, 250.0, 4.5, np.nan, -90.0, 4.0, 4.0],
+        'sensor': ['a', 'b', 'a', None, 'b', 'b', 'a', 'c', 'c', 'a', 'b', 'b'],
+    })
+    return {'orders': (orders, {'qty': 'int', 'price': 'num', 'city': 'text'}),
+            'readings': (readings, {'value': 'num', 'sensor': 'text'})}
+
+
+FRAMES = _frames()
+PARAMS = [dict(mode='manual', duplicates=duplicates, missing_num=missing_num,
+               missing_categ='most_frequent', outliers=outliers)
+          for duplicates, missing_num, outliers in itertools.product(
+              (False, 'auto'), ('mean', 'median', 'most_frequent'), (False, 'winz'))]
+DELETE_PARAMS = [dict(mode='manual', duplicates='auto', missing_num=missing_num,
+                      missing_categ='most_frequent', outliers='delete')
+                 for missing_num in ('mean', 'median', 'most_frequent')]
+
+
+@pytest.fixture
+def engine():
+    engine = sqlalchemy.create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+def _load(engine, name):
+    df, kinds = FRAMES[name]
+    df.to_sql('source', engine, index=False, dtype={c: DTYPES[k] for c, k in kinds.items()})
+    return df
+
+
+def _normalized(df):
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(float)
+        else:
+            df[col] = df[col].astype(object)
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def _compare(engine, name, clean_params):
+    df = _load(engine, name)
+    summary = pushdown_clean(engine, 'source', 'cleaned', clean_params)
+    pushed = pd.read_sql_table('cleaned', engine)
+    for col, kind in FRAMES[name][1].items():
+        if kind == 'num':
+            pushed[col] = pushed[col].round(text_decimals(df[col]))
+    expected = fast_clean(df, clean_params)
+    assert summary['rows_out'] == len(expected)
+    pd.testing.assert_frame_equal(_normalized(pushed), _normalized(expected), check_exact=False)
+
+
+@pytest.mark.parametrize('clean_params', PARAMS)
+@pytest.mark.parametrize('name', sorted(FRAMES))
+def test_matches_fast_clean(engine, name, clean_params):
+    _compare(engine, name, clean_params)
+
+
+@pytest.mark.parametrize('clean_params', DELETE_PARAMS)
+def test_matches_fast_clean_outlier_delete(engine, clean_params):
+    _compare(engine, 'readings', clean_params)
+
+
+def test_replaces_target_without_leftovers(engine):
+    _load(engine, 'readings')
+    clean_params = PARAMS[0]
+    pushdown_clean(engine, 'source', 'cleaned', clean_params)
+    pushdown_clean(engine, 'source', 'cleaned', clean_params)
+    assert sorted(sqlalchemy.inspect(engine).get_table_names()) == ['cleaned', 'source']
+
+
+def test_unsupported(engine):
+    _load(engine, 'readings')
+    with pytest.raises(PushdownUnsupported):
+        build_cleaning_sql(engine, 'source', dict(mode='manual', missing_num='knn'))
+    with pytest.raises(PushdownUnsupported):
+        build_cleaning_sql(engine, 'source', dict(mode='manual', extract_datetime='auto'))
@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
-import sqlalchemy
-from AutoClean import AutoClean
-import sweetviz
-import os
+from preview import show_head, show_preview
+from bulkwriter import bulk_write, split_table_name
+from connections import get_engine
+from runtime import load
+from profiling import SAMPLE_ROWS, request_report, show_report
 
 # 🎨 Page Config
 st.set_page_config(page_title="Data Cleaning App", layout="wide")
@@ -67,8 +68,7 @@ table = st.text_input("📋 Table Name ", value="dbo.TestCustomers")
 # Step 2: Load data from SQL
 if st.button("🔄 Load Data from SQL Server"):
     try:
-        conn_str = f"mssql+pyodbc://@{server}/{database}?trusted_connection=yes&driver=ODBC+Driver+17+for+SQL+Server"
-        engine = sqlalchemy.create_engine(conn_str)
+        engine = get_engine(server, database)
         st.session_state.engine = engine
         df = pd.read_sql(f"SELECT * FROM {table}", engine)
         st.session_state.df = df
@@ -79,7 +79,7 @@ if st.button("🔄 Load Data from SQL Server"):
 # Step 3: Show data and options
 if 'df' in st.session_state:
     st.subheader("📊 Original Data")
-    st.dataframe(st.session_state.df, use_container_width=True)
+    show_preview(st.session_state.df, "original")
 
     st.subheader("⚙️ Cleaning Configuration")
     mode = st.selectbox("Select Cleaning Mode", ['auto', 'manual'])
@@ -107,36 +107,36 @@ if 'df' in st.session_state:
         clean_params['logfile'] = st.checkbox("Create Log File", True)
         clean_params['verbose'] = st.checkbox("Verbose Output", False)
 
+    profile_rows = st.number_input("Rows sampled for the profiling report", min_value=1_000,
+                                   value=SAMPLE_ROWS, step=10_000)
+
     # Step 4: Run AutoClean
     if st.button("🧼 Run AutoClean"):
         try:
-            pipeline = AutoClean(st.session_state.df, **clean_params)
+            pipeline = load('AutoClean').AutoClean(st.session_state.df, **clean_params)
             cleaned_df = pipeline.output[st.session_state.df.columns]
             st.session_state.cleaned_df = cleaned_df
             st.success("✅ Cleaning complete!")
 
             st.subheader("🧽 Cleaned Data")
-            st.dataframe(cleaned_df, use_container_width=True)
+            show_head(cleaned_df)
 
             if hasattr(pipeline, 'log'):
                 st.subheader("⚠️ AutoClean Log")
                 for k, v in pipeline.log.items():
                     st.write(f"🔸 {k}: {v}")
 
-            st.subheader("📊 Sweetviz Comparison Report")
-            report = sweetviz.compare([st.session_state.df, "Original"], [cleaned_df, "Cleaned"])
-            report_path = "sweetviz_report.html"
-            report.show_html(report_path)
-
-            with open(report_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-                st.components.v1.html(html_content, height=800, scrolling=True)
-
-            os.remove(report_path)
+            st.session_state.report = request_report([(st.session_state.df, "Original"), (cleaned_df, "Cleaned")],
+                                                     profile_rows)
 
         except Exception as e:
             st.error(f"❌ Cleaning failed: {e}")
 
+    # Sweetviz report, built in the background from a sample
+    if 'report' in st.session_state:
+        st.subheader("📊 Sweetviz Comparison Report")
+        show_report(st.session_state.report)
+
 # Step 5: Save / Download
 if 'cleaned_df' in st.session_state:
     st.download_button("⬇️ Download Cleaned CSV",
@@ -148,11 +148,8 @@ if 'cleaned_df' in st.session_state:
     target_table = st.text_input("📌 Target Table Name", value="dbo.cleaned_data")
     if st.button("🚀 Push to SQL Server"):
         try:
-            st.session_state.cleaned_df.to_sql(name=target_table.split('.')[-1],
-                                               con=st.session_state.engine,
-                                               schema=target_table.split('.')[0],
-                                               if_exists='replace',
-                                               index=False)
-            st.success(f"✅ Saved to SQL Server as: {target_table}")
+            schema, name = split_table_name(target_table)
+            stats = bulk_write(st.session_state.cleaned_df, st.session_state.engine, name, schema=schema)
+            st.success(f"✅ Saved to SQL Server as: {target_table} ({stats['rows_per_sec']:,.0f} rows/sec)")
         except Exception as e:
             st.error(f"❌ Failed to save: {e}")
@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
-import sqlalchemy
-from AutoClean import AutoClean
-import sweetviz
+from fileformats import CSV_UPLOAD_TYPES
+from ingest import read_csv
+from preview import show_head, show_preview
+from bulkwriter import bulk_write, split_table_name
+from connections import get_engine
+from runtime import load
 import os
 
 # Streamlit page config
@@ -19,9 +22,9 @@ data_source = st.radio("📥 Select Data Source", ["Upload CSV", "Connect to SQL
 
 # CSV Upload Option
 if data_source == "Upload CSV":
-    uploaded_file = st.file_uploader("📁 Upload CSV File", type=["csv"])
+    uploaded_file = st.file_uploader("📁 Upload CSV File", type=CSV_UPLOAD_TYPES)
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
+        df = read_csv(uploaded_file)
         st.session_state.df = df
         st.success("✅ CSV file loaded successfully!")
 
@@ -33,8 +36,7 @@ if data_source == "Connect to SQL Server":
 
     if st.button("🔄 Load Data from SQL Server"):
         try:
-            conn_str = f"mssql+pyodbc://@{server}/{database}?trusted_connection=yes&driver=ODBC+Driver+17+for+SQL+Server"
-            engine = sqlalchemy.create_engine(conn_str)
+            engine = get_engine(server, database)
             st.session_state.engine = engine
             df = pd.read_sql(f"SELECT * FROM {table}", engine)
             st.session_state.df = df
@@ -45,7 +47,7 @@ if data_source == "Connect to SQL Server":
 # Show original data
 if 'df' in st.session_state:
     st.subheader("📊 Original Data")
-    st.dataframe(st.session_state.df)
+    show_preview(st.session_state.df, "original")
 
     # Step 3: Mode selection
     st.subheader("⚙️ Cleaning Configuration")
@@ -81,13 +83,13 @@ if 'df' in st.session_state:
             for col in df_cleaning.select_dtypes(include=['number']).columns:
                 df_cleaning[col] = pd.to_numeric(df_cleaning[col], errors='coerce').astype('float64')
 
-            pipeline = AutoClean(df_cleaning, **clean_params)
+            pipeline = load('AutoClean').AutoClean(df_cleaning, **clean_params)
             cleaned_df = pipeline.output[df_cleaning.columns]
             st.session_state.cleaned_df = cleaned_df
             st.success("✅ Cleaning complete!")
 
             st.subheader("🧽 Cleaned Data")
-            st.dataframe(cleaned_df)
+            show_head(cleaned_df)
 
             if hasattr(pipeline, 'log'):
                 st.subheader("⚠️ AutoClean Log")
@@ -109,11 +111,8 @@ if 'cleaned_df' in st.session_state:
         target_table = st.text_input("📌 Target Table Name", value="dbo.cleaned_data")
         if st.button("🚀 Push to SQL Server"):
             try:
-                st.session_state.cleaned_df.to_sql(name=target_table.split('.')[-1],
-                                                   con=st.session_state.engine,
-                                                   schema=target_table.split('.')[0],
-                                                   if_exists='replace',
-                                                   index=False)
-                st.success(f"✅ Saved to SQL Server as: {target_table}")
+                schema, name = split_table_name(target_table)
+                stats = bulk_write(st.session_state.cleaned_df, st.session_state.engine, name, schema=schema)
+                st.success(f"✅ Saved to SQL Server as: {target_table} ({stats['rows_per_sec']:,.0f} rows/sec)")
             except Exception as e:
                 st.error(f"❌ Failed to save: {e}")